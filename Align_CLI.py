@@ -0,0 +1,282 @@
+import argparse
+import os
+import sys
+from contextlib import contextmanager
+from Fasta_IO import ClustalWriter, FastaWriter, iter_chunks, iter_sequences, open_text
+
+# Command line entry point
+#   python -m Align_CLI pairwise pairs.fa [second.fa] --mode global|local|semi-global --format tsv|fasta|clustal
+#   python -m Align_CLI all-vs-all seqs.fa --measure score|identity
+#   python -m Align_CLI search queries.fa db.fa|db_index --top 10 --seed 11011
+#   python -m Align_CLI msa family.fa --method progressive|upgma|nj --format fasta|clustal [--save family.msa]
+#   python -m Align_CLI msa new.fa --load family.msa --save family.msa    (appends only the new records)
+# Every command reads FASTA/FASTQ (plain or .gz) as a stream and writes results as they come, to stdout or -o FILE.
+# The alignment modules are only imported by the command that needs them, and plotly only with --heatmaps, so short
+# invocations from a workflow manager don't pay for what they don't use.
+
+TSV_COLUMNS = {
+    "pairwise": ("name_1", "name_2", "score", "identity", "aligned_1", "aligned_2"),
+    "search": ("query", "target", "score", "query_start", "query_end", "target_start", "target_end",
+               "aligned_query", "aligned_target"),
+}
+
+def align_pair(aligner, seq_1, seq_2, mode):
+    """Aligns one pair with an existing SequenceAlign, returns (score, [aligned 1, aligned 2])"""
+    aligner.set_sequences(seq_1, seq_2)
+    if mode == "global":
+        aligner.gen_global_data("numpy")
+        return aligner.nw_optimal_alignment, aligner.nw_result
+    if mode == "local":
+        aligner.gen_local_data("numpy")
+        return aligner.sw_optimal_alignment, aligner.sw_result
+    score, aligned, _, _ = aligner.gen_semi_global_data()
+    return score, aligned
+
+
+def _align_pairs(pairs, mode):
+    """Work unit - aligns a chunk of (name 1, seq 1, name 2, seq 2) pairs"""
+    from Pool_Worker import worker
+    return [(name_1, name_2, *align_pair(worker.aligner, seq_1, seq_2, mode))
+            for name_1, seq_1, name_2, seq_2 in pairs]
+
+
+def _search_queries(records, top, candidates, min_hits, max_occurrences):
+    """Work unit - searches a chunk of (name, seq) queries against the worker's index"""
+    from Pool_Worker import worker
+    return [(name, worker.data.search(seq, worker.aligner, top, candidates, min_hits, max_occurrences=max_occurrences))
+            for name, seq in records]
+
+
+@contextmanager
+def output_handle(filename):
+    """Text handle for -o: "-" is stdout, a .gz name is written compressed"""
+    if filename == "-":
+        yield sys.stdout
+        sys.stdout.flush()
+    else:
+        with open_text(filename, "w") as handle:
+            yield handle
+
+
+def write_row(handle, values):
+    handle.write("\t".join(map(str, values)) + "\n")
+
+
+def load_sub_matrix(args):
+    """Encoded substitution matrix from --seq-type / --matrix / --match / --mismatch"""
+    from Sub_Matrix_Gen import SubstitutionMatrix
+    matrix = SubstitutionMatrix(args.seq_type, encoded=True)
+    if matrix.seq_type == "PROTEIN":
+        # the default blosum62.mat ships next to this file, so it is found from any working directory
+        return matrix.load_protein_matrix(args.matrix or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                      "blosum62.mat"))
+    if args.matrix:
+        raise ValueError("--matrix files are for protein sequences - use --match / --mismatch for DNA and RNA")
+    if matrix.seq_type == "DNA":
+        return matrix.DNA_submat(args.match, args.mismatch)
+    if matrix.seq_type == "RNA":
+        return matrix.RNA_submat(args.match, args.mismatch)
+    raise ValueError("Invalid Sequence Type - Choose from: Protein, DNA, or RNA")
+
+
+def scoring(args):
+    """Arguments shared by every aligner - (sub_matrix, gap_penalty, gap_open, gap_extend)"""
+    if (args.gap_open is None) != (args.gap_extend is None):
+        raise ValueError("Affine gaps need both --gap-open and --gap-extend")
+    return load_sub_matrix(args), args.gap, args.gap_open, args.gap_extend
+
+
+def sequence_pairs(first, second=None):
+    """(name 1, seq 1, name 2, seq 2) from one file taken two records at a time, or two files record by record"""
+    if second is None:
+        records = iter_sequences(first)
+        for name_1, seq_1 in records:
+            name_2, seq_2 = next(records, (None, None))
+            if name_2 is None:
+                raise ValueError(f"{first} has an odd number of records - {name_1} has no record to pair with")
+            yield name_1, seq_1, name_2, seq_2
+        return
+    for (name_1, seq_1), (name_2, seq_2) in zip(iter_sequences(first), iter_sequences(second), strict=True):
+        yield name_1, seq_1, name_2, seq_2
+
+
+def pairwise_command(args):
+    init_args = scoring(args)
+    if args.mode == "semi-global" and init_args[2] is not None:
+        raise ValueError("Semi-global alignment only supports a linear gap penalty (--gap)")
+    if args.mode == "semi-global" and args.heatmaps:
+        raise ValueError("Heatmaps are drawn for global and local alignments only")
+    pairs = sequence_pairs(args.fasta, args.second)
+    if args.heatmaps:
+        results = heatmap_pairs(pairs, args, init_args)
+    else:
+        from Pool_Worker import map_work
+        chunks = map_work(_align_pairs, iter_chunks(pairs, args.chunk_size), (args.mode,), (init_args,), args.workers)
+        results = (result for chunk in chunks for result in chunk)
+
+    from Batch_Align import identity
+    with output_handle(args.output) as handle:
+        if args.format == "tsv":
+            write_row(handle, TSV_COLUMNS["pairwise"])
+            for name_1, name_2, score, aligned in results:
+                write_row(handle, (name_1, name_2, score, f"{identity(aligned):.4f}", *aligned))
+            return
+        writer = FastaWriter(handle) if args.format == "fasta" else ClustalWriter(handle)
+        for name_1, name_2, _, aligned in results:
+            writer.write_pairwise(name_1, name_2, aligned)
+        writer.close()
+
+
+def heatmap_pairs(pairs, args, init_args):
+    """Aligns in this process, keeping the matrices long enough to plot each pair into args.heatmaps"""
+    from Heatmap_Render import output_name
+    from Sequence_Align_Toolkit import SequenceAlign
+    os.makedirs(args.heatmaps, exist_ok=True)
+    aligner = SequenceAlign(*init_args)
+    for number, (name_1, seq_1, name_2, seq_2) in enumerate(pairs):
+        score, aligned = align_pair(aligner, seq_1, seq_2, args.mode)
+        output = os.path.join(args.heatmaps, f"pair_{number}_{args.mode}.html")
+        if args.mode == "global":
+            aligner.global_path_matrix()
+            aligner.heatmaps_nw_raw(output=output)
+            aligner.heatmap_nw_path(output=output_name(output, "path"))
+        else:
+            aligner.local_path_matrix()
+            aligner.heatmaps_sw_raw(output=output)
+            aligner.heatmap_sw_path(output=output_name(output, "path"))
+        yield name_1, name_2, score, aligned
+
+
+def all_vs_all_command(args):
+    from Batch_Align import BatchAlignment
+    sub_matrix, gap_penalty, gap_open, gap_extend = scoring(args)
+    records = list(iter_sequences(args.fasta))
+    batch = BatchAlignment(sub_matrix, gap_penalty, gap_open, gap_extend, args.mode, args.workers, args.chunk_size)
+    matrix = batch.run([seq for _, seq in records], args.measure)  # aligns i <= j only, mirrored
+    with output_handle(args.output) as handle:
+        write_row(handle, ["name"] + [name for name, _ in records])
+        for (name, _), values in zip(records, matrix):
+            write_row(handle, [name] + [f"{value:.4f}" if args.measure == "identity" else value
+                                        for value in values])
+
+
+def search_command(args):
+    from Kmer_Index import KmerIndex
+    sub_matrix, gap_penalty, gap_open, gap_extend = scoring(args)
+    directory = args.database
+    if not os.path.isdir(directory):  # a sequence file - index it first, kept in --index-dir when given
+        import tempfile
+        directory = args.index_dir or tempfile.mkdtemp(prefix="align_index_")
+        KmerIndex(sub_matrix, args.seed).build(iter_sequences(args.database), directory)
+    from Pool_Worker import map_work
+    init_args = ((sub_matrix, gap_penalty, gap_open, gap_extend), directory, None, KmerIndex.load)  # index per worker
+    chunks = map_work(_search_queries, iter_chunks(iter_sequences(args.queries), args.chunk_size),
+                      (args.top, args.candidates, args.min_hits, args.max_occurrences), init_args, args.workers)
+    with output_handle(args.output) as handle:
+        write_row(handle, TSV_COLUMNS["search"])
+        for chunk in chunks:
+            for query, hits in chunk:
+                for score, target, _, aligned, query_span, target_span in hits:
+                    write_row(handle, (query, target, score, *query_span, *target_span, *aligned))
+    if directory != args.database and args.index_dir is None:
+        import shutil
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def msa_command(args):
+    from MultipleAlign import MultipleAlignment
+    sub_matrix, gap_penalty, gap_open, gap_extend = scoring(args)
+    records = list(iter_sequences(args.fasta))
+    if args.load:  # only the new records are aligned, against the saved alignment's consensus
+        msa = MultipleAlignment.load(args.load, sub_matrix, gap_penalty, gap_open, gap_extend, engine="numpy")
+        if not msa.names:
+            msa.names = [f"seq_{i}" for i in range(len(msa.block))]
+        aligned = msa.add_sequences([seq for _, seq in records], [name for name, _ in records])
+    else:
+        if len(records) < 2:  # checked first - the alignment methods would print a note to stdout and return None
+            raise ValueError("You need more than two sequences to run Multiple Sequence Alignment")
+        msa = MultipleAlignment([seq for _, seq in records], sub_matrix, gap_penalty, gap_open, gap_extend,
+                                engine="numpy")
+        msa.names = [name for name, _ in records]
+        if args.method == "progressive":
+            aligned = msa.global_progressive_align()
+        else:
+            aligned = msa.guide_tree_align(args.method, args.workers)
+    if args.save:
+        msa.save(args.save)
+    with output_handle(args.output) as handle:
+        writer = FastaWriter(handle) if args.format == "fasta" else ClustalWriter(handle)
+        writer.write_msa(msa.names, aligned)
+        writer.close()
+
+
+def build_parser():
+    scoring_options = argparse.ArgumentParser(add_help=False)
+    scoring_options.add_argument("--seq-type", default="protein", help="protein, dna or rna (default protein)")
+    scoring_options.add_argument("--matrix", help="protein .mat substitution matrix (default blosum62.mat)")
+    scoring_options.add_argument("--match", type=int, default=1, help="DNA/RNA match score")
+    scoring_options.add_argument("--mismatch", type=int, default=0, help="DNA/RNA mismatch score")
+    scoring_options.add_argument("--gap", type=int, default=-8, help="linear gap penalty")
+    scoring_options.add_argument("--gap-open", type=int, help="affine gaps: penalty of a gap's first position")
+    scoring_options.add_argument("--gap-extend", type=int, help="affine gaps: penalty of every further position")
+    scoring_options.add_argument("--workers", type=int, help="worker processes (default one per core, 1 = no pool)")
+    scoring_options.add_argument("--chunk-size", type=int, default=64, help="records sent to a worker at a time")
+    scoring_options.add_argument("-o", "--output", default="-", help="output file (default stdout, .gz compresses)")
+
+    parser = argparse.ArgumentParser(prog="Align_CLI", description="Pairwise and multiple sequence alignment")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    pairwise = commands.add_parser("pairwise", parents=[scoring_options],
+                                   help="align records two at a time, or record by record across two files")
+    pairwise.add_argument("fasta")
+    pairwise.add_argument("second", nargs="?", help="second file - record i is aligned with record i of fasta")
+    pairwise.add_argument("--mode", default="global", choices=["global", "local", "semi-global"])
+    pairwise.add_argument("--format", default="tsv", choices=["tsv", "fasta", "clustal"])
+    pairwise.add_argument("--heatmaps", metavar="DIR", help="also write score/traceback/path heatmaps (HTML) there")
+    pairwise.set_defaults(run=pairwise_command)
+
+    all_vs_all = commands.add_parser("all-vs-all", parents=[scoring_options],
+                                     help="score or identity matrix of every pair, one TSV row per record")
+    all_vs_all.add_argument("fasta")
+    all_vs_all.add_argument("--mode", default="global", choices=["global", "local"])
+    all_vs_all.add_argument("--measure", default="score", choices=["score", "identity"])
+    all_vs_all.set_defaults(run=all_vs_all_command)
+
+    search = commands.add_parser("search", parents=[scoring_options],
+                                 help="seed-and-extend search of queries against a sequence database")
+    search.add_argument("queries")
+    search.add_argument("database", help="sequence file, or a directory saved by KmerIndex.build")
+    search.add_argument("--index-dir", help="keep the index built from a database file here")
+    search.add_argument("--seed", default="111", help="seed pattern when indexing, e.g. 111 or 11011")
+    search.add_argument("--top", type=int, default=10)
+    search.add_argument("--candidates", type=int, default=50, help="targets aligned per query")
+    search.add_argument("--min-hits", type=int, default=2)
+    search.add_argument("--max-occurrences", type=int, help="skip seeds found more often than this")
+    search.set_defaults(run=search_command)
+
+    msa = commands.add_parser("msa", parents=[scoring_options], help="multiple sequence alignment of one file")
+    msa.add_argument("fasta")
+    msa.add_argument("--method", default="progressive", choices=["progressive", "upgma", "nj"])
+    msa.add_argument("--format", default="fasta", choices=["fasta", "clustal"])
+    msa.add_argument("--load", metavar="FILE", help="append the records to an alignment saved with --save "
+                                                    "(--method is not used then)")
+    msa.add_argument("--save", metavar="FILE", help="save the finished alignment + column profile for --load")
+    msa.set_defaults(run=msa_command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.run(args)
+    except (KeyError, ValueError) as error:  # unknown residue (KeyError) or bad input / option combination
+        print(f"{args.command}: {type(error).__name__}: {error}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:  # output piped into e.g. head, which stopped reading
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())  # no second error when stdout is flushed
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
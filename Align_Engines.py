@@ -0,0 +1,816 @@
+import hashlib
+import heapq
+import numpy as np
+from Traceback_Store import PackedTraceback
+
+# Vectorized NumPy engines for the SequenceAlign class
+# Sequences are encoded as integer arrays and the substitution matrix as a dense 2-D array, then each DP row is
+# filled in one shot. Scores and traceback codes (0=stop, 1=diagonal, 2=up, 3=left) match the pure Python engine.
+
+
+def encode_sub_matrix(sub_matrix):
+    """
+    Converts a dict substitution matrix (keys like "AC") into an alphabet -> index map and a dense 2-D score array
+    \n the array uses the smallest of int8/int16/int64 that holds every score (engines add it to int64 rows)
+    \n raises ValueError if the dict does not hold a score for every pair of characters in its alphabet
+    """
+    alphabet = sorted({pair[0] for pair in sub_matrix} | {pair[1] for pair in sub_matrix})
+    index = {char: i for i, char in enumerate(alphabet)}
+    if len(sub_matrix) != len(alphabet) ** 2:
+        raise ValueError("Substitution matrix must contain a score for every pair of characters")
+
+    scores = sub_matrix.values()
+    low, high = (min(scores), max(scores)) if sub_matrix else (0, 0)
+    dtype = next(dtype for dtype in (np.int8, np.int16, np.int64)
+                 if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max)
+    dense = np.zeros((len(alphabet), len(alphabet)), dtype=dtype)
+    for pair, score in sub_matrix.items():
+        dense[index[pair[0]], index[pair[1]]] = score
+    return index, dense
+
+
+def decode_sub_matrix(encoded_matrix):
+    """Converts an (index, dense) pair back into the dict form (keys like "AC")"""
+    index, dense = encoded_matrix
+    scores = dense.tolist()
+    return {char_1 + char_2: scores[i][j] for char_1, i in index.items() for char_2, j in index.items()}
+
+
+def matrix_digest(sub_matrix):
+    """Hash of a substitution matrix dict's contents (order independent)"""
+    return hashlib.sha256(repr(sorted(sub_matrix.items())).encode()).hexdigest()
+
+
+def encode_sequence(seq, index):
+    """Converts a sequence into an array of alphabet indices (KeyError on unknown characters, same as the dict)"""
+    return np.fromiter((index[char] for char in seq), dtype=np.intp, count=len(seq))
+
+
+def _alloc(buffers, name, shape, dtype, zero):
+    """np.zeros / np.empty, or a reused view from a DPBuffers pool (Reusable_Align) when one is given"""
+    if buffers is None:
+        return np.zeros(shape, dtype=dtype) if zero else np.empty(shape, dtype=dtype)
+    return buffers.get(name, shape, dtype, zero)
+
+
+def _packed_traceback(buffers, name, rows, cols):
+    """Empty PackedTraceback, stored in a reused buffer when a DPBuffers pool is given"""
+    return PackedTraceback(rows, cols, _alloc(buffers, name, PackedTraceback.packed_shape(rows, cols), np.uint8, True))
+
+
+def _fill_row(prev_row, sub_row, gap_penalty, gap_steps, first_cell, floor):
+    """
+    Fills one DP row from the previous one
+    diagonal and up moves only depend on the previous row; the left move is a running max along the row, which for a
+    linear gap is: row[j] = max over k <= j of (best[k] + (j - k) * gap) -> a cumulative max of best[k] - k * gap
+    :return: new row, diagonal scores, up scores, left scores (the last three cover columns 1..m)
+    """
+    diagonal = prev_row[:-1] + sub_row
+    up = prev_row[1:] + gap_penalty
+    best = np.maximum(diagonal, up)
+    if floor is not None:
+        best = np.maximum(best, floor)
+
+    candidates = np.empty(len(prev_row), dtype=np.int64)
+    candidates[0] = first_cell
+    candidates[1:] = best
+    row = np.maximum.accumulate(candidates - gap_steps) + gap_steps
+    left = row[:-1] + gap_penalty
+    return row, diagonal, up, left
+
+
+def _moves(diagonal, up, left):
+    """Vectorized max3t - ties go to left, then up, then diagonal, exactly like SequenceAlign.max3t"""
+    return np.where(left >= np.maximum(diagonal, up), 3, np.where(up >= diagonal, 2, 1))
+
+
+def _nw_fill(codes_1, codes_2, dense, gap_penalty, buffers=None, free_start_1=False, free_start_2=False,
+             name="nw"):
+    """
+    Fills full Needleman-Wunsch score and traceback arrays for two encoded sequences
+    :param free_start_1: leading gaps in seq 1 cost nothing (gap row of 0s) - semi-global alignment
+    :param free_start_2: leading gaps in seq 2 cost nothing (gap column of 0s)
+    :param name: buffer name prefix, so different modes don't overwrite each other's matrices in a DPBuffers pool
+    """
+    n, m = len(codes_1), len(codes_2)
+
+    score_matrix = _alloc(buffers, f"{name}_score", (n + 1, m + 1), np.int64, False)
+    traceback_matrix = _packed_traceback(buffers, f"{name}_traceback", n + 1, m + 1)  # rows packed as they are filled
+    gap_steps = gap_penalty * np.arange(m + 1, dtype=np.int64)
+    row_codes = np.full(m + 1, 3, dtype=np.uint8)
+
+    score_matrix[0] = 0 if free_start_1 else gap_steps  # gap row (all gaps in seq 1)
+    row_codes[0] = 0
+    traceback_matrix.set_row(0, row_codes)
+    score_matrix[:, 0] = 0 if free_start_2 else gap_penalty * np.arange(n + 1, dtype=np.int64)  # gap column
+    row_codes[0] = 2
+
+    for row in range(1, n + 1):
+        sub_row = dense[codes_1[row - 1]][codes_2]
+        new_row, diagonal, up, left = _fill_row(score_matrix[row - 1], sub_row, gap_penalty, gap_steps,
+                                                score_matrix[row, 0], None)
+        score_matrix[row] = new_row
+        row_codes[1:] = _moves(diagonal, up, left)
+        traceback_matrix.set_row(row, row_codes)
+    return score_matrix, traceback_matrix
+
+
+def needleman_wunsch_numpy(seq_1, seq_2, encoded_matrix, gap_penalty, buffers=None):
+    """
+    Row-vectorized Needleman-Wunsch
+    :param encoded_matrix: (index, dense) tuple from encode_sub_matrix
+    :param buffers: optional DPBuffers - the matrices are then views into reused buffers (valid until the next call)
+    :return: score_matrix as a NumPy array, traceback_matrix as a PackedTraceback
+    """
+    index, dense = encoded_matrix
+    return _nw_fill(encode_sequence(seq_1, index), encode_sequence(seq_2, index), dense, gap_penalty, buffers)
+
+
+def smith_waterman_numpy(seq_1, seq_2, encoded_matrix, gap_penalty, buffers=None):
+    """
+    Row-vectorized Smith-Waterman
+    :param encoded_matrix: (index, dense) tuple from encode_sub_matrix
+    :param buffers: optional DPBuffers, same as needleman_wunsch_numpy
+    :return: score_matrix as a NumPy array, traceback_matrix as a PackedTraceback and the max score
+    """
+    index, dense = encoded_matrix
+    codes_1 = encode_sequence(seq_1, index)
+    codes_2 = encode_sequence(seq_2, index)
+    n, m = len(codes_1), len(codes_2)
+
+    score_matrix = _alloc(buffers, "sw_score", (n + 1, m + 1), np.int64, True)
+    traceback_matrix = _packed_traceback(buffers, "sw_traceback", n + 1, m + 1)  # first row and column stay 0 (stop)
+    gap_steps = gap_penalty * np.arange(m + 1, dtype=np.int64)
+    row_codes = np.zeros(m + 1, dtype=np.uint8)
+
+    for row in range(1, n + 1):
+        sub_row = dense[codes_1[row - 1]][codes_2]
+        new_row, diagonal, up, left = _fill_row(score_matrix[row - 1], sub_row, gap_penalty, gap_steps, 0, 0)
+        score_matrix[row] = new_row
+        best = np.maximum(np.maximum(diagonal, up), left)
+        row_codes[1:] = np.where(best <= 0, 0, _moves(diagonal, up, left))  # 0 when cell is clamped
+        traceback_matrix.set_row(row, row_codes)
+    return score_matrix, traceback_matrix, int(score_matrix.max())
+
+
+def _global_traceback(traceback_matrix, seq_1, seq_2, row=None, col=None):
+    """
+    Follows a global traceback matrix back to the top left corner and returns both aligned sequences
+    :param row: cell to start from (default: bottom right corner), the alignment then only covers seq_1[:row] and
+    seq_2[:col]
+    """
+    aligned_1, aligned_2 = [], []  # built backwards then reversed, avoids re-copying strings on every step
+    if row is None:
+        row, col = len(seq_1), len(seq_2)
+    while row > 0 or col > 0:
+        move = traceback_matrix[row, col]
+        if move == 1:  # diagonal move
+            aligned_1.append(seq_1[row - 1])
+            aligned_2.append(seq_2[col - 1])
+            row -= 1
+            col -= 1
+        elif move == 3:  # left move -> gap in the first seq
+            aligned_1.append("-")
+            aligned_2.append(seq_2[col - 1])
+            col -= 1
+        else:  # up move -> gap in the second seq
+            aligned_1.append(seq_1[row - 1])
+            aligned_2.append("-")
+            row -= 1
+    return "".join(reversed(aligned_1)), "".join(reversed(aligned_2))
+
+
+def _hirschberg_split(codes_1, codes_2, dense, gap_penalty, mid):
+    """
+    Needleman-Wunsch forward pass that only keeps the current row
+    From row `mid` on, every cell also carries the column where its traceback path crosses row `mid`. The bottom
+    right cell then tells us where the traceback path of the full matrix crosses the middle row, so both halves can be
+    solved separately and still give exactly the same alignment as the full traceback.
+    :return: optimal score of the block, crossing column on row mid
+    """
+    n, m = len(codes_1), len(codes_2)
+    gap_steps = gap_penalty * np.arange(m + 1, dtype=np.int64)
+    columns = np.arange(m + 1)
+    row = gap_steps.copy()
+    origin = columns
+
+    for i in range(1, n + 1):
+        sub_row = dense[codes_1[i - 1]][codes_2]
+        row, diagonal, up, left = _fill_row(row, sub_row, gap_penalty, gap_steps, gap_penalty * i, None)
+        if i > mid:
+            moves = _moves(diagonal, up, left)
+            source = np.empty(m + 1, dtype=np.intp)
+            source[0] = origin[0]  # first column always moves up
+            source[1:] = np.where(moves == 1, origin[:-1], origin[1:])
+            # left moves copy the origin of the nearest cell to their left that did not move left
+            not_left = np.empty(m + 1, dtype=bool)
+            not_left[0] = True
+            not_left[1:] = moves != 3
+            origin = source[np.maximum.accumulate(np.where(not_left, columns, 0))]
+    return int(row[-1]), int(origin[-1])
+
+
+def _hirschberg_block(codes_1, codes_2, seq_1, seq_2, dense, gap_penalty, block_cells, pieces):
+    """Aligns one block, either directly (small enough) or by splitting it at the middle row"""
+    n, m = len(codes_1), len(codes_2)
+    if n <= 1 or (n + 1) * (m + 1) <= block_cells:
+        score_matrix, traceback_matrix = _nw_fill(codes_1, codes_2, dense, gap_penalty)
+        pieces.append(_global_traceback(traceback_matrix, seq_1, seq_2))
+        return int(score_matrix[n, m])
+
+    mid = n // 2
+    score, col = _hirschberg_split(codes_1, codes_2, dense, gap_penalty, mid)
+    _hirschberg_block(codes_1[:mid], codes_2[:col], seq_1[:mid], seq_2[:col], dense, gap_penalty, block_cells,
+                      pieces)
+    _hirschberg_block(codes_1[mid:], codes_2[col:], seq_1[mid:], seq_2[col:], dense, gap_penalty, block_cells,
+                      pieces)
+    return score
+
+
+def hirschberg_numpy(seq_1, seq_2, encoded_matrix, gap_penalty, block_cells=1 << 16):
+    """
+    Linear memory Needleman-Wunsch (Hirschberg divide and conquer)
+    Blocks with at most block_cells cells are solved with a full matrix, everything above is split in half.
+    :param encoded_matrix: (index, dense) tuple from encode_sub_matrix
+    :return: optimal score, [aligned seq 1, aligned seq 2] - identical to the full matrix traceback
+    """
+    index, dense = encoded_matrix
+    codes_1 = encode_sequence(seq_1, index)
+    codes_2 = encode_sequence(seq_2, index)
+
+    pieces = []
+    score = _hirschberg_block(codes_1, codes_2, seq_1, seq_2, dense, gap_penalty, block_cells, pieces)
+    return score, ["".join(piece[0] for piece in pieces), "".join(piece[1] for piece in pieces)]
+
+
+def global_score_numpy(seq_1, seq_2, encoded_matrix, gap_penalty):
+    """
+    Needleman-Wunsch score only - rolls a single row through the matrix, no traceback or aligned strings
+    :param encoded_matrix: (index, dense) tuple from encode_sub_matrix
+    :return: optimal global score
+    """
+    index, dense = encoded_matrix
+    codes_1 = encode_sequence(seq_1, index)
+    codes_2 = encode_sequence(seq_2, index)
+    gap_steps = gap_penalty * np.arange(len(codes_2) + 1, dtype=np.int64)
+
+    row = gap_steps.copy()
+    for i in range(1, len(codes_1) + 1):
+        row = _fill_row(row, dense[codes_1[i - 1]][codes_2], gap_penalty, gap_steps, gap_penalty * i, None)[0]
+    return int(row[-1])
+
+
+def local_score_numpy(seq_1, seq_2, encoded_matrix, gap_penalty):
+    """
+    Smith-Waterman score only - rolls a single row through the matrix, no traceback or aligned strings
+    :param encoded_matrix: (index, dense) tuple from encode_sub_matrix
+    :return: optimal local score, end row, end col (the first max cell in row order, same as SequenceAlign.max_mat)
+    """
+    index, dense = encoded_matrix
+    codes_1 = encode_sequence(seq_1, index)
+    codes_2 = encode_sequence(seq_2, index)
+    gap_steps = gap_penalty * np.arange(len(codes_2) + 1, dtype=np.int64)
+
+    row = np.zeros(len(codes_2) + 1, dtype=np.int64)
+    max_score, max_row, max_col = 0, 0, 0
+    for i in range(1, len(codes_1) + 1):
+        row = _fill_row(row, dense[codes_1[i - 1]][codes_2], gap_penalty, gap_steps, 0, 0)[0]
+        col = int(np.argmax(row))
+        if row[col] > max_score:
+            max_score, max_row, max_col = int(row[col]), i, col
+    return max_score, max_row, max_col
+
+
+def query_profile(query, encoded_matrix):
+    """
+    Query profile for local_score_profile - row c is the score of residue c against every query position
+    \n kept in the dtype of the encoded matrix (int8 for the usual matrices), the fill widens it to int64 per row
+    """
+    index, dense = encoded_matrix
+    return np.ascontiguousarray(dense[:, encode_sequence(query, index)])
+
+
+def local_score_profile(profile, target, index, gap_penalty, block_rows=64):
+    """
+    Smith-Waterman score only, query (along the rows) against a target, from a query_profile - the substitution
+    scores of block_rows query positions vs the whole target come out of one gather of the profile instead of a
+    gather through the substitution matrix per row, and the same profile serves every target of the query
+    :param index: alphabet index of the encoded matrix the profile was built from
+    :return: optimal score, end row, end col - the same as local_score_numpy(query, target)
+    """
+    codes = encode_sequence(target, index)
+    gap_steps = gap_penalty * np.arange(len(codes) + 1, dtype=np.int64)
+
+    row = np.zeros(len(codes) + 1, dtype=np.int64)
+    max_score, max_row, max_col = 0, 0, 0
+    for start in range(0, profile.shape[1], block_rows):
+        sub_rows = np.ascontiguousarray(profile[:, start:start + block_rows][codes].T)
+        for i, sub_row in enumerate(sub_rows, start + 1):
+            row = _fill_row(row, sub_row, gap_penalty, gap_steps, 0, 0)[0]
+            col = int(np.argmax(row))
+            if row[col] > max_score:
+                max_score, max_row, max_col = int(row[col]), i, col
+    return max_score, max_row, max_col
+
+
+# AFFINE GAPS (Gotoh)
+# A gap of length L costs gap_open + (L - 1) * gap_extend. Three states per cell: H (best overall), E (ends in a left
+# move / gap in seq 1) and F (ends in an up move / gap in seq 2). All three tracebacks share one uint8 per cell:
+# bits 0-1 = H move (0=stop, 1=diagonal, 2=up -> F, 3=left -> E), bit 2 = E extends E, bit 3 = F extends F
+E_EXTEND = 4
+F_EXTEND = 8
+NEG_INF = np.iinfo(np.int64).min // 4  # "minus infinity" that can still take a few additions without wrapping
+
+
+def _affine_row(prev_h, prev_f, sub_row, first_cell, gap_open, gap_extend, extend_steps, local):
+    """
+    Fills one Gotoh row from the previous one
+    F only depends on the previous row. When gap_open <= gap_extend, reopening a gap never beats extending it, so E
+    (the horizontal gap) is a running max of best[k] + gap_open + (j - 1 - k) * gap_extend -> a cumulative max again.
+    :return: H row, F row, diagonal, E (the last two cover columns 1..m)
+    """
+    diagonal = prev_h[:-1] + sub_row
+    f_row = np.empty(len(prev_h), dtype=np.int64)
+    f_row[0] = NEG_INF if local else first_cell  # first column is a single vertical gap in global mode
+    f_row[1:] = np.maximum(prev_h[1:] + gap_open, prev_f[1:] + gap_extend)
+    best = np.maximum(diagonal, f_row[1:])
+    if local:
+        best = np.maximum(best, 0)
+
+    candidates = np.empty(len(prev_h), dtype=np.int64)
+    candidates[0] = first_cell
+    candidates[1:] = best
+    e_row = np.maximum.accumulate(candidates[:-1] - extend_steps[:-1]) + gap_open + extend_steps[:-1]
+
+    h_row = np.empty(len(prev_h), dtype=np.int64)
+    h_row[0] = first_cell
+    h_row[1:] = np.maximum(best, e_row)
+    return h_row, f_row, diagonal, e_row
+
+
+def _affine_fill(codes_1, codes_2, dense, gap_open, gap_extend, local, buffers=None):
+    """Fills the Gotoh score matrix (H) and the packed traceback for two encoded sequences"""
+    n, m = len(codes_1), len(codes_2)
+    score_matrix = _alloc(buffers, "sw_score" if local else "nw_score", (n + 1, m + 1), np.int64, True)
+    traceback_matrix = _alloc(buffers, "affine_states", (n + 1, m + 1), np.uint8, True)
+    extend_steps = gap_extend * np.arange(m + 1, dtype=np.int64)
+
+    if not local:
+        score_matrix[0, 1:] = gap_open + extend_steps[:-1]  # gap row (all gaps in seq 1)
+        score_matrix[1:, 0] = gap_open + gap_extend * np.arange(n, dtype=np.int64)  # gap column (all gaps in seq 2)
+        traceback_matrix[0, 1:] = 3
+        traceback_matrix[0, 2:] |= E_EXTEND
+        traceback_matrix[1:, 0] = 2
+        traceback_matrix[2:, 0] |= F_EXTEND
+
+    prev_f = np.full(m + 1, NEG_INF, dtype=np.int64)  # no vertical gap can end in row 0
+    for row in range(1, n + 1):
+        sub_row = dense[codes_1[row - 1]][codes_2]
+        h_row, f_row, diagonal, e_row = _affine_row(score_matrix[row - 1], prev_f, sub_row, score_matrix[row, 0],
+                                                    gap_open, gap_extend, extend_steps, local)
+        score_matrix[row] = h_row
+
+        moves = _moves(diagonal, f_row[1:], e_row)
+        if local:
+            moves = np.where(h_row[1:] <= 0, 0, moves)
+        e_prev = np.concatenate(([NEG_INF], e_row[:-1]))  # E of the cell to the left (none in the first column)
+        e_extends = e_prev + gap_extend > h_row[:-1] + gap_open  # ties open a new gap
+        f_extends = prev_f[1:] + gap_extend > score_matrix[row - 1, 1:] + gap_open
+        traceback_matrix[row, 1:] = moves | (e_extends * E_EXTEND) | (f_extends * F_EXTEND)
+        prev_f = f_row
+    return score_matrix, traceback_matrix
+
+
+def _affine_resolve(traceback_matrix, row, col, packed=None):
+    """
+    Walks the packed three-state traceback from (row, col), then rewrites it in place into plain 1/2/3 moves where
+    the cells on the optimal path hold the move actually taken. The result is returned as a PackedTraceback and works
+    with the regular traceback, path and heatmap functions of SequenceAlign.
+    """
+    path_rows, path_cols, path_moves = [], [], []
+    state = 0  # 0 = H, 2 = F (up), 3 = E (left)
+    while True:
+        code = int(traceback_matrix[row, col])
+        if state == 0:
+            move = code & 3
+            if move == 0:
+                break
+            if move == 1:
+                path_rows.append(row)
+                path_cols.append(col)
+                path_moves.append(1)
+                row -= 1
+                col -= 1
+            else:
+                state = move  # same cell, continue in the gap state
+        elif state == 3:
+            path_rows.append(row)
+            path_cols.append(col)
+            path_moves.append(3)
+            state = 3 if code & E_EXTEND else 0
+            col -= 1
+        else:
+            path_rows.append(row)
+            path_cols.append(col)
+            path_moves.append(2)
+            state = 2 if code & F_EXTEND else 0
+            row -= 1
+
+    traceback_matrix &= 3
+    traceback_matrix[path_rows, path_cols] = path_moves
+    return PackedTraceback.from_codes(traceback_matrix, packed)
+
+
+def needleman_wunsch_affine(seq_1, seq_2, encoded_matrix, gap_open, gap_extend, buffers=None):
+    """
+    Gotoh global alignment
+    :param encoded_matrix: (index, dense) tuple from encode_sub_matrix
+    :param buffers: optional DPBuffers, same as needleman_wunsch_numpy
+    :return: score_matrix, traceback_matrix (plain 1/2/3 moves, optimal path resolved through the gap states)
+    """
+    index, dense = encoded_matrix
+    score_matrix, traceback_matrix = _affine_fill(encode_sequence(seq_1, index), encode_sequence(seq_2, index),
+                                                  dense, gap_open, gap_extend, False, buffers)
+    packed = _alloc(buffers, "nw_traceback", PackedTraceback.packed_shape(*score_matrix.shape), np.uint8, True)
+    return score_matrix, _affine_resolve(traceback_matrix, len(seq_1), len(seq_2), packed)
+
+
+def smith_waterman_affine(seq_1, seq_2, encoded_matrix, gap_open, gap_extend, buffers=None):
+    """
+    Gotoh local alignment
+    :param encoded_matrix: (index, dense) tuple from encode_sub_matrix
+    :param buffers: optional DPBuffers, same as needleman_wunsch_numpy
+    :return: score_matrix, traceback_matrix (resolved like needleman_wunsch_affine) and the max score
+    """
+    index, dense = encoded_matrix
+    score_matrix, traceback_matrix = _affine_fill(encode_sequence(seq_1, index), encode_sequence(seq_2, index),
+                                                  dense, gap_open, gap_extend, True, buffers)
+    max_row, max_col = np.unravel_index(np.argmax(score_matrix), score_matrix.shape)
+    packed = _alloc(buffers, "sw_traceback", PackedTraceback.packed_shape(*score_matrix.shape), np.uint8, True)
+    return (score_matrix, _affine_resolve(traceback_matrix, max_row, max_col, packed),
+            int(score_matrix[max_row, max_col]))
+
+
+def global_score_affine(seq_1, seq_2, encoded_matrix, gap_open, gap_extend):
+    """Gotoh score only, rolling rows like global_score_numpy"""
+    index, dense = encoded_matrix
+    codes_1 = encode_sequence(seq_1, index)
+    codes_2 = encode_sequence(seq_2, index)
+    m = len(codes_2)
+    extend_steps = gap_extend * np.arange(m + 1, dtype=np.int64)
+
+    h_row = np.zeros(m + 1, dtype=np.int64)
+    h_row[1:] = gap_open + extend_steps[:-1]
+    f_row = np.full(m + 1, NEG_INF, dtype=np.int64)
+    for i in range(1, len(codes_1) + 1):
+        h_row, f_row = _affine_row(h_row, f_row, dense[codes_1[i - 1]][codes_2], gap_open + (i - 1) * gap_extend,
+                                   gap_open, gap_extend, extend_steps, False)[:2]
+    return int(h_row[-1])
+
+
+def local_score_affine(seq_1, seq_2, encoded_matrix, gap_open, gap_extend):
+    """Gotoh local score only, returns the same (score, end row, end col) as local_score_numpy"""
+    index, dense = encoded_matrix
+    codes_1 = encode_sequence(seq_1, index)
+    codes_2 = encode_sequence(seq_2, index)
+    m = len(codes_2)
+    extend_steps = gap_extend * np.arange(m + 1, dtype=np.int64)
+
+    h_row = np.zeros(m + 1, dtype=np.int64)
+    f_row = np.full(m + 1, NEG_INF, dtype=np.int64)
+    max_score, max_row, max_col = 0, 0, 0
+    for i in range(1, len(codes_1) + 1):
+        h_row, f_row = _affine_row(h_row, f_row, dense[codes_1[i - 1]][codes_2], 0, gap_open, gap_extend,
+                                   extend_steps, True)[:2]
+        col = int(np.argmax(h_row))
+        if h_row[col] > max_score:
+            max_score, max_row, max_col = int(h_row[col]), i, col
+    return max_score, max_row, max_col
+
+
+# BANDED GLOBAL ALIGNMENT
+# Only cells with lo <= j - i <= hi are computed, where the band always contains the main diagonal and the diagonal
+# through the bottom right corner, widened by `bandwidth` on both sides. Row i is stored as band[i, b] with
+# j = i + lo + b, so in band coordinates: diagonal = previous row [b], up = previous row [b + 1], left = this row [b - 1]
+
+
+def estimate_bandwidth(len_1, len_2):
+    """Starting bandwidth when none is given - small, widening takes care of harder pairs"""
+    return max(16, max(len_1, len_2) // 100)
+
+
+def _banded_pass(codes_1, codes_2, seq_1, seq_2, dense, gap_penalty, bandwidth):
+    """
+    One banded Needleman-Wunsch fill + traceback
+    :return: score, [aligned seq 1, aligned seq 2], whether the band covers the full matrix
+    """
+    n, m = len(codes_1), len(codes_2)
+    lo = min(0, m - n) - bandwidth
+    hi = max(0, m - n) + bandwidth
+    width = hi - lo + 1
+    offsets = np.arange(width)
+    gap_steps = gap_penalty * offsets
+    padded_codes_2 = np.concatenate((codes_2, [0]))  # keeps lookups in range for band cells outside the matrix
+
+    score_band = np.full((n + 1, width), NEG_INF, dtype=np.int64)
+    traceback_band = np.zeros((n + 1, width), dtype=np.int8)
+    cols = lo + offsets
+    inside = (cols >= 0) & (cols <= m)
+    score_band[0, inside] = gap_penalty * cols[inside]  # gap row
+    traceback_band[0, inside & (cols > 0)] = 3
+
+    up = np.empty(width, dtype=np.int64)
+    for i in range(1, n + 1):
+        cols = i + lo + offsets
+        inside = (cols >= 0) & (cols <= m)
+        prev = score_band[i - 1]
+
+        sub_row = dense[codes_1[i - 1]][padded_codes_2[np.clip(cols - 1, 0, m)]]
+        diagonal = np.where(inside & (cols >= 1), prev + sub_row, NEG_INF)
+        up[:-1] = prev[1:] + gap_penalty
+        up[-1] = NEG_INF
+        up = np.where(inside, up, NEG_INF)
+
+        best = np.maximum(diagonal, up)
+        row = np.maximum.accumulate(best - gap_steps) + gap_steps
+        row = np.where(inside, row, NEG_INF)
+        left = np.empty(width, dtype=np.int64)
+        left[0] = NEG_INF
+        left[1:] = row[:-1] + gap_penalty
+
+        score_band[i] = row
+        traceback_band[i] = np.where(inside, _moves(diagonal, up, left), 0)
+
+    aligned_1, aligned_2 = [], []
+    i, b = n, m - n - lo
+    while i > 0 or i + lo + b > 0:
+        j = i + lo + b
+        move = traceback_band[i, b]
+        if move == 1:  # diagonal move
+            aligned_1.append(seq_1[i - 1])
+            aligned_2.append(seq_2[j - 1])
+            i -= 1
+        elif move == 3:  # left move -> gap in the first seq
+            aligned_1.append("-")
+            aligned_2.append(seq_2[j - 1])
+            b -= 1
+        else:  # up move -> gap in the second seq
+            aligned_1.append(seq_1[i - 1])
+            aligned_2.append("-")
+            i -= 1
+            b += 1
+    aligned = ["".join(reversed(aligned_1)), "".join(reversed(aligned_2))]
+    return int(score_band[n, m - n - lo]), aligned, lo <= -n and hi >= m
+
+
+def _outside_band_bound(codes_1, codes_2, dense, gap_penalty, bandwidth):
+    """
+    Upper bound on the score of any path that leaves the band
+    \n such a path reaches a diagonal bandwidth + 1 past the band's main or corner diagonal and has to come back, so it
+    has at least g = |n - m| + 2 * (bandwidth + 1) gap steps and at most k = (n + m - g) / 2 matches. A path with k'
+    matches scores at most the k' best per-residue maxima (each residue against the best residue of the other
+    sequence) plus (n + m - 2k') gaps - the bound is the best of that over every k' <= k
+    """
+    n, m = len(codes_1), len(codes_2)
+    most_matches = (n + m - abs(n - m)) // 2 - (bandwidth + 1)
+    if most_matches < 0:
+        return NEG_INF
+    best_1 = np.sort(dense[:, np.unique(codes_2)].max(axis=1)[codes_1])[::-1]  # best score each residue could get
+    best_2 = np.sort(dense[np.unique(codes_1)].max(axis=0)[codes_2])[::-1]
+    prefix = np.zeros(most_matches + 1, dtype=np.int64)  # prefix[k'] = best total of k' matches
+    prefix[1:] = np.minimum(np.cumsum(best_1[:most_matches]), np.cumsum(best_2[:most_matches]))
+    matches = np.arange(most_matches + 1)
+    return int((prefix + gap_penalty * (n + m - 2 * matches)).max())
+
+
+def banded_numpy(seq_1, seq_2, encoded_matrix, gap_penalty, bandwidth=None, widen=True):
+    """
+    Banded Needleman-Wunsch for near-identical sequences, O((n + m) * bandwidth) time and memory
+    The result equals the full matrix one when the optimal path stays inside the band. With widen=True the band is
+    doubled until its score is at least the best score any path leaving the band could reach (or the band covers the
+    whole matrix), so the score is always the optimal one.
+    :param encoded_matrix: (index, dense) tuple from encode_sub_matrix
+    :param bandwidth: cells allowed on each side of the diagonal, None -> estimate_bandwidth
+    :return: optimal score, [aligned seq 1, aligned seq 2], bandwidth of the accepted pass
+    """
+    index, dense = encoded_matrix
+    codes_1 = encode_sequence(seq_1, index)
+    codes_2 = encode_sequence(seq_2, index)
+    if bandwidth is None:
+        bandwidth = estimate_bandwidth(len(codes_1), len(codes_2))
+
+    while True:
+        score, aligned, full_matrix = _banded_pass(codes_1, codes_2, seq_1, seq_2, dense, gap_penalty, bandwidth)
+        if (not widen or full_matrix
+                or score >= _outside_band_bound(codes_1, codes_2, dense, gap_penalty, bandwidth)):
+            return score, aligned, bandwidth
+        bandwidth = max(2 * bandwidth, 1)
+
+
+# SEMI-GLOBAL (end-gap-free) ALIGNMENT
+# Needleman-Wunsch where gaps at chosen ends cost nothing, e.g. a short read (seq 1) against a longer reference
+# (seq 2): free_start_1/free_end_1 let the reference overhang the read on either side without penalty, while the read
+# itself is aligned end to end. Free start gaps -> the gap row/column is all 0s. Free end gaps -> the alignment may
+# end anywhere on the last row (free_end_1) or last column (free_end_2), and the rest is appended as free gaps.
+
+
+def _semi_global_end(last_row, last_col, free_end_1, free_end_2):
+    """
+    Cell the traceback starts from: the bottom right corner, unless a free end gap gives a better score
+    (ties keep the corner, then the first cell of the last row, then the first cell of the last column)
+    :return: score, row, col
+    """
+    n, m = len(last_col) - 1, len(last_row) - 1
+    best = (int(last_row[m]), n, m)
+    if free_end_1:
+        col = int(np.argmax(last_row))
+        if last_row[col] > best[0]:
+            best = (int(last_row[col]), n, col)
+    if free_end_2:
+        row = int(np.argmax(last_col))
+        if last_col[row] > best[0]:
+            best = (int(last_col[row]), row, m)
+    return best
+
+
+def _overlap_spans(aligned, len_1, len_2):
+    """
+    Slice indices of the part of each sequence that lies inside the overlap, i.e. between the first and last column
+    holding a residue of the other sequence - for a read against a reference, span 2 is the mapped reference region
+    """
+    lead_1 = len(aligned[0]) - len(aligned[0].lstrip("-"))  # leading gap columns of seq 1 hold seq 2 residues only
+    trail_1 = len(aligned[0]) - len(aligned[0].rstrip("-"))
+    lead_2 = len(aligned[1]) - len(aligned[1].lstrip("-"))
+    trail_2 = len(aligned[1]) - len(aligned[1].rstrip("-"))
+    if lead_1 == len(aligned[0]) or lead_2 == len(aligned[1]):  # one sequence is empty or all gaps - no overlap
+        return (0, 0), (0, 0)
+    return (lead_2, len_1 - trail_2), (lead_1, len_2 - trail_1)
+
+
+def semi_global_numpy(seq_1, seq_2, encoded_matrix, gap_penalty, free_start_1=True, free_end_1=True,
+                      free_start_2=False, free_end_2=False, buffers=None):
+    """
+    Semi-global alignment with the full (packed) traceback
+    :param encoded_matrix: (index, dense) tuple from encode_sub_matrix
+    :param free_start_1: gaps in seq 1 before its first residue are free (seq 2 may stick out on the left)
+    :param free_end_1: gaps in seq 1 after its last residue are free (seq 2 may stick out on the right)
+    :param free_start_2: same for gaps in seq 2 before its first residue
+    :param free_end_2: same for gaps in seq 2 after its last residue
+    :param buffers: optional DPBuffers, same as needleman_wunsch_numpy
+    :return: score, [aligned seq 1, aligned seq 2], (start, end) in seq 1, (start, end) in seq 2 - the spans are
+    slice indices of the overlap (see _overlap_spans), so with the defaults seq_2[start:end] is where seq 1 maps
+    """
+    index, dense = encoded_matrix
+    codes_1 = encode_sequence(seq_1, index)
+    codes_2 = encode_sequence(seq_2, index)
+    n, m = len(codes_1), len(codes_2)
+    score_matrix, traceback_matrix = _nw_fill(codes_1, codes_2, dense, gap_penalty, buffers, free_start_1,
+                                              free_start_2, "sg")
+    score, row, col = _semi_global_end(score_matrix[n], score_matrix[:, m], free_end_1, free_end_2)
+
+    aligned_1, aligned_2 = _global_traceback(traceback_matrix, seq_1, seq_2, row, col)
+    aligned = [aligned_1 + seq_1[row:] + "-" * (m - col), aligned_2 + "-" * (n - row) + seq_2[col:]]
+    span_1, span_2 = _overlap_spans(aligned, n, m)
+    return score, aligned, span_1, span_2
+
+
+def semi_global_score_numpy(seq_1, seq_2, encoded_matrix, gap_penalty, free_start_1=True, free_end_1=True,
+                            free_start_2=False, free_end_2=False):
+    """
+    Semi-global score only - rolls a single row through the matrix like global_score_numpy
+    :return: score, end row, end col (the cell semi_global_numpy starts its traceback from)
+    """
+    index, dense = encoded_matrix
+    codes_1 = encode_sequence(seq_1, index)
+    codes_2 = encode_sequence(seq_2, index)
+    n, m = len(codes_1), len(codes_2)
+    gap_steps = gap_penalty * np.arange(m + 1, dtype=np.int64)
+
+    row = np.zeros(m + 1, dtype=np.int64) if free_start_1 else gap_steps.copy()
+    last_col = np.empty(n + 1, dtype=np.int64)  # only needed for free_end_2, but it's just one value per row
+    last_col[0] = row[m]
+    for i in range(1, n + 1):
+        first_cell = 0 if free_start_2 else gap_penalty * i
+        row = _fill_row(row, dense[codes_1[i - 1]][codes_2], gap_penalty, gap_steps, first_cell, None)[0]
+        last_col[i] = row[m]
+    return _semi_global_end(row, last_col, free_end_1, free_end_2)
+
+
+# TOP-K LOCAL ALIGNMENTS (Waterman-Eggert)
+# After each hit, the cells on its path are masked (forced to 0, so no later hit can reuse an aligned pair) and only
+# the region below and right of the hit is refilled, row by row until a row comes out unchanged. Each row's best cell
+# sits in a heap (one live entry per row, entries from before a refill are skipped), so every next hit is a heap pop
+# instead of a scan of the whole matrix.
+
+
+def _masked_row(prev_row, sub_row, first_cell, mask_row, gap_penalty, gap_steps):
+    """
+    Smith-Waterman row fill (columns start..m) where masked cells are held at 0
+    The left-move running max restarts at every masked cell: each cell gets its segment number times a big offset
+    before the cumulative max, so no gap run can carry a score across a masked cell.
+    :return: new row (first_cell followed by the filled columns), traceback codes of the filled columns
+    """
+    diagonal = prev_row[:-1] + sub_row
+    up = prev_row[1:] + gap_penalty
+    candidates = np.empty(len(prev_row), dtype=np.int64)
+    candidates[0] = first_cell
+    candidates[1:] = np.maximum(np.maximum(diagonal, up), 0)
+    candidates[1:][mask_row] = 0
+
+    segment_offset = np.zeros(len(prev_row), dtype=np.int64)
+    segment_offset[1:] = np.cumsum(mask_row) * (int(candidates.max()) - int(gap_steps[-1]) + 1)
+    row = np.maximum.accumulate(candidates - gap_steps + segment_offset) - segment_offset + gap_steps
+    row[1:][mask_row] = 0
+
+    left = row[:-1] + gap_penalty
+    moves = np.where(row[1:] <= 0, 0, _moves(diagonal, up, left))
+    moves[mask_row] = 0
+    return row, moves
+
+
+def _best_cell(row):
+    """Best score of a row and its first column"""
+    col = int(np.argmax(row))
+    return int(row[col]), col
+
+
+def waterman_eggert_numpy(seq_1, seq_2, encoded_matrix, gap_penalty, k, min_score=1, buffers=None):
+    """
+    Top-k local alignments that share no aligned cell, best first (ties -> first cell in row order, like max_mat)
+    :param encoded_matrix: (index, dense) tuple from encode_sub_matrix
+    :param k: most alignments returned
+    :param min_score: stop once the best remaining alignment scores below this
+    :param buffers: optional DPBuffers / DiskBuffers for the score, traceback and mask matrices
+    :return: list of (score, [aligned seq 1, aligned seq 2], (start, end) in seq 1, (start, end) in seq 2) - the
+    spans are slice indices, e.g. seq_1[start:end]
+    """
+    index, dense = encoded_matrix
+    codes_1 = encode_sequence(seq_1, index)
+    codes_2 = encode_sequence(seq_2, index)
+    n, m = len(codes_1), len(codes_2)
+    gap_steps = gap_penalty * np.arange(m + 1, dtype=np.int64)
+
+    score_matrix = _alloc(buffers, "we_score", (n + 1, m + 1), np.int64, True)
+    traceback_matrix = _alloc(buffers, "we_traceback", (n + 1, m + 1), np.int8, True)
+    mask = _alloc(buffers, "we_mask", (n + 1, m + 1), bool, True)
+    row_best = [(0, 0)] * (n + 1)  # (score, first column) of each row's best cell
+    heap = []  # (-score, row, col) - first row, then first column wins ties
+
+    def refill(row, start):
+        """Refills row from column start, returns the first column whose score changed (None if nothing did)"""
+        new_row, moves = _masked_row(score_matrix[row - 1, start - 1:], dense[codes_1[row - 1]][codes_2[start - 1:]],
+                                     score_matrix[row, start - 1], mask[row, start:], gap_penalty,
+                                     gap_steps[:m - start + 2])
+        changed = np.flatnonzero(new_row[1:] != score_matrix[row, start:])
+        score_matrix[row, start:] = new_row[1:]
+        traceback_matrix[row, start:] = moves
+        best = _best_cell(score_matrix[row])
+        if best != row_best[row] and best[0] >= min_score:  # an unchanged best keeps its live heap entry
+            heapq.heappush(heap, (-best[0], row, best[1]))
+        row_best[row] = best
+        return start + int(changed[0]) if len(changed) else None
+
+    for row in range(1, n + 1):
+        refill(row, 1)
+
+    hits = []
+    while heap and len(hits) < k:
+        neg_score, end_row, end_col = heapq.heappop(heap)
+        if row_best[end_row] != (-neg_score, end_col):
+            continue  # stale entry, the row was refilled since
+        path_rows, path_cols = [], []
+        aligned_1, aligned_2 = [], []
+        row, col = end_row, end_col
+        while traceback_matrix[row, col] > 0:
+            path_rows.append(row)
+            path_cols.append(col)
+            move = traceback_matrix[row, col]
+            if move == 1:  # diagonal move
+                aligned_1.append(seq_1[row - 1])
+                aligned_2.append(seq_2[col - 1])
+                row -= 1
+                col -= 1
+            elif move == 3:  # left move -> gap in the first seq
+                aligned_1.append("-")
+                aligned_2.append(seq_2[col - 1])
+                col -= 1
+            else:  # up move -> gap in the second seq
+                aligned_1.append(seq_1[row - 1])
+                aligned_2.append("-")
+                row -= 1
+        hits.append((-neg_score, ["".join(reversed(aligned_1)), "".join(reversed(aligned_2))],
+                     (row, end_row), (col, end_col)))
+        if len(hits) == k:
+            break
+
+        # mask the path, then refill from its top left corner down until a row below the hit comes out unchanged
+        mask[path_rows, path_cols] = True
+        first_col = min(path_cols)
+        start = first_col
+        for refill_row in range(min(path_rows), n + 1):
+            changed = refill(refill_row, start)
+            if refill_row >= end_row:
+                if changed is None:
+                    break
+                start = max(first_col, changed)
+    return hits
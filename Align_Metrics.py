@@ -0,0 +1,158 @@
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+# Opt-in instrumentation for SequenceAlign and MultipleAlignment
+# An AlignMetrics object given as metrics= (or set on .metrics later) collects wall time, DP cell counts and matrix
+# sizes per phase - nw_fill, nw_traceback, nw_path, sw_..., msa_consensus, plot etc. Phases wrap whole calls, never
+# single cells, and with metrics=None every phase is a shared no-op context, so disabled instrumentation costs one
+# attribute check per call. ProfileSession additionally runs a block under cProfile and tracemalloc.
+
+logger = logging.getLogger("alignment.metrics")
+
+NO_PHASE = nullcontext()  # reusable no-op phase handed out while instrumentation is off
+
+
+def matrix_bytes(matrix):
+    """Memory held by a DP matrix - NumPy array, PackedTraceback / PathMatrix, or nested lists (list storage only)"""
+    if matrix is None:
+        return 0
+    if hasattr(matrix, "nbytes"):  # NumPy array or PackedTraceback
+        return int(matrix.nbytes)
+    if hasattr(matrix, "cells"):  # PathMatrix - one (row, col) tuple per path cell
+        return sys.getsizeof(matrix.cells) + sum(sys.getsizeof(cell) for cell in matrix.cells)
+    return sys.getsizeof(matrix) + sum(sys.getsizeof(row) for row in matrix)
+
+
+class Instrumented:
+    """Base for the classes that take metrics= (SequenceAlign, MultipleAlignment) - self.metrics may be None"""
+    metrics = None
+
+    def phase(self, name, cells=0):
+        """Times a phase into self.metrics - a shared no-op context when instrumentation is off"""
+        if self.metrics is None:
+            return NO_PHASE
+        return self.metrics.phase(name, cells)
+
+
+class PhaseTimer:
+    """Context manager for one phase, adds its time and cells to the metrics when it finishes without an error"""
+    def __init__(self, metrics, name, cells):
+        self.metrics = metrics
+        self.name = name
+        self.cells = cells
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.metrics.add(self.name, time.perf_counter() - self.start, self.cells)
+
+
+class AlignMetrics:
+    """
+    Per phase totals: calls, seconds, cells (DP cells computed) and bytes (matrix memory allocated)
+    \n one object can be shared, e.g. a MultipleAlignment hands its metrics to the pairwise aligner it uses
+    """
+    def __init__(self, log_phases=False):
+        """:param log_phases: also log every finished phase (DEBUG level, "alignment.metrics" logger)"""
+        self.log_phases = log_phases
+        self.phases = {}
+
+    def phase(self, name, cells=0):
+        """with metrics.phase("nw_fill", cells): ... times the block"""
+        return PhaseTimer(self, name, cells)
+
+    def totals(self, name):
+        if name not in self.phases:
+            self.phases[name] = {"calls": 0, "seconds": 0.0, "cells": 0, "bytes": 0}
+        return self.phases[name]
+
+    def add(self, name, seconds, cells=0):
+        totals = self.totals(name)
+        totals["calls"] += 1
+        totals["seconds"] += seconds
+        totals["cells"] += cells
+        if self.log_phases:
+            logger.debug("%s: %.3f ms, %d cells", name, 1000 * seconds, cells)
+
+    def add_bytes(self, name, nbytes):
+        """Adds matrix memory to a phase (without counting another call)"""
+        self.totals(name)["bytes"] += nbytes
+
+    def reset(self):
+        self.phases = {}
+
+    def as_dict(self):
+        """Copy of the totals, with cells_per_second added for phases that computed cells"""
+        report = {}
+        for name, totals in self.phases.items():
+            report[name] = dict(totals)
+            if totals["cells"] and totals["seconds"] > 0:
+                report[name]["cells_per_second"] = totals["cells"] / totals["seconds"]
+        return report
+
+    def log(self, level=logging.INFO, target=None):
+        """Emits one line per phase, slowest first, through logging (target=None -> the "alignment.metrics" logger)"""
+        target = target or logger
+        for name, totals in sorted(self.phases.items(), key=lambda item: -item[1]["seconds"]):
+            target.log(level, "%-16s %6d calls %10.3f ms %12d cells %12d bytes", name, totals["calls"],
+                       1000 * totals["seconds"], totals["cells"], totals["bytes"])
+
+
+class ProfileSession:
+    """
+    Runs a block under cProfile and tracemalloc and collects phase metrics at the same time, e.g.
+    \n with ProfileSession() as session:
+    \n     aligner = SequenceAlign(sub_matrix, -8, metrics=session.metrics) ...
+    \n print(session.stats_text()); session.as_dict()
+    """
+    def __init__(self, metrics=None, cprofile=True, trace_memory=True):
+        self.metrics = metrics if metrics is not None else AlignMetrics()
+        self.profiler = cProfile.Profile() if cprofile else None
+        self.trace_memory = trace_memory
+        self.started_tracing = False  # only stop tracemalloc on exit if this session started it
+        self.wall_seconds = None
+        self.peak_bytes = None
+        self.start = None
+
+    def __enter__(self):
+        if self.trace_memory:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                self.started_tracing = True
+        if self.profiler is not None:
+            self.profiler.enable()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.wall_seconds = time.perf_counter() - self.start
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.trace_memory:
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+            if self.started_tracing:
+                tracemalloc.stop()
+                self.started_tracing = False
+
+    def stats_text(self, sort="cumulative", top=20):
+        """The top functions of the cProfile run as text"""
+        if self.profiler is None:
+            return ""
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats(sort).print_stats(top)
+        return stream.getvalue()
+
+    def as_dict(self):
+        return {"wall_seconds": self.wall_seconds, "peak_bytes": self.peak_bytes, "phases": self.metrics.as_dict()}
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from MultipleAlign import MultipleAlignment
+from Pool_Worker import init_worker, worker
+
+# asyncio alignment service - local HTTP/JSON endpoint
+# Requests are parsed on the event loop and put on a bounded queue (full queue -> 503, the client should retry).
+# A batcher task takes whatever has queued up (up to batch_size jobs, waiting at most batch_wait seconds for more)
+# and runs the batch on a process pool, so the DP never blocks the loop. At most one batch per worker is in flight;
+# while all workers are busy the queue fills up and new requests are turned away.
+#   POST /align  {"seq1": "...", "seq2": "...", "mode": "global" | "local"}  -> {"score": .., "aligned": [.., ..]}
+#   POST /msa    {"sequences": [...], "method": "progressive" | "upgma" | "nj"} -> {"aligned": [...]}
+#   GET  /stats  -> queue depth, in-flight jobs, counters and latency percentiles
+
+def _run_job(kind, payload):
+    """Runs one job in a worker, returns the JSON result"""
+    if kind == "align":
+        mode = payload.get("mode", "global")
+        aligner = worker.aligner  # built once per worker process by Pool_Worker.init_worker
+        aligner.set_sequences(payload["seq1"], payload["seq2"])
+        if mode == "global":
+            aligner.gen_global_data("numpy")
+            return {"score": aligner.nw_optimal_alignment, "aligned": aligner.nw_result}
+        if mode == "local":
+            aligner.gen_local_data("numpy")
+            return {"score": aligner.sw_optimal_alignment, "aligned": aligner.sw_result}
+        raise ValueError("Invalid mode - Choose from: global or local")
+
+    sub_matrix, gap_penalty, gap_open, gap_extend = worker.scoring
+    method = payload.get("method", "progressive")
+    msa = MultipleAlignment(payload["sequences"], sub_matrix, gap_penalty, gap_open, gap_extend, engine="numpy")
+    if method == "progressive":
+        aligned = msa.global_progressive_align()
+    elif method in ("upgma", "nj"):
+        aligned = msa.guide_tree_align(method, workers=1)  # already inside a pool worker
+    else:
+        raise ValueError("Invalid method - Choose from: progressive, upgma or nj")
+    if aligned is None:
+        raise ValueError("You need more than two sequences to run Multiple Sequence Alignment")
+    return {"aligned": aligned}
+
+
+def _run_batch(jobs):
+    """Work unit - runs a batch of (kind, payload) jobs, a failing job doesn't take the rest of the batch down"""
+    results = []
+    for kind, payload in jobs:
+        try:
+            results.append((200, _run_job(kind, payload)))
+        except (AttributeError, KeyError, TypeError, ValueError) as error:
+            results.append((400, {"error": f"{type(error).__name__}: {error}"}))
+    return results
+
+
+class AlignmentServer:
+    """
+    Local alignment service, e.g. asyncio.run(AlignmentServer(sub_matrix, -8).serve_forever())
+    \n workers are spawned processes, so start it under if __name__ == "__main__":
+    """
+    def __init__(self, sub_matrix, gap_penalty, gap_open=None, gap_extend=None, host="127.0.0.1", port=8765,
+                 workers=None, queue_size=256, batch_size=32, batch_wait=0.005):
+        """
+        :param port: 0 -> any free port (see self.port after start)
+        :param workers: worker processes (None -> one per core)
+        :param queue_size: jobs allowed to wait - further requests get 503 until the queue drains
+        :param batch_size: most jobs sent to a worker at once
+        :param batch_wait: seconds the batcher waits for more jobs before sending a partial batch
+        """
+        self.init_args = ((sub_matrix, gap_penalty, gap_open, gap_extend),)  # Pool_Worker.init_worker arguments
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+
+        self.queue = None
+        self.pool = None
+        self.server = None
+        self.batcher = None
+        self.slots = None  # one per worker, limits batches in flight
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.running = set()  # batch tasks, referenced here so they aren't garbage collected mid-run
+        self.latencies = deque(maxlen=1000)  # seconds from enqueue to result, most recent jobs
+
+    async def start(self):
+        """Starts the pool, the batcher and the HTTP listener"""
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.slots = asyncio.Semaphore(self.workers)
+        # spawned, not forked - a forked worker would inherit the open client sockets and keep them from closing
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=init_worker, initargs=self.init_args)
+        self.batcher = asyncio.create_task(self.batch_loop())
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.batcher.cancel()
+        try:
+            await self.batcher
+        except asyncio.CancelledError:
+            pass
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def submit(self, kind, payload):
+        """Queues one job and waits for its (status, result) - 503 right away when the queue is full"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((kind, payload, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return 503, {"error": "Queue full - retry later"}
+        return await future
+
+    async def batch_loop(self):
+        """Collects queued jobs into batches and hands them to the pool, one batch per free worker"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.slots.acquire()
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.batches += 1
+            self.in_flight += len(batch)
+            task = asyncio.create_task(self.run_batch(batch))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+
+    async def run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            jobs = [(kind, payload) for kind, payload, _, _ in batch]
+            results = await loop.run_in_executor(self.pool, _run_batch, jobs)
+        except Exception as error:  # worker crashed - fail the whole batch instead of leaving requests hanging
+            results = [(500, {"error": f"{type(error).__name__}: {error}"})] * len(batch)
+        finally:
+            self.in_flight -= len(batch)
+            self.slots.release()
+        now = time.perf_counter()
+        for (_, _, future, queued_at), (status, result) in zip(batch, results):
+            self.latencies.append(now - queued_at)
+            if status == 200:
+                self.completed += 1
+            else:
+                self.failed += 1
+            if not future.done():  # the client may have disconnected
+                future.set_result((status, result))
+
+    def stats(self):
+        """Queue depth, in-flight jobs, counters and latency (ms) over the most recent jobs"""
+        latencies = sorted(self.latencies)
+        latency = {}
+        if latencies:
+            latency = {"mean": 1000 * sum(latencies) / len(latencies),
+                       "p50": 1000 * latencies[len(latencies) // 2],
+                       "p95": 1000 * latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+                       "max": 1000 * latencies[-1]}
+        return {"queue_depth": self.queue.qsize(), "queue_size": self.queue_size, "in_flight": self.in_flight,
+                "completed": self.completed, "failed": self.failed, "rejected": self.rejected,
+                "batches": self.batches,
+                "mean_batch_size": (self.completed + self.failed) / self.batches if self.batches else 0.0,
+                "latency_ms": latency}
+
+    async def handle_connection(self, reader, writer):
+        """Minimal HTTP/1.1 - one JSON request per connection"""
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            status, result = await self.route(request_line, body)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            status, result = 400, {"error": "Malformed HTTP request"}
+        payload = json.dumps(result).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error",
+                  503: "Service Unavailable"}[status]
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def route(self, request_line, body):
+        if len(request_line) < 2:
+            return 400, {"error": "Malformed HTTP request"}
+        method, path = request_line[0], request_line[1]
+        if method == "GET" and path == "/stats":
+            return 200, self.stats()
+        if method == "POST" and path in ("/align", "/msa"):
+            try:
+                payload = json.loads(body or b"{}")
+            except json.JSONDecodeError as error:
+                return 400, {"error": f"Invalid JSON: {error}"}
+            if not isinstance(payload, dict):
+                return 400, {"error": "Request body must be a JSON object"}
+            return await self.submit(path[1:], payload)
+        return 404, {"error": f"Unknown endpoint {method} {path} - use POST /align, POST /msa or GET /stats"}
+
+
+async def request_json(host, port, method, path, payload=None):
+    """Small client for the service (and its tests) - returns (status, decoded JSON)"""
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(content)
@@ -0,0 +1,146 @@
+import numpy as np
+from Pool_Worker import map_work, worker
+from Fasta_IO import iter_chunks, iter_sequences
+
+
+def _align_chunk(pairs, mode, measure):
+    """Work unit - aligns a chunk of (i, j) index pairs of the worker's sequence list, returns (i, j, value) triples"""
+    sequences = worker.data
+    return [(i, j, pair_value(worker.aligner, sequences[i], sequences[j], mode, measure)) for i, j in pairs]
+
+
+def _align_records(records, mode, measure):
+    """Work unit for stream() - aligns a chunk of (name, seq) records against every worker sequence"""
+    return [(name, np.array([pair_value(worker.aligner, seq, reference, mode, measure) for reference in worker.data]))
+            for name, seq in records]
+
+
+def identity(aligned_seqs):
+    """Fraction of alignment columns where both sequences have the same residue"""
+    if not aligned_seqs[0]:
+        return 0.0
+    matches = sum(1 for char_1, char_2 in zip(aligned_seqs[0], aligned_seqs[1]) if char_1 == char_2 and char_1 != "-")
+    return matches / len(aligned_seqs[0])
+
+
+def pair_value(aligner, seq1, seq2, mode, measure):
+    """
+    Aligns one pair with an existing SequenceAlign
+    :param mode: "global" or "local"
+    :param measure: "score" (score-only fast path) or "identity" (needs the aligned sequences)
+    """
+    if measure == "score":
+        if mode == "global":
+            return aligner.global_score(seq1, seq2)
+        return aligner.local_score(seq1, seq2)[0]
+    aligner.set_sequences(seq1, seq2)
+    if mode == "global":
+        aligner.gen_global_data("numpy")
+        return identity(aligner.nw_result)
+    aligner.gen_local_data("numpy")
+    return identity(aligner.sw_result)
+
+
+class BatchAlignment:
+    """
+    All-vs-all pairwise alignment of a sequence collection on a process pool
+    """
+    def __init__(self, sub_matrix, gap_penalty, gap_open=None, gap_extend=None, mode="global", workers=None,
+                 chunk_size=256, cache_path=None):
+        """
+        :param mode: "global" (Needleman-Wunsch) or "local" (Smith-Waterman)
+        :param workers: number of worker processes (None -> one per core, 1 -> run in this process)
+        :param chunk_size: number of pairs sent to a worker at a time
+        :param cache_path: optional SQLite result cache (Result_Cache) shared by the workers and across runs - used
+        by the "identity" measure, "score" already takes the score-only fast path
+        """
+        if mode not in ("global", "local"):
+            raise ValueError("Invalid mode - Choose from: global or local")
+        self.sub_matrix = sub_matrix
+        self.gap_penalty = gap_penalty
+        self.gap_open = gap_open
+        self.gap_extend = gap_extend
+        self.mode = mode
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.cache_path = cache_path
+        self.names = []
+
+    def load(self, sequences):
+        """Accepts a list of sequences or a FASTA/FASTQ filename, returns the upper-cased sequences + stores names"""
+        if isinstance(sequences, str):
+            records = list(iter_sequences(sequences))
+            self.names = [name for name, _ in records]
+            return [seq for _, seq in records]
+        self.names = [f"seq_{i}" for i in range(len(sequences))]
+        return [seq.upper() for seq in sequences]
+
+    def chunks(self, n):
+        """Yields the upper triangle (diagonal included) of an n x n matrix as lists of (i, j) pairs"""
+        chunk = []
+        for i in range(n):
+            for j in range(i, n):
+                chunk.append((i, j))
+                if len(chunk) == self.chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    def run(self, sequences, measure="identity", upper_triangle=False):
+        """
+        Aligns every pair of sequences
+        :param sequences: list of sequences or FASTA filename
+        :param measure: "score" or "identity"
+        :param upper_triangle: only fill i <= j, leave the lower triangle at 0
+        :return: N x N NumPy array
+        """
+        if measure not in ("score", "identity"):
+            raise ValueError("Invalid measure - Choose from: score or identity")
+        seqs = self.load(sequences)
+        n = len(seqs)
+        result = np.zeros((n, n), dtype=np.int64 if measure == "score" else np.float64)
+        init_args = (self.scoring(), seqs, self.cache_path)
+
+        self.collect(self.map_chunks(_align_chunk, self.chunks(n), (self.mode, measure), init_args), result,
+                     upper_triangle)
+        return result
+
+    def map_chunks(self, function, work_units, args, init_args):
+        """Runs work units on the process pool (or in this process when workers=1), yields results in order"""
+        return map_work(function, work_units, args, init_args, self.workers)
+
+    def scoring(self):
+        """(sub_matrix, gap_penalty, gap_open, gap_extend) for Pool_Worker.init_worker"""
+        return self.sub_matrix, self.gap_penalty, self.gap_open, self.gap_extend
+
+    def stream(self, records, references, measure="score"):
+        """
+        Aligns a stream of records against a fixed list of reference sequences
+        Records are read lazily chunk_size at a time and only a couple of chunks per worker are in flight, so memory
+        stays bounded however long the input is (e.g. records = Fasta_IO.iter_sequences("reads.fa.gz")).
+        :param records: iterable of (name, sequence)
+        :param references: list of sequences every record is aligned against
+        :param measure: "score" or "identity"
+        :return: generator of (name, array of one value per reference), in input order
+        """
+        if measure not in ("score", "identity"):
+            raise ValueError("Invalid measure - Choose from: score or identity")
+        init_args = (self.scoring(), [seq.upper() for seq in references], self.cache_path)
+        upper_records = ((name, seq.upper()) for name, seq in records)
+        for chunk_result in self.map_chunks(_align_records, iter_chunks(upper_records, self.chunk_size),
+                                            (self.mode, measure), init_args):
+            yield from chunk_result
+
+    @staticmethod
+    def collect(chunk_results, result, upper_triangle):
+        """Writes worker results into the matrix, mirrored unless only the upper triangle is wanted"""
+        for chunk_result in chunk_results:
+            for i, j, value in chunk_result:
+                result[i, j] = value
+                if not upper_triangle:
+                    result[j, i] = value
+
+    def distance_matrix(self, sequences):
+        """Pairwise distances (1 - identity) for every pair of sequences"""
+        return 1.0 - self.run(sequences, "identity")
@@ -0,0 +1,228 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import numpy as np
+from MultipleAlign import MultipleAlignment
+from Sequence_Align_Toolkit import SequenceAlign
+from Sub_Matrix_Gen import SubstitutionMatrix
+
+# Benchmark harness for the pairwise and multiple alignment engines
+# Synthetic sequences are drawn from the SubstitutionMatrix alphabets with a fixed seed: a random ancestor plus copies
+# mutated down to the requested identity, so every run (and every machine) aligns the same pairs.
+# Each step is timed repeats times (best and median kept), then run once more under tracemalloc for its peak memory -
+# tracing slows Python code down, so it never overlaps the timed runs. Results are saved as JSON and compare_results
+# lists the steps that got slower than a saved baseline.
+#   python Benchmark.py --lengths 100 250 500 --output bench.json --compare baseline.json
+
+PAIRWISE_STEPS = ("nw_fill", "nw_traceback", "nw_path", "sw_fill", "sw_traceback", "sw_path")
+
+
+def sequence_alphabet(seq_type):
+    """Residues of the default substitution matrix of a biotype (protein, DNA or RNA)"""
+    sub_matrix = SubstitutionMatrix(seq_type).auto_load()
+    return "".join(sorted({pair[0] for pair in sub_matrix}))
+
+
+def random_sequence(alphabet, length, rng):
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def mutate(seq, identity, alphabet, rng, indel_rate=0.0):
+    """
+    Copy of seq in which about (1 - identity) of the positions are replaced by a different residue
+    :param indel_rate: fraction of positions that also get a one residue insertion or deletion
+    """
+    mutated = []
+    for char in seq:
+        if rng.random() < indel_rate:
+            if rng.random() < 0.5:
+                continue  # deletion
+            mutated.append(rng.choice(alphabet))  # insertion
+        if rng.random() >= identity:
+            char = rng.choice([other for other in alphabet if other != char])
+        mutated.append(char)
+    return "".join(mutated)
+
+
+def related_sequences(seq_type, length, count, identity=0.8, indel_rate=0.0, seed=0):
+    """count sequences mutated from one random ancestor of the given length - the same seed gives the same set"""
+    rng = random.Random(f"{seed}-{seq_type}-{length}-{count}")
+    alphabet = sequence_alphabet(seq_type)
+    ancestor = random_sequence(alphabet, length, rng)
+    return [mutate(ancestor, identity, alphabet, rng, indel_rate) for _ in range(count)]
+
+
+def measure(function, repeats=3):
+    """
+    Times a step
+    :return: best seconds, median seconds, peak bytes allocated during one extra traced run
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times), statistics.median(times), peak
+
+
+def pairwise_steps(aligner, engine):
+    """
+    The steps of gen_all_data as separate calls on one aligner, in order - every later step reads what the earlier
+    ones left on the aligner and can be rerun on its own
+    """
+    def nw_fill():
+        raw = aligner.needleman_wunsch() if engine == "python" else aligner.needleman_wunsch_numpy()
+        aligner.nw_engine = engine
+        aligner.nw_s_matrix = raw[0]
+        aligner.nw_t_matrix = aligner.pack_traceback(raw[1])
+
+    def sw_fill():
+        if engine == "python":
+            raw = aligner.smith_waterman()  # records sw_max_cell while filling
+        else:
+            raw = aligner.smith_waterman_numpy()
+            aligner.sw_max_cell = aligner.max_mat(raw[0])
+        aligner.sw_engine = engine
+        aligner.sw_s_matrix = raw[0]
+        aligner.sw_t_matrix = aligner.pack_traceback(raw[1])
+
+    return {"nw_fill": nw_fill, "nw_traceback": aligner.recover_align_global, "nw_path": aligner.global_path_matrix,
+            "sw_fill": sw_fill, "sw_traceback": aligner.recover_align_local, "sw_path": aligner.local_path_matrix}
+
+
+def result_entry(case, step, seq_type, engine, length, identity, cells, timing):
+    best, median, peak = timing
+    return {"case": case, "step": step, "seq_type": seq_type, "engine": engine, "length": length,
+            "identity": identity, "cells": cells, "best_s": best, "median_s": median,
+            "cells_per_second": cells / best if best > 0 else None, "peak_bytes": peak}
+
+
+def benchmark_pairwise(seq_type, length, engine, identity=0.8, repeats=3, seed=0):
+    """Times every pairwise step for one pair of the given length, cells = (n+1) x (m+1) DP cells"""
+    seq_1, seq_2 = related_sequences(seq_type, length, 2, identity, seed=seed)
+    aligner = SequenceAlign(SubstitutionMatrix(seq_type).auto_load(), -8)
+    aligner.set_sequences(seq_1, seq_2)
+    cells = (len(seq_1) + 1) * (len(seq_2) + 1)
+    return [result_entry("pairwise", step, seq_type, engine, length, identity, cells, measure(function, repeats))
+            for step, function in pairwise_steps(aligner, engine).items()]
+
+
+def benchmark_msa(seq_type, length, engine, count=8, identity=0.8, repeats=3, seed=0):
+    """
+    Times global_progressive_align on count related sequences
+    \n cells is an estimate - (count - 1) alignments of about (length + 1)^2 cells each
+    """
+    seqs = related_sequences(seq_type, length, count, identity, indel_rate=0.02, seed=seed)
+    sub_matrix = SubstitutionMatrix(seq_type).auto_load()
+
+    def progressive():
+        MultipleAlignment(seqs, sub_matrix, -8, engine=engine).global_progressive_align()
+
+    cells = (count - 1) * (length + 1) ** 2
+    return result_entry("msa", "progressive", seq_type, engine, length, identity, cells, measure(progressive, repeats))
+
+
+def run_benchmarks(seq_types=("protein", "dna"), lengths=(100, 250, 500, 1000), engines=("python", "numpy"),
+                   identity=0.8, repeats=3, msa_count=8, python_max_length=500, seed=0, log=print):
+    """
+    Size sweep over every biotype, length and engine
+    :param python_max_length: longer lengths skip the python engine (it is quadratic in pure Python)
+    :param log: called with one line per finished step, None for silence
+    :return: {"meta": machine + parameters, "results": one entry per (case, step, seq_type, engine, length)}
+    """
+    results = []
+    for seq_type in seq_types:
+        for length in lengths:
+            for engine in engines:
+                if engine == "python" and length > python_max_length:
+                    continue
+                entries = benchmark_pairwise(seq_type, length, engine, identity, repeats, seed)
+                entries.append(benchmark_msa(seq_type, length, engine, msa_count, identity, repeats, seed))
+                results.extend(entries)
+                if log is not None:
+                    for entry in entries:
+                        log(format_entry(entry))
+    meta = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "numpy": np.__version__, "platform": platform.platform(), "processor": platform.processor(),
+            "seq_types": list(seq_types), "lengths": list(lengths), "engines": list(engines), "identity": identity,
+            "repeats": repeats, "msa_count": msa_count, "seed": seed}
+    return {"meta": meta, "results": results}
+
+
+def format_entry(entry):
+    rate = entry["cells_per_second"]
+    return (f"{entry['case']:<8} {entry['step']:<12} {entry['seq_type']:<7} {entry['engine']:<6} "
+            f"{entry['length']:>6}  {1000 * entry['best_s']:>10.2f} ms  "
+            f"{rate / 1e6 if rate else 0:>8.2f} Mcells/s  {entry['peak_bytes'] / 1024 ** 2:>8.2f} MB peak")
+
+
+def save_results(report, filename):
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def load_results(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+def compare_results(baseline, current, tolerance=0.25):
+    """
+    Steps that got slower than in a saved baseline report
+    :param tolerance: allowed slowdown of the best time, 0.25 -> flagged when more than 25% slower
+    :return: list of (key, baseline seconds, current seconds, ratio), key = (case, step, seq_type, engine, length)
+    """
+    def key(entry):
+        return entry["case"], entry["step"], entry["seq_type"], entry["engine"], entry["length"]
+
+    baseline_times = {key(entry): entry["best_s"] for entry in baseline["results"]}
+    regressions = []
+    for entry in current["results"]:
+        old = baseline_times.get(key(entry))
+        if old and entry["best_s"] > old * (1 + tolerance):
+            regressions.append((key(entry), old, entry["best_s"], entry["best_s"] / old))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pairwise and multiple alignment engines")
+    parser.add_argument("--seq-types", nargs="+", default=["protein", "dna"])
+    parser.add_argument("--lengths", nargs="+", type=int, default=[100, 250, 500, 1000])
+    parser.add_argument("--engines", nargs="+", default=["python", "numpy"], choices=["python", "numpy"])
+    parser.add_argument("--identity", type=float, default=0.8)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--msa-count", type=int, default=8)
+    parser.add_argument("--python-max-length", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="baseline JSON - exit with status 1 if any step got slower")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.seq_types, args.lengths, args.engines, args.identity, args.repeats,
+                            args.msa_count, args.python_max_length, args.seed)
+    save_results(report, args.output)
+    print(f"Saved {len(report['results'])} results to {args.output}")
+    if args.compare:
+        regressions = compare_results(load_results(args.compare), report, args.tolerance)
+        for key, old, new, ratio in regressions:
+            print(f"REGRESSION {' '.join(map(str, key))}: {1000 * old:.2f} ms -> {1000 * new:.2f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No step more than {100 * args.tolerance:.0f}% slower than {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
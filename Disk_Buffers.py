@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import weakref
+import numpy as np
+
+# On-disk DP matrices for alignments larger than RAM
+# DiskBuffers has the same get() as Reusable_Align.DPBuffers, so the numpy engines use it unchanged: every score /
+# traceback matrix they ask for is an np.memmap file in a scratch directory. The engines fill row by row and the
+# files are row-major, so the fill writes each file front to back in one pass and the page cache only holds the rows
+# in use - the OS writes finished rows out as memory runs short. Traceback, path matrices and the pooled heatmaps
+# read single cells, single rows or bands of rows from the files, never the whole matrix.
+
+
+class DiskBuffers:
+    """
+    Hands out the numpy engine matrices as memory-mapped files, e.g.
+    \n SequenceAlign(sub_matrix, -8, scratch_dir="/scratch").gen_global_data("numpy")
+    \n every instance works in its own subdirectory. cleanup() deletes it, and so does garbage collection of the
+    instance, leaving a with block or the end of the interpreter - whichever comes first
+    """
+    def __init__(self, directory=None):
+        """:param directory: where the scratch subdirectory is created (None -> the system temp directory)"""
+        self.parent = directory
+        self.directory = None  # created on first use
+        self.files = {}  # name -> path of the current file
+        self.remover = None  # finalizer deleting the subdirectory
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cleanup()
+
+    def get(self, name, shape, dtype, zero):
+        """
+        New memory-mapped file for the named matrix - a new file reads as 0s, so zero is always honoured
+        \n the previous file of that name is unlinked first: a matrix still mapped from it stays valid (POSIX) until
+        it is dropped, instead of being truncated under its reader
+        """
+        if self.directory is None:
+            if self.parent is not None:
+                os.makedirs(self.parent, exist_ok=True)
+            self.directory = tempfile.mkdtemp(prefix="align_scratch_", dir=self.parent)
+            # matrices still mapped from deleted files stay readable (POSIX), so this can run while they are in use
+            self.remover = weakref.finalize(self, shutil.rmtree, self.directory, ignore_errors=True)
+        path = os.path.join(self.directory, f"{name}.dat")
+        if os.path.exists(path):
+            os.remove(path)
+        self.files[name] = path
+        return np.memmap(path, dtype=dtype, mode="w+", shape=shape)
+
+    def cleanup(self):
+        """Deletes the scratch subdirectory and every matrix file in it"""
+        if self.remover is not None:
+            self.remover()  # runs at most once
+        self.directory = self.remover = None
+        self.files = {}
+
+    def reset(self):
+        self.cleanup()
+
+    @property
+    def nbytes(self):
+        """Size of the matrix files on disk"""
+        return sum(os.path.getsize(path) for path in self.files.values() if os.path.exists(path))
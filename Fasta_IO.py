@@ -0,0 +1,155 @@
+import gzip
+
+# Streaming sequence file input/output
+# Readers are generators that yield (name, sequence) records one at a time, so multi-GB files never have to be loaded
+# whole. Files ending in .gz are read and written through gzip. Writers accept a filename or an open text handle.
+
+
+def open_text(filename, mode="r"):
+    """Opens a plain or gzip compressed (.gz) file in text mode"""
+    if filename.endswith(".gz"):
+        return gzip.open(filename, mode + "t")
+    return open(filename, mode)
+
+
+def iter_fasta(filename):
+    """
+    Yields (name, sequence) records from a FASTA file
+    \n name is the header line without '>', sequence lines are joined and upper-cased
+    """
+    name = None
+    seq_lines = []
+    with open_text(filename) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith(">"):
+                if name is not None:
+                    yield name, "".join(seq_lines).upper()
+                name = line[1:].strip()
+                seq_lines = []
+            elif name is None:
+                raise ValueError("Invalid FASTA file - sequence data found before the first '>' header")
+            else:
+                seq_lines.append(line)
+    if name is not None:
+        yield name, "".join(seq_lines).upper()
+
+
+def iter_fastq(filename):
+    """Yields (name, sequence) records from a FASTQ file (4 lines per record, quality strings are skipped)"""
+    with open_text(filename) as f:
+        while True:
+            header = f.readline()
+            while header and not header.strip():  # skip blank lines between records
+                header = f.readline()
+            if not header:
+                return
+            seq = f.readline().strip()
+            separator = f.readline()
+            f.readline()  # quality line
+            if not header.startswith("@") or not separator.startswith("+"):
+                raise ValueError("Invalid FASTQ file - expected '@' header and '+' separator lines")
+            yield header[1:].strip(), seq.upper()
+
+
+def iter_sequences(filename):
+    """Yields (name, sequence) records from a FASTA or FASTQ file, the format is detected from the first character"""
+    with open_text(filename) as f:
+        first_char = ""
+        for line in f:
+            if line.strip():
+                first_char = line.lstrip()[0]
+                break
+    if first_char == "@":
+        return iter_fastq(filename)
+    return iter_fasta(filename)
+
+
+def read_fasta(filename):
+    """Parses a whole FASTA file into a list of (name, sequence) tuples"""
+    return list(iter_fasta(filename))
+
+
+def iter_chunks(records, chunk_size):
+    """Groups any iterable into lists of at most chunk_size items, without reading ahead further than one chunk"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class SequenceWriter:
+    """Base for the writers - owns the file when given a filename, leaves it open when given a handle"""
+    def __init__(self, target):
+        if isinstance(target, str):
+            self.handle = open_text(target, "w")
+            self.owns_handle = True
+        else:
+            self.handle = target
+            self.owns_handle = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.owns_handle:
+            self.handle.close()
+        else:
+            self.handle.flush()
+
+
+class FastaWriter(SequenceWriter):
+    """Writes records and alignments (gaps kept as '-') in FASTA format as they are produced"""
+    def __init__(self, target, line_width=60):
+        super().__init__(target)
+        self.line_width = line_width
+
+    def write_record(self, name, seq):
+        self.handle.write(f">{name}\n")
+        for start in range(0, len(seq), self.line_width):
+            self.handle.write(seq[start:start + self.line_width] + "\n")
+
+    def write_pairwise(self, name_1, name_2, aligned_seqs):
+        """Writes a pairwise result such as SequenceAlign.nw_result / sw_result"""
+        self.write_record(name_1, aligned_seqs[0])
+        self.write_record(name_2, aligned_seqs[1])
+
+    def write_msa(self, names, aligned_seqs):
+        """Writes a multiple alignment such as MultipleAlignment.aligned_seqs"""
+        for name, seq in zip(names, aligned_seqs):
+            self.write_record(name, seq)
+
+
+class ClustalWriter(SequenceWriter):
+    """Writes alignments in Clustal format, blocks of block_width columns with a '*' line under conserved columns"""
+    def __init__(self, target, block_width=60):
+        super().__init__(target)
+        self.block_width = block_width
+        self.handle.write("CLUSTAL W multiple sequence alignment\n\n")
+
+    def write_alignment(self, names, aligned_seqs):
+        """Writes one alignment (pairwise or MSA), followed by a blank line"""
+        name_width = max(len(name) for name in names) + 4
+        length = len(aligned_seqs[0])
+        for start in range(0, length, self.block_width):
+            columns = [seq[start:start + self.block_width] for seq in aligned_seqs]
+            for name, part in zip(names, columns):
+                self.handle.write(f"{name:<{name_width}}{part}\n")
+            conserved = "".join("*" if len(set(column)) == 1 and column[0] != "-" else " "
+                                for column in zip(*columns))
+            self.handle.write(" " * name_width + conserved + "\n\n")
+
+    def write_pairwise(self, name_1, name_2, aligned_seqs):
+        self.write_alignment([name_1, name_2], aligned_seqs)
+
+    def write_msa(self, names, aligned_seqs):
+        self.write_alignment(names, aligned_seqs)
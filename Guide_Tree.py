@@ -0,0 +1,73 @@
+import numpy as np
+
+# Guide trees for progressive multiple alignment
+# Both builders return the tree as a list of merges (left, right): leaves are 0..N-1 and the k-th merge creates node
+# N + k, so following the list in order aligns the closest groups first.
+
+
+def upgma(distances):
+    """
+    UPGMA clustering - repeatedly merges the two closest clusters, the merged cluster's distance to the rest is the
+    size-weighted average of its two parts
+    :param distances: N x N symmetric distance matrix
+    :return: list of N - 1 merges
+    """
+    dist = np.array(distances, dtype=np.float64)
+    n = len(dist)
+    np.fill_diagonal(dist, np.inf)
+    sizes = np.ones(n)
+    node_ids = list(range(n))  # tree node currently stored at each row/col of dist
+    active = np.ones(n, dtype=bool)
+    merges = []
+
+    for step in range(n - 1):
+        masked = np.where(active[:, None] & active[None, :], dist, np.inf)
+        a, b = np.unravel_index(np.argmin(masked), masked.shape)
+        a, b = min(a, b), max(a, b)
+        merges.append((node_ids[a], node_ids[b]))
+
+        # merged cluster reuses row a, row b is retired
+        merged = (dist[a] * sizes[a] + dist[b] * sizes[b]) / (sizes[a] + sizes[b])
+        dist[a] = merged
+        dist[:, a] = merged
+        dist[a, a] = np.inf
+        sizes[a] += sizes[b]
+        active[b] = False
+        node_ids[a] = n + step
+    return merges
+
+
+def neighbor_joining(distances):
+    """
+    Neighbor-joining - joins the pair minimising the Q criterion, which corrects for unequal rates along branches
+    \n the unrooted tree is returned as a join order, the last two groups are joined at the end
+    :param distances: N x N symmetric distance matrix
+    :return: list of N - 1 merges
+    """
+    dist = np.array(distances, dtype=np.float64)
+    n = len(dist)
+    node_ids = list(range(n))
+    active = np.ones(n, dtype=bool)
+    merges = []
+
+    for step in range(n - 1):
+        rows = np.flatnonzero(active)
+        if len(rows) == 2:
+            a, b = rows
+        else:
+            sub = dist[np.ix_(rows, rows)]
+            totals = sub.sum(axis=1)
+            q = (len(rows) - 2) * sub - totals[:, None] - totals[None, :]
+            np.fill_diagonal(q, np.inf)
+            i, j = np.unravel_index(np.argmin(q), q.shape)
+            a, b = min(rows[i], rows[j]), max(rows[i], rows[j])
+        merges.append((node_ids[a], node_ids[b]))
+
+        # distance from the new node to every other node
+        merged = (dist[a] + dist[b] - dist[a, b]) / 2
+        dist[a] = merged
+        dist[:, a] = merged
+        dist[a, a] = 0
+        active[b] = False
+        node_ids[a] = n + step
+    return merges
@@ -0,0 +1,120 @@
+import os
+import numpy as np
+from Traceback_Store import PackedTraceback, PathMatrix
+
+# Heatmap rendering for DP matrices of any size
+# Matrices wider or taller than max_size are shrunk into blocks of step x step cells before plotting: score matrices
+# are max or mean pooled, tracebacks keep the first cell of each block (pooling direction codes means nothing) and
+# path matrices are max pooled so every block the path crosses stays lit. Cell text is only drawn for small plots.
+# plotly is imported on the first render, so aligning without plotting (e.g. the command line tool) never loads it.
+
+POOLING_TYPES = ("max", "mean")
+POOL_CHUNK_CELLS = 1 << 22  # most score matrix cells read at once while pooling
+
+
+def block_step(size, max_size):
+    """Number of cells per block along one axis so that at most max_size blocks are drawn"""
+    return max(1, -(-size // max_size))  # ceil division
+
+
+def pool_matrix(matrix, row_step, col_step, pooling="max"):
+    """
+    Shrinks a matrix into blocks of row_step x col_step cells
+    :param matrix: nested lists / NumPy array, PackedTraceback or PathMatrix
+    :param pooling: "max" or "mean" (score matrices only - tracebacks are sampled and paths are always max pooled)
+    :return: 2-D NumPy array of one value per block
+    """
+    if pooling not in POOLING_TYPES:
+        raise ValueError("Invalid pooling - Choose from: max or mean")
+    if isinstance(matrix, PathMatrix):  # pool straight from the path coordinates, the dense matrix is never built
+        rows, cols = matrix.shape
+        pooled = np.zeros((-(-rows // row_step), -(-cols // col_step)), dtype=np.uint8)
+        if matrix.cells:
+            cell_rows, cell_cols = np.array(matrix.cells).T
+            pooled[cell_rows // row_step, cell_cols // col_step] = 1
+        return pooled
+    if isinstance(matrix, PackedTraceback):  # only the sampled rows are unpacked
+        return np.array([matrix.get_row(row)[::col_step] for row in range(0, matrix.shape[0], row_step)])
+
+    matrix = np.asarray(matrix)  # a memory-mapped matrix stays mapped
+    if row_step == 1 and col_step == 1:
+        return matrix
+    rows, cols = matrix.shape
+    row_starts = np.arange(0, rows, row_step)
+    col_starts = np.arange(0, cols, col_step)
+    pooled = np.empty((len(row_starts), len(col_starts)), dtype=matrix.dtype if pooling == "max" else np.float64)
+    # one band of row_step rows at a time, read in chunks of at most POOL_CHUNK_CELLS cells - a matrix on disk
+    # (Disk_Buffers) is streamed through once and never loaded whole
+    chunk_rows = max(1, POOL_CHUNK_CELLS // cols)
+    for band, start in enumerate(row_starts):
+        band_end = min(start + row_step, rows)
+        for chunk_start in range(start, band_end, chunk_rows):
+            chunk = np.asarray(matrix[chunk_start:min(chunk_start + chunk_rows, band_end)])
+            if pooling == "max":
+                part = np.maximum.reduceat(chunk.max(axis=0), col_starts)
+                pooled[band] = part if chunk_start == start else np.maximum(pooled[band], part)
+            else:
+                part = np.add.reduceat(chunk.sum(axis=0, dtype=np.float64), col_starts)
+                pooled[band] = part if chunk_start == start else pooled[band] + part
+    if pooling == "max":
+        return pooled
+    counts = np.outer(np.diff(np.append(row_starts, rows)), np.diff(np.append(col_starts, cols)))
+    return pooled / counts
+
+
+def axis_labels(seq, step):
+    """Axis labels in the "A-0" style (first label is the gap row/column), one per block of step cells"""
+    labels = [""] + [f"{char}-{i}" for i, char in enumerate(seq)]
+    if step == 1:
+        return labels
+    return [f"{labels[start] or '-'}..{labels[min(start + step, len(labels)) - 1]}"
+            for start in range(0, len(labels), step)]
+
+
+def render_heatmap(matrix, title, seq_1, seq_2, color_scale, pooling="max", max_size=300, text_limit=50,
+                   output=None):
+    """
+    Builds one heatmap and shows it, or writes it to disk
+    :param max_size: most blocks drawn along each axis, bigger matrices are pooled down to this size
+    :param text_limit: cell values are only written on plots with at most this many blocks along both axes
+    :param output: None -> fig.show(), "*.html" -> HTML file (plotly.js loaded from its CDN, keeps files small),
+    any other extension such as .png -> static image (needs the kaleido package)
+    :return: the plotly figure
+    """
+    import plotly.express as px  # slow to import, only needed once something is actually plotted
+
+    rows, cols = len(seq_1) + 1, len(seq_2) + 1
+    row_step, col_step = block_step(rows, max_size), block_step(cols, max_size)
+    values = pool_matrix(matrix, row_step, col_step, pooling)
+    show_text = values.shape[0] <= text_limit and values.shape[1] <= text_limit
+
+    fig = px.imshow(values,
+                    labels=dict(x="Sequence 1", y="Sequence 2", color="Productivity"),
+                    y=axis_labels(seq_1, row_step),
+                    x=axis_labels(seq_2, col_step),
+                    text_auto=show_text,
+                    color_continuous_scale=color_scale)
+    if row_step > 1 or col_step > 1:
+        if isinstance(matrix, PackedTraceback):
+            method = "sampled"
+        else:
+            method = "max pooled" if isinstance(matrix, PathMatrix) else f"{pooling} pooled"
+        title += f" ({row_step}x{col_step} cells per block, {method})"
+    fig.update_layout(title=title)
+    fig.update_xaxes(side="top")
+
+    if output is None:
+        fig.show()
+    elif os.path.splitext(output)[1].lower() in (".html", ".htm"):
+        fig.write_html(output, include_plotlyjs="cdn")
+    else:
+        fig.write_image(output)
+    return fig
+
+
+def output_name(output, suffix):
+    """Adds a suffix before the extension, e.g. plots/nw.html -> plots/nw_score.html (None stays None)"""
+    if output is None:
+        return None
+    root, ext = os.path.splitext(output)
+    return f"{root}_{suffix}{ext}"
@@ -0,0 +1,191 @@
+import json
+import os
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from Align_Engines import encode_sequence, encode_sub_matrix
+
+# k-mer (spaced seed) index for one query vs a sequence database - seed and extend
+# Every database sequence is cut into seeds: the residues under the "1"s of a seed pattern such as "111" (plain 3-mer)
+# or "11011" (spaced seed, tolerates a mismatch in the middle), packed into one integer. The index is an inverted
+# list in CSR form - sorted distinct seed keys, offsets into them and the (target, position) postings - saved as .npy
+# files and opened memory-mapped, so a large database isn't read into memory. A query looks up its own seeds, counts
+# hits per (target, diagonal) and only the targets with the most hits on one diagonal are aligned, with
+# Smith-Waterman on a window of the target around that diagonal.
+
+INDEX_FILES = ("keys", "offsets", "targets", "positions", "residues", "seq_offsets")
+
+
+class KmerIndex:
+    """
+    Inverted seed index over a sequence collection, e.g.
+    \n index = KmerIndex(sub_matrix, seed="11011").build(Fasta_IO.iter_sequences("db.fa"), "db_index")
+    \n KmerIndex.load("db_index").search(query, SequenceAlign(sub_matrix, -8))
+    """
+    def __init__(self, sub_matrix, seed="111"):
+        """
+        :param sub_matrix: "AC" dict or (index, dense) - only its alphabet is used, unknown residues raise KeyError
+        :param seed: pattern of 1s (positions used) and 0s (positions skipped), must start and end with a 1
+        """
+        if not seed or set(seed) - {"0", "1"} or seed[0] != "1" or seed[-1] != "1":
+            raise ValueError("Invalid seed - use 1s and 0s, starting and ending with 1 (e.g. 111 or 11011)")
+        index = sub_matrix[0] if isinstance(sub_matrix, tuple) else encode_sub_matrix(sub_matrix)[0]
+        self.alphabet = "".join(sorted(index, key=index.get))
+        self.symbols = np.array(list(self.alphabet))
+        self.index = index
+        self.seed = seed
+        self.care = np.flatnonzero(np.array(list(seed)) == "1")  # offsets inside the window that go into the key
+        if len(self.alphabet) ** len(self.care) >= 2 ** 62:
+            raise ValueError("Seed too long for this alphabet - keys must fit in 64 bits")
+        self.powers = len(self.alphabet) ** np.arange(len(self.care) - 1, -1, -1, dtype=np.int64)
+
+        self.names = []
+        self.keys = None  # sorted distinct seed keys
+        self.offsets = None  # postings of keys[i] are [offsets[i], offsets[i + 1])
+        self.targets = None  # posting -> database sequence number
+        self.positions = None  # posting -> start of the seed in that sequence
+        self.residues = None  # every database sequence encoded, back to back (uint8)
+        self.seq_offsets = None  # sequence i is residues[seq_offsets[i]:seq_offsets[i + 1]]
+
+    def seed_keys(self, codes):
+        """Seed keys of every window of an encoded sequence, the window start is the array position"""
+        if len(codes) < len(self.seed):
+            return np.empty(0, dtype=np.int64)
+        return sliding_window_view(codes, len(self.seed))[:, self.care].astype(np.int64) @ self.powers
+
+    def build(self, records, directory=None):
+        """
+        Indexes (name, sequence) records, e.g. from Fasta_IO.iter_sequences
+        :param directory: optional - the index is saved there and reopened memory-mapped
+        :return: self
+        """
+        names, encoded = [], []
+        keys, targets, positions = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.uint32)], []
+        for number, (name, seq) in enumerate(records):
+            codes = encode_sequence(seq.upper(), self.index)
+            names.append(name)
+            encoded.append(codes.astype(np.uint8))
+            seq_keys = self.seed_keys(codes)
+            keys.append(seq_keys)
+            targets.append(np.full(len(seq_keys), number, dtype=np.uint32))
+            positions.append(np.arange(len(seq_keys), dtype=np.uint32))
+
+        all_keys = np.concatenate(keys)
+        order = np.argsort(all_keys, kind="stable")  # stable -> postings of a key stay in (target, position) order
+        sorted_keys = all_keys[order]
+        self.keys, starts = np.unique(sorted_keys, return_index=True)
+        self.offsets = np.append(starts, len(sorted_keys)).astype(np.int64)
+        self.targets = np.concatenate(targets)[order]
+        self.positions = np.concatenate([np.empty(0, dtype=np.uint32)] + positions)[order]
+        self.residues = np.concatenate([np.empty(0, dtype=np.uint8)] + encoded)
+        self.seq_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        self.seq_offsets[1:] = np.cumsum([len(codes) for codes in encoded])
+        self.names = names
+        if directory is not None:
+            self.save(directory)
+            return self.load(directory)
+        return self
+
+    def save(self, directory):
+        """Writes the arrays as .npy files plus an index.json with the alphabet, seed and sequence names"""
+        os.makedirs(directory, exist_ok=True)
+        for name in INDEX_FILES:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "index.json"), "w") as f:
+            json.dump({"alphabet": self.alphabet, "seed": self.seed, "names": self.names}, f)
+
+    @classmethod
+    def load(cls, directory):
+        """Opens a saved index, the arrays are memory-mapped read-only"""
+        with open(os.path.join(directory, "index.json")) as f:
+            meta = json.load(f)
+        index = cls(({char: i for i, char in enumerate(meta["alphabet"])}, None), meta["seed"])
+        index.names = meta["names"]
+        for name in INDEX_FILES:
+            setattr(index, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r"))
+        return index
+
+    def __len__(self):
+        return len(self.names)
+
+    def sequence(self, number):
+        """Database sequence number as a string"""
+        codes = self.residues[self.seq_offsets[number]:self.seq_offsets[number + 1]]
+        return "".join(self.symbols[codes])
+
+    def candidates(self, query, top=50, min_hits=2, diagonal_window=16, max_occurrences=None):
+        """
+        Seed hits of a query grouped by (target, diagonal), diagonal = target position - query position
+        :param diagonal_window: diagonals are counted in bins this wide, so hits shifted by small indels still add up
+        :param max_occurrences: skip seeds with more postings than this (low complexity / repeats), None -> keep all
+        :return: up to top (target number, hits on its best diagonal bin, diagonal at the bin centre), most hits first
+        """
+        query_keys = self.seed_keys(encode_sequence(query.upper(), self.index))
+        if len(query_keys) == 0 or len(self.keys) == 0:
+            return []
+        slots = np.minimum(np.searchsorted(self.keys, query_keys), len(self.keys) - 1)
+        found = self.keys[slots] == query_keys
+        query_positions = np.flatnonzero(found)
+        starts = self.offsets[slots[found]]
+        counts = self.offsets[slots[found] + 1] - starts
+        if max_occurrences is not None:
+            keep = counts <= max_occurrences
+            query_positions, starts, counts = query_positions[keep], starts[keep], counts[keep]
+        total = int(counts.sum())
+        if total == 0:
+            return []
+
+        # postings of every found seed in one gather: run k covers starts[k] .. starts[k] + counts[k] - 1
+        run_starts = np.cumsum(counts) - counts
+        postings = np.repeat(starts - run_starts, counts) + np.arange(total)
+        targets = np.asarray(self.targets[postings], dtype=np.int64)
+        diagonals = np.asarray(self.positions[postings], dtype=np.int64) - np.repeat(query_positions, counts)
+        bins = np.floor_divide(diagonals, diagonal_window)
+
+        pair_keys = (targets << 32) | (bins + (1 << 31))  # bins are offset so the key stays non-negative
+        pair_keys, hits = np.unique(pair_keys, return_counts=True)
+        order = np.argsort(-hits, kind="stable")
+        pair_keys, hits = pair_keys[order], hits[order]
+        pair_targets = pair_keys >> 32
+        _, best = np.unique(pair_targets, return_index=True)  # first (= most hits) bin of every target
+        best = best[np.argsort(-hits[best], kind="stable")]
+        best = best[hits[best] >= min_hits][:top]
+        centres = ((pair_keys[best] & 0xFFFFFFFF) - (1 << 31)) * diagonal_window + diagonal_window // 2
+        return [(int(target), int(count), int(diagonal))
+                for target, count, diagonal in zip(pair_targets[best], hits[best], centres)]
+
+    def search(self, query, aligner, top=10, candidates=50, min_hits=2, padding=32, diagonal_window=16,
+               max_occurrences=None):
+        """
+        Seed and extend: candidates() picks the targets, then each one is aligned with Smith-Waterman on the part of
+        the target around its best diagonal, padded by `padding` residues on both sides. Every window is scored with
+        aligner.local_score first (the query profile is built once for all of them) and only the windows that make
+        the top list are aligned again with a traceback (numpy engine)
+        :param aligner: SequenceAlign / ReusableAligner holding the substitution matrix and gap penalties
+        :return: up to top (score, name, target number, [aligned query, aligned target], (start, end) in the query,
+        (start, end) in the target) tuples, best first - the spans are slice indices
+        """
+        query = query.upper()
+        scored = []
+        for target, _, diagonal in self.candidates(query, candidates, min_hits, diagonal_window, max_occurrences):
+            length = int(self.seq_offsets[target + 1] - self.seq_offsets[target])
+            window_start = max(0, diagonal - padding)
+            window_end = min(length, diagonal + len(query) + padding)
+            if window_end <= window_start:
+                continue
+            window = self.sequence(target)[window_start:window_end]
+            score = aligner.local_score(query, window)[0]
+            if score > 0:
+                scored.append((score, target, window_start, window))
+        scored.sort(key=lambda hit: -hit[0])  # stable - equal scores keep the candidate order
+
+        hits = []
+        for score, target, window_start, window in scored[:top]:
+            aligner.set_sequences(query, window)
+            aligner.gen_local_data("numpy")
+            aligned = aligner.sw_result
+            end_1, end_2 = aligner.sw_max_cell
+            start_1 = end_1 - len(aligned[0].replace("-", ""))
+            start_2 = end_2 - len(aligned[1].replace("-", ""))
+            hits.append((score, self.names[target], target, list(aligned), (start_1, end_1),
+                         (window_start + start_2, window_start + end_2)))
+        return hits
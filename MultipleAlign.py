@@ -1,85 +1,277 @@
+from itertools import islice
+import numpy as np
+from Align_Metrics import Instrumented
 from Sequence_Align_Toolkit import *
 from Sub_Matrix_Gen import *
+from Align_Engines import encode_sub_matrix
+from Batch_Align import BatchAlignment
+from Guide_Tree import neighbor_joining, upgma
+from Profile_Align import align_blocks, encode_block
+from Reusable_Align import ReusableAligner
 
-class MultipleAlignment:
-    def __init__(self, seq_list, sub_matrix, gap_penalty=-8):
+NOT_SEEN = np.iinfo(np.int64).max  # first_seen of a code that isn't in the column (loses every consensus tie)
+
+class MultipleAlignment(Instrumented):
+    def __init__(self, seq_list, sub_matrix, gap_penalty=-8, gap_open=None, gap_extend=None, engine=None,
+                 metrics=None):
+        """
+        :param sub_matrix: "AC" score dict, or (alphabet index, dense array) from SubstitutionMatrix(..., encoded=True)
+        :param gap_open: optional affine gaps, passed on to SequenceAlign together with gap_extend
+        :param engine: pairwise engine used by SequenceAlign.gen_global_data (None -> "python", or "numpy" when
+        gap_open/gap_extend are set, the only engine with affine gaps)
+        :param metrics: optional Align_Metrics.AlignMetrics - shared with the pairwise aligner, so the pairwise phases
+        and the msa_* phases (consensus, merge, distances, guide tree, profile merges) end up in one report
+        """
         self.seq_list = seq_list
         self.sub_matrix = sub_matrix
         self.gap_penalty = gap_penalty
-        self.aligned_seqs = []
+        self.gap_open = gap_open
+        self.gap_extend = gap_extend
+        self.engine = engine or ("python" if gap_open is None else "numpy")
+        self.metrics = metrics
+
+        # the alignment is stored column-major as codes: block = uint8 rows x columns of alphabet indices (gap = last
+        # index), counts = residue/gap counts per column, first_seen = first row each residue appears in per column
+        # (breaks consensus ties the same way as scanning rows top-down). Strings are only built when asked for.
+        self.index, self.dense = sub_matrix if isinstance(sub_matrix, tuple) else encode_sub_matrix(sub_matrix)
+        self.alphabet = sorted(self.index, key=self.index.get)
+        self.gap_code = len(self.alphabet)
+        self.no_consensus_code = self.gap_code + 1  # "+" -> column has no residues
+        self.symbols = np.array(self.alphabet + ["-", "+"])
+        self.block = None
+        self.counts = None
+        self.first_seen = None
+        self.consensus_codes = None
+        self.aligned_rows = None  # cache of the string rows, reset whenever the block changes
+        self.names = []  # optional row names, kept by save / load / add_sequences (one per row when set)
+
+    @property
+    def aligned_seqs(self):
+        """Aligned sequences as strings, built from the code block on first access after each change"""
+        if self.block is None:
+            return []
+        if self.aligned_rows is None:
+            self.aligned_rows = ["".join(row) for row in self.symbols[self.block]]
+        return self.aligned_rows
 
+    @aligned_seqs.setter
+    def aligned_seqs(self, aligned_seqs):
+        """Replaces the alignment with a list of equal-length aligned strings"""
+        if not aligned_seqs:
+            self.set_block(None)
+        else:
+            self.set_block(np.array([self.encode_row(seq) for seq in aligned_seqs], dtype=np.uint8))
 
     def __len__(self):
         """Return the length of aligned sequences"""
-        if self.aligned_seqs:
-            return len(self.aligned_seqs[0])
+        if self.block is not None:
+            return self.block.shape[1]
         return 0
 
+    def encode_row(self, aligned_seq):
+        """Aligned string -> array of codes (gaps included)"""
+        return np.fromiter((self.gap_code if char == "-" else self.index[char] for char in aligned_seq),
+                           dtype=np.uint8, count=len(aligned_seq))
+
+    def set_block(self, block):
+        """Stores a new code block and rebuilds the column profile + consensus from it"""
+        self.block = block
+        self.aligned_rows = None
+        if block is None:
+            self.counts = self.first_seen = self.consensus_codes = None
+            return
+        rows, cols = block.shape
+        self.counts = np.zeros((cols, self.gap_code + 1), dtype=np.int64)
+        self.first_seen = np.full((cols, self.gap_code + 1), NOT_SEEN, dtype=np.int64)
+        for code in range(self.gap_code + 1):
+            present = block == code
+            self.counts[:, code] = present.sum(axis=0)
+            found = self.counts[:, code] > 0
+            self.first_seen[found, code] = np.argmax(present[:, found], axis=0)
+        self.consensus_codes = self.column_consensus(np.arange(cols))
+
+    def column_consensus(self, columns):
+        """
+        Most common residue of the given columns (gaps don't count), ties go to the residue seen first from the top
+        \n columns with no residue at all get the "+" code
+        """
+        counts = self.counts[columns, :-1]
+        best_count = counts.max(axis=1)
+        first_seen = np.where(counts == best_count[:, None], self.first_seen[columns, :-1], NOT_SEEN)
+        return np.where(best_count > 0, np.argmin(first_seen, axis=1), self.no_consensus_code)
+
+    def add_aligned_sequence(self, aligned_consensus, aligned_new_sequence):
+        """
+        Merges a sequence aligned against the current consensus into the alignment
+        Gap columns (where the consensus got a gap) are inserted into every existing row in one go, then the new row is
+        added to the column counts and the consensus is only recomputed for the columns the new row touches
+        """
+        keep = self.encode_row(aligned_consensus) != self.gap_code  # columns that existed before
+        new_row = self.encode_row(aligned_new_sequence)
+        rows, cols = self.block.shape[0], len(new_row)
+
+        block = np.full((rows + 1, cols), self.gap_code, dtype=np.uint8)
+        block[:rows, keep] = self.block
+        block[rows] = new_row
+        counts = np.zeros((cols, self.gap_code + 1), dtype=np.int64)
+        counts[keep] = self.counts
+        counts[~keep, self.gap_code] = rows
+        first_seen = np.full((cols, self.gap_code + 1), NOT_SEEN, dtype=np.int64)
+        first_seen[keep] = self.first_seen
+        first_seen[~keep, self.gap_code] = 0  # inserted columns are gaps from the first row down
+        consensus_codes = np.full(cols, self.no_consensus_code, dtype=np.int64)
+        consensus_codes[keep] = self.consensus_codes
+
+        columns = np.arange(cols)
+        first_time = counts[columns, new_row] == 0
+        first_seen[columns[first_time], new_row[first_time]] = rows
+        counts[columns, new_row] += 1
+        self.block, self.counts, self.first_seen, self.consensus_codes = block, counts, first_seen, consensus_codes
+        self.aligned_rows = None
+
+        touched = np.flatnonzero(new_row != self.gap_code)  # only these columns can change their consensus
+        self.consensus_codes[touched] = self.column_consensus(touched)
+
     def consensus(self):
         """
-        Collects frequencies of the characters in each column using dict and selects most common chars, adding them to
-        a 'consensus' sequence
+        Most common character of each column (taken from the column counts) joined into a 'consensus' sequence
         """
-        if not self.aligned_seqs:
+        if self.block is None:
             return""
-
-        consensus_seq = ""
-        for position in range(len(self.aligned_seqs[0])):
-            char_freqs = {}
-            for seq in self.aligned_seqs:     # iterate through all sequences
-                char = seq[position]   # go through every position of all sequences
-                if char in char_freqs:
-                    char_freqs[char] = char_freqs[char] + 1
-                else:                       # if char is found, add 1 to its count
-                      char_freqs[char] = 1    # default count of existing char is 1
-
-            maximum_freq = 0
-            most_common_char = "+"
-            for key, value in char_freqs.items():   # iterate through all keys (which are the characters) of the freq dict
-                if key != "-" and char_freqs[key] > maximum_freq:
-                    maximum_freq = char_freqs[key] # find the largest max frequency by accessing the char freqeuency counts
-                    most_common_char = key
-            consensus_seq = consensus_seq + most_common_char
-        return consensus_seq
+        return "".join(self.symbols[self.consensus_codes])
 
     def global_progressive_align(self):
-        if len(self.seq_list) < 2:
+        """
+        Aligns the sequences in input order against the running consensus
+        \n seq_list is only read one sequence at a time, so it can also be a generator, e.g.
+        (seq for name, seq in Fasta_IO.iter_fasta("family.fa.gz"))
+        """
+        sequences = iter(self.seq_list)
+        first_pair = list(islice(sequences, 2))
+        if len(first_pair) < 2:
             print("You need more than two sequences to run Multiple Sequence Alignment")
             return None
 
         # start by aligning the first two sequences
-        pairwise_aligner = SequenceAlign(self.sub_matrix, self.gap_penalty)  # create SeqAlign obj w/ sub_mat and gap_pen
-        pairwise_aligner.set_sequences(self.seq_list[0], self.seq_list[1])   # set seq to first two in list
-        pairwise_aligner.gen_global_data()   # generate global / NW algorithm data for nw_result class function
+        # one aligner (encoded sub_mat + DP buffers) is reused for every step
+        pairwise_aligner = ReusableAligner((self.index, self.dense), self.gap_penalty, self.gap_open, self.gap_extend,
+                                           metrics=self.metrics)
+        pairwise_aligner.set_sequences(first_pair[0], first_pair[1])   # set seq to first two in list
+        pairwise_aligner.gen_global_data(self.engine)   # generate global / NW algorithm data for nw_result class function
 
         # initialize aligned sequences list with first pairwise alignment
         self.aligned_seqs = pairwise_aligner.nw_result.copy() # make a copy of NW align results and paste to aligned_seqs
 
         # progressively add each remaining sequence
-        for seq_idx in range(2, len(self.seq_list)):   # iterate through remaining sequences starting from 2
-            current_consensus = self.consensus()       # calculate consensus seq from current alignment
-            consensus_aligner = SequenceAlign(self.sub_matrix, self.gap_penalty) # creates new SeqAlign obj
-            consensus_aligner.set_sequences(current_consensus, self.seq_list[seq_idx]) # performs alignment w/ consensus
-            consensus_aligner.gen_global_data() # gen global alignment data
+        self.align_to_consensus(pairwise_aligner, sequences)
+        return self.aligned_seqs
+
+    def align_to_consensus(self, pairwise_aligner, sequences):
+        """Aligns each sequence against the consensus of the alignment so far and merges it in"""
+        for new_seq in sequences:   # iterate through remaining sequences
+            with self.phase("msa_consensus"):
+                current_consensus = self.consensus()       # calculate consensus seq from current alignment
+            pairwise_aligner.set_sequences(current_consensus, new_seq) # performs alignment w/ consensus
+            pairwise_aligner.gen_global_data(self.engine) # gen global alignment data
 
             # get new alignment
-            aligned_consensus = consensus_aligner.nw_result[0]
-            aligned_new_sequences = consensus_aligner.nw_result[1]
-            print("!!", aligned_consensus)
-            updated_alignments = [] # create list for updated alignments
-            for prev_seq in self.aligned_seqs: # for each previously aligned seq, it tracks the original pos in seq
-                updated_seq = ""
-                orig_pos = 0
-
-                for cons_pos in range(len(aligned_consensus)): # for each pos in aligned consensus
-                    if aligned_consensus[cons_pos] == "-":     # if it has a gap, it's added to the updated sequence
-                        updated_seq += "-"
-                    else:
-                        updated_seq += prev_seq[orig_pos]      # otherwise, it adds the char from original sequence
-                        orig_pos += 1
-                updated_alignments.append(updated_seq)         # adds updated seq to the list
-
-            updated_alignments.append(aligned_new_sequences)
-            self.aligned_seqs = updated_alignments
-
-        return self.aligned_seqs
\ No newline at end of file
+            aligned_consensus = pairwise_aligner.nw_result[0]
+            aligned_new_sequences = pairwise_aligner.nw_result[1]
+            with self.phase("msa_merge"):  # gap columns go into every row at once
+                self.add_aligned_sequence(aligned_consensus, aligned_new_sequences)
+
+    def add_sequences(self, sequences, names=None):
+        """
+        Appends sequences to a finished alignment (e.g. one reopened with load) without realigning it
+        \n each new sequence is aligned against the current consensus only, like the later steps of
+        global_progressive_align, so the DP work grows with the number of new sequences, not the family size
+        :param sequences: iterable of sequences, may be a generator
+        :param names: optional names of the new sequences, appended to self.names
+        :return: aligned sequences, old rows first
+        """
+        if self.block is None:
+            raise ValueError("No alignment to add to - align at least two sequences or load a saved alignment first")
+        pairwise_aligner = ReusableAligner((self.index, self.dense), self.gap_penalty, self.gap_open, self.gap_extend,
+                                           metrics=self.metrics)
+        if names is not None:  # checked before anything is merged
+            sequences, names = list(sequences), list(names)
+            if len(self.names) != self.block.shape[0] or len(names) != len(sequences):
+                raise ValueError("Names need one entry per sequence - the alignment and the new sequences both")
+        self.align_to_consensus(pairwise_aligner, sequences)
+        if names is not None:
+            self.names.extend(names)
+        return self.aligned_seqs
+
+    def save(self, filename, names=None):
+        """
+        Writes the alignment to a compressed .npz file - the code block plus the column profile (residue counts,
+        first rows and consensus), so a reloaded alignment can take new sequences without recounting its columns
+        :param names: optional row names, defaults to self.names
+        """
+        if self.block is None:
+            raise ValueError("Nothing to save - align at least two sequences first")
+        names = list(self.names if names is None else names)
+        if names and len(names) != self.block.shape[0]:
+            raise ValueError("Names need one entry per aligned sequence")
+        with open(filename, "wb") as f:  # a file object, so numpy doesn't append .npz to the name
+            np.savez_compressed(f, alphabet=np.array("".join(self.alphabet)), names=np.array(names, dtype=str),
+                                block=self.block, counts=self.counts, first_seen=self.first_seen,
+                                consensus_codes=self.consensus_codes)
+
+    @classmethod
+    def load(cls, filename, sub_matrix, gap_penalty=-8, gap_open=None, gap_extend=None, engine=None,
+             metrics=None):
+        """
+        Reopens an alignment written by save, ready for add_sequences (the scoring arguments are the same as
+        __init__ and should match the ones the alignment was built with)
+        \n seq_list starts out empty - the saved rows are only kept as codes
+        """
+        msa = cls([], sub_matrix, gap_penalty, gap_open, gap_extend, engine, metrics)
+        with np.load(filename, allow_pickle=False) as saved:
+            if str(saved["alphabet"]) != "".join(msa.alphabet):
+                raise ValueError("The saved alignment uses a different alphabet than the substitution matrix")
+            msa.block = saved["block"]
+            msa.counts = saved["counts"]
+            msa.first_seen = saved["first_seen"]
+            msa.consensus_codes = saved["consensus_codes"]
+            msa.names = saved["names"].tolist()
+        return msa
+
+    def guide_tree_align(self, tree="upgma", workers=None):
+        """
+        Progressive alignment following a guide tree instead of the input order:
+        1. pairwise distances (1 - identity) for every pair, computed in parallel with BatchAlignment
+        2. guide tree from the distances - "upgma" or "nj" (neighbor-joining)
+        3. walking up the tree, the two groups of each merge are aligned profile against profile
+        \n with gap_open/gap_extend set, the distances and the profile merges both use affine gaps
+        :param workers: worker processes for the distance step (None -> one per core)
+        :return: aligned sequences in input order
+        """
+        self.seq_list = list(self.seq_list)  # the tree needs every sequence at once
+        if len(self.seq_list) < 2:
+            print("You need more than two sequences to run Multiple Sequence Alignment")
+            return None
+        if tree == "upgma":
+            build_tree = upgma
+        elif tree == "nj":
+            build_tree = neighbor_joining
+        else:
+            raise ValueError("Invalid guide tree - Choose from: upgma or nj")
+
+        with self.phase("msa_distances"):  # wall time only, the pairwise work happens in the worker processes
+            distances = BatchAlignment(self.sub_matrix, self.gap_penalty, self.gap_open, self.gap_extend,
+                                       workers=workers).distance_matrix(self.seq_list)
+        with self.phase("msa_guide_tree"):
+            merges = build_tree(distances)
+
+        groups = {i: ([i], encode_block(seq.upper(), self.index)) for i, seq in enumerate(self.seq_list)}
+        for node, (left, right) in enumerate(merges, start=len(self.seq_list)):
+            members_a, block_a = groups.pop(left)
+            members_b, block_b = groups.pop(right)
+            with self.phase("msa_profile_merge", (block_a.shape[1] + 1) * (block_b.shape[1] + 1)):
+                groups[node] = (members_a + members_b, align_blocks(block_a, block_b, self.dense, self.gap_penalty,
+                                                                    self.gap_open, self.gap_extend))
+
+        members, block = groups.popitem()[1]
+        self.set_block(block[np.argsort(members)])  # put rows back in input order
+        return self.aligned_seqs
@@ -0,0 +1,68 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Per-process aligner for the pool workers of Batch_Align, Align_Server and Align_CLI
+# The pool initializer builds one ReusableAligner in every worker process - the encoded substitution matrix and the DP
+# buffers are then reused by every work unit the process runs - and keeps it on `worker`, together with the scoring
+# arguments and whatever else the work units need (a sequence list, a k-mer index). Only the standard library is
+# imported up front, so the command line still starts without loading NumPy.
+
+
+class WorkerState:
+    """What the pool initializer leaves in a worker process"""
+    def __init__(self):
+        self.aligner = None  # ReusableAligner
+        self.scoring = None  # (sub_matrix, gap_penalty, gap_open, gap_extend)
+        self.data = None  # extra per-process data, e.g. the sequence list
+
+
+# work unit functions read it as Pool_Worker.worker - the object stays, only its attributes are replaced
+worker = WorkerState()
+
+
+def init_worker(scoring, data=None, cache_path=None, load=None):
+    """
+    Pool initializer - builds the worker's aligner
+    :param scoring: (sub_matrix, gap_penalty, gap_open, gap_extend)
+    :param data: stored as worker.data, or load(data) when load is given (e.g. KmerIndex.load and a directory)
+    :param cache_path: optional SQLite result cache (Result_Cache) - each worker opens its own connection
+    """
+    from Reusable_Align import ReusableAligner
+    cache = None
+    if cache_path is not None:
+        from Result_Cache import AlignmentCache
+        cache = AlignmentCache(cache_path)
+    worker.aligner = ReusableAligner(*scoring, cache=cache)
+    worker.scoring = tuple(scoring)
+    worker.data = load(data) if load is not None else data
+
+
+def bounded_map(pool, function, work_units, args, max_pending):
+    """
+    Like pool.map but only keeps max_pending work units in flight, so lazily produced work units are only read as
+    fast as the workers get through them. Results come back in submission order.
+    """
+    pending = deque()
+    for unit in work_units:
+        pending.append(pool.submit(function, unit, *args))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def map_work(function, work_units, args, init_args, workers=None, pending_per_worker=2):
+    """
+    Runs work units on a process pool (or in this process when workers=1), yields results in input order
+    :param init_args: arguments of init_worker, run once in every worker process
+    :param workers: worker processes (None -> one per core)
+    """
+    if workers == 1:
+        init_worker(*init_args)
+        for unit in work_units:
+            yield function(unit, *args)
+        return
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=init_args) as pool:
+        yield from bounded_map(pool, function, work_units, args, pending_per_worker * workers)
@@ -0,0 +1,194 @@
+import numpy as np
+from Align_Engines import E_EXTEND, F_EXTEND, NEG_INF, encode_sequence
+
+# Profile-profile alignment for progressive multiple alignment
+# An aligned group is a uint8 block (rows x columns) of alphabet indices, with the gap stored as index len(alphabet).
+# Two blocks are aligned column against column using the average sum-of-pairs score of every residue pair.
+# With affine gaps, a run of gap columns put against one block costs gap_open for its first column and gap_extend for
+# every further one (each weighted by the residue pairs it breaks up); gaps already inside a block count as extensions.
+
+
+def encode_block(seq, index):
+    """Encodes one sequence as a 1-row block"""
+    return encode_sequence(seq, index).astype(np.uint8)[None, :]
+
+
+def decode_block(block, alphabet):
+    """Turns a block back into a list of aligned strings (alphabet = index -> char, gap last)"""
+    symbols = np.array(list(alphabet) + ["-"])
+    return ["".join(row) for row in symbols[block]]
+
+
+def column_counts(block, symbols):
+    """Residue (and gap) counts for every column of a block -> columns x symbols"""
+    counts = np.zeros((block.shape[1], symbols), dtype=np.int64)
+    for symbol in range(symbols):
+        counts[:, symbol] = (block == symbol).sum(axis=0)
+    return counts
+
+
+def gap_weights(block_a, block_b, gap_code):
+    """Residue pairs a gap column put against each column breaks up: residues in the column x rows of the other block"""
+    weight_a = (block_a != gap_code).sum(axis=0).astype(np.int64) * block_b.shape[0]
+    weight_b = (block_b != gap_code).sum(axis=0).astype(np.int64) * block_a.shape[0]
+    return weight_a, weight_b
+
+
+def profile_scores(block_a, block_b, dense, gap_penalty):
+    """
+    Sum-of-pairs score of every column of block_a against every column of block_b, plus the cost of putting a gap
+    column against each column. Everything is scaled by rows_a * rows_b, which keeps scores as exact integers and
+    doesn't change which alignment is optimal.
+    :return: pair scores (cols_a x cols_b), gap cost for each column of a, gap cost for each column of b
+    """
+    symbols = len(dense) + 1
+    pair_matrix = np.zeros((symbols, symbols), dtype=np.int64)  # residue-residue scores, gap vs residue, gap-gap = 0
+    pair_matrix[:-1, :-1] = dense
+    pair_matrix[:-1, -1] = gap_penalty
+    pair_matrix[-1, :-1] = gap_penalty
+
+    counts_a = column_counts(block_a, symbols)
+    counts_b = column_counts(block_b, symbols)
+    scores = counts_a @ pair_matrix @ counts_b.T
+    weight_a, weight_b = gap_weights(block_a, block_b, len(dense))
+    return scores, gap_penalty * weight_a, gap_penalty * weight_b
+
+
+def profile_path(scores, gap_a, gap_b):
+    """
+    Needleman-Wunsch over precomputed column scores with per-column gap costs (row-vectorized like the numpy engine)
+    :return: list of moves from start to end (1=diagonal, 2=up -> gap in b, 3=left -> gap in a)
+    """
+    n, m = scores.shape
+    cost_b = np.zeros(m + 1, dtype=np.int64)  # cost_b[j] = total cost of gapping columns 1..j of b
+    cost_b[1:] = np.cumsum(gap_b)
+    traceback_matrix = np.empty((n + 1, m + 1), dtype=np.int8)
+    traceback_matrix[0] = 3
+    traceback_matrix[1:, 0] = 2
+    traceback_matrix[0, 0] = 0
+
+    row = cost_b.copy()
+    first_cell = 0
+    for i in range(1, n + 1):
+        first_cell += gap_a[i - 1]
+        diagonal = row[:-1] + scores[i - 1]
+        up = row[1:] + gap_a[i - 1]
+        best = np.maximum(diagonal, up)
+        candidates = np.empty(m + 1, dtype=np.int64)
+        candidates[0] = first_cell
+        candidates[1:] = best
+        row = np.maximum.accumulate(candidates - cost_b) + cost_b
+        left = row[:-1] + gap_b
+        traceback_matrix[i, 1:] = np.where(left >= best, 3, np.where(up >= diagonal, 2, 1))
+
+    moves = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        move = int(traceback_matrix[i, j])
+        moves.append(move)
+        if move == 1:
+            i -= 1
+            j -= 1
+        elif move == 2:
+            i -= 1
+        else:
+            j -= 1
+    moves.reverse()
+    return moves
+
+
+def merge_blocks(block_a, block_b, moves, gap_code):
+    """Stacks two blocks into one, inserting gap columns where the path moved through only one of them"""
+    moves = np.asarray(moves, dtype=np.int8)
+    takes_a = moves != 3  # diagonal or up consumes a column of a
+    takes_b = moves != 2
+    index_a = np.cumsum(takes_a) - 1
+    index_b = np.cumsum(takes_b) - 1
+
+    merged = np.full((block_a.shape[0] + block_b.shape[0], len(moves)), gap_code, dtype=np.uint8)
+    merged[:block_a.shape[0], takes_a] = block_a[:, index_a[takes_a]]
+    merged[block_a.shape[0]:, takes_b] = block_b[:, index_b[takes_b]]
+    return merged
+
+
+def profile_path_affine(scores, open_a, extend_a, open_b, extend_b):
+    """
+    Gotoh's three-state Needleman-Wunsch over precomputed column scores, with per-column open and extend costs
+    (a gap run over columns k..l of a costs open_a[k] + extend_a[k+1..l]; open costs must be <= extend costs)
+    \n the states share one uint8 per cell like Align_Engines' affine engine: bits 0-1 = H move, bit 2 = E extends E,
+    bit 3 = F extends F
+    :return: list of moves from start to end (1=diagonal, 2=up -> gap in b, 3=left -> gap in a)
+    """
+    n, m = scores.shape
+    cost_b = np.zeros(m + 1, dtype=np.int64)  # cost_b[j] = extend costs of columns 1..j of b
+    cost_b[1:] = np.cumsum(extend_b)
+    open_step_b = open_b - extend_b  # extra cost of a run that opens at each column of b
+    states = np.zeros((n + 1, m + 1), dtype=np.uint8)
+    states[0, 1:] = 3 | E_EXTEND  # gap row and column are one gap run each
+    states[1:, 0] = 2 | F_EXTEND
+    states[0, 1:2] = 3
+    states[1:2, 0] = 2
+
+    h_row = np.zeros(m + 1, dtype=np.int64)
+    h_row[1:] = cost_b[1:] + open_step_b[:1]  # one run opening at column 1 (nothing when b is empty)
+    f_row = np.full(m + 1, NEG_INF, dtype=np.int64)
+    first_cell = 0
+    for i in range(1, n + 1):
+        first_cell += open_a[0] if i == 1 else extend_a[i - 1]
+        diagonal = h_row[:-1] + scores[i - 1]
+        f_open = h_row[1:] + open_a[i - 1]
+        f_extend = f_row[1:] + extend_a[i - 1]
+        f_row = np.empty(m + 1, dtype=np.int64)
+        f_row[0] = first_cell
+        f_row[1:] = np.maximum(f_open, f_extend)
+        best = np.maximum(diagonal, f_row[1:])
+
+        # reopening a gap never beats extending it, so E is a running max over where the run opened
+        candidates = np.empty(m + 1, dtype=np.int64)
+        candidates[0] = first_cell
+        candidates[1:] = best
+        e_row = np.maximum.accumulate(candidates[:-1] - cost_b[:-1] + open_step_b) + cost_b[1:]
+
+        h_row = np.empty(m + 1, dtype=np.int64)
+        h_row[0] = first_cell
+        h_row[1:] = np.maximum(best, e_row)
+        codes = np.where(e_row >= best, 3, np.where(f_row[1:] >= diagonal, 2, 1)).astype(np.uint8)
+        # ties open a new gap, as in Align_Engines' affine engine
+        codes[1:] |= np.where(e_row[:-1] + extend_b[1:] > h_row[1:-1] + open_b[1:], E_EXTEND, 0).astype(np.uint8)
+        codes |= np.where(f_extend > f_open, F_EXTEND, 0).astype(np.uint8)
+        states[i, 1:] = codes
+
+    moves = []
+    i, j = n, m
+    state = 0  # 0 = H, 2 = F (up), 3 = E (left)
+    while i > 0 or j > 0:
+        code = int(states[i, j])
+        if state == 0:
+            state = code & 3
+        moves.append(state)
+        if state == 1:
+            i -= 1
+            j -= 1
+            state = 0
+        elif state == 2:
+            state = 2 if code & F_EXTEND else 0
+            i -= 1
+        else:
+            state = 3 if code & E_EXTEND else 0
+            j -= 1
+    moves.reverse()
+    return moves
+
+
+def align_blocks(block_a, block_b, dense, gap_penalty, gap_open=None, gap_extend=None):
+    """
+    Profile-profile alignment of two aligned groups, returns the merged block (rows of a, then rows of b)
+    :param gap_open: optional affine gaps (set with gap_extend) - used instead of gap_penalty
+    """
+    if gap_open is None:
+        scores, gap_a, gap_b = profile_scores(block_a, block_b, dense, gap_penalty)
+        return merge_blocks(block_a, block_b, profile_path(scores, gap_a, gap_b), len(dense))
+    scores, extend_a, extend_b = profile_scores(block_a, block_b, dense, gap_extend)
+    weight_a, weight_b = gap_weights(block_a, block_b, len(dense))
+    moves = profile_path_affine(scores, gap_open * weight_a, extend_a, gap_open * weight_b, extend_b)
+    return merge_blocks(block_a, block_b, moves, len(dense))
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+from collections import OrderedDict
+
+# Alignment result cache
+# Results (score + aligned sequences, no matrices) are stored under a SHA-256 key of both sequences, the substitution
+# matrix contents and the gap parameters. Two tiers: an in-memory LRU dict of recent results, and an optional SQLite
+# file shared across runs and processes, evicted least-recently-used first once it grows past max_disk_bytes.
+
+
+def result_key(mode, seq_1, seq_2, sub_matrix_digest, gap_penalty, gap_open=None, gap_extend=None):
+    """Cache key for one alignment (mode: "global" or "local")"""
+    fields = (mode, seq_1, seq_2, sub_matrix_digest, gap_penalty, gap_open, gap_extend)
+    return hashlib.sha256(repr(fields).encode()).hexdigest()
+
+
+class AlignmentCache:
+    """
+    Two tier result cache with hit/miss counters
+    \n path=None keeps it in memory only
+    """
+    def __init__(self, path=None, memory_items=1024, max_disk_bytes=256 * 1024 ** 2):
+        """
+        :param path: SQLite file for the persistent tier (created if missing)
+        :param memory_items: results kept in the in-memory LRU tier
+        :param max_disk_bytes: total size of stored results the SQLite tier is trimmed back to
+        """
+        self.memory = OrderedDict()
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.path = path
+        self.connection = None
+        self.disk_bytes = 0
+        if path is not None:
+            self.open()
+
+    def open(self):
+        """Connects to the SQLite file (autocommit, so other processes see new results right away)"""
+        self.connection = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results "
+                                "(key TEXT PRIMARY KEY, value BLOB, size INTEGER, last_used REAL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self.disk_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def get(self, key):
+        """Returns the cached result or None, checking memory first, then disk"""
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.memory_hits += 1
+            return self.memory[key]
+        if self.connection is not None:
+            row = self.connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.connection.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+                value = pickle.loads(row[0])
+                self.remember(key, value)
+                self.disk_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Stores a result in both tiers"""
+        self.remember(key, value)
+        if self.connection is not None:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            old = self.connection.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                                    (key, blob, len(blob), time.time()))
+            self.disk_bytes += len(blob) - (old[0] if old else 0)
+            if self.disk_bytes > self.max_disk_bytes:
+                self.evict()
+
+    def remember(self, key, value):
+        """Adds to the memory tier, dropping the least recently used result when full"""
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def evict(self):
+        """Deletes least recently used results until the SQLite tier is back under 90% of max_disk_bytes"""
+        # other processes may share the file, so start from the real total
+        self.disk_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        target = 0.9 * self.max_disk_bytes
+        doomed = []
+        for key, size in self.connection.execute("SELECT key, size FROM results ORDER BY last_used"):
+            if self.disk_bytes <= target:
+                break
+            doomed.append((key,))
+            self.disk_bytes -= size
+        self.connection.executemany("DELETE FROM results WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def clear(self):
+        """Empties both tiers (counters are kept)"""
+        self.memory.clear()
+        if self.connection is not None:
+            self.connection.execute("DELETE FROM results")
+            self.disk_bytes = 0
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def stats(self):
+        """Hit/miss counters and tier sizes"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {"memory_hits": self.memory_hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions, "memory_items": len(self.memory), "disk_bytes": self.disk_bytes,
+                "disk_file_bytes": os.path.getsize(self.path) if self.path and os.path.exists(self.path) else 0}
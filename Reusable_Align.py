@@ -0,0 +1,75 @@
+import numpy as np
+from Sequence_Align_Toolkit import SequenceAlign
+
+# Reusable aligner for many-alignment workloads (batch workers, progressive MSA, services)
+# The numpy engine matrices are handed out as views into flat buffers that are kept between alignments and only
+# grow when a larger pair arrives, so aligning thousands of pairs doesn't allocate (and free) new matrices each time.
+
+
+class DPBuffers:
+    """
+    Pool of named, growable flat NumPy buffers handed out as (rows x cols) views
+    \n max_bytes caps what the pool keeps - a request that would go over it gets a one-off array that isn't kept,
+    so long-running processes hold at most max_bytes between alignments
+    """
+    def __init__(self, max_bytes=256 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.buffers = {}  # name -> flat array
+        self.grow_count = 0  # times a buffer had to be (re)allocated
+        self.oversize_count = 0  # requests served with a one-off array because of max_bytes
+
+    def get(self, name, shape, dtype, zero):
+        """Returns a view of the named buffer with the given shape, filled with 0 when zero is True"""
+        size = int(np.prod(shape))
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.dtype != dtype or buffer.size < size:
+            itemsize = np.dtype(dtype).itemsize
+            others = self.nbytes - (buffer.nbytes if buffer is not None else 0)
+            if others + size * itemsize > self.max_bytes:
+                self.oversize_count += 1
+                return np.zeros(shape, dtype=dtype) if zero else np.empty(shape, dtype=dtype)
+            # grow by at least half, so a slowly increasing workload doesn't reallocate on every pair
+            capacity = max(size, min(3 * (buffer.size if buffer is not None else 0) // 2,
+                                     (self.max_bytes - others) // itemsize))
+            buffer = np.empty(capacity, dtype=dtype)
+            self.buffers[name] = buffer
+            self.grow_count += 1
+        view = buffer[:size].reshape(shape)
+        if zero:
+            view.fill(0)
+        return view
+
+    def reset(self):
+        """Frees every buffer"""
+        self.buffers = {}
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self.buffers.values())
+
+
+class ReusableAligner(SequenceAlign):
+    """
+    SequenceAlign that keeps its numpy engine matrices in a DPBuffers pool across set_sequences calls
+    \n gen_global_data / gen_local_data / gen_all_data default to the numpy engine here. The score and traceback
+    matrices of one alignment are overwritten by the next one - copy them first if they need to be kept.
+    """
+    def __init__(self, sub_matrix, gap_penalty, gap_open=None, gap_extend=None, max_buffer_bytes=256 * 1024 ** 2,
+                 cache=None, metrics=None):
+        super().__init__(sub_matrix, gap_penalty, gap_open, gap_extend, cache, metrics)
+        self.buffers = DPBuffers(max_buffer_bytes)
+
+    def gen_all_data(self, engine="numpy"):
+        super().gen_all_data(engine)
+
+    def gen_global_data(self, engine="numpy", bandwidth=None, widen=True, workers=None):
+        super().gen_global_data(engine, bandwidth, widen, workers)
+
+    def gen_local_data(self, engine="numpy", workers=None):
+        super().gen_local_data(engine, workers)
+
+    def reset(self):
+        """Drops the buffers and the results that point into them, e.g. after an unusually large pair"""
+        self.buffers.reset()
+        self.nw_s_matrix = self.nw_t_matrix = self.nw_path_matrix = None
+        self.sw_s_matrix = self.sw_t_matrix = self.sw_path_matrix = None
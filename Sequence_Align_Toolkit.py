@@ -1,12 +1,52 @@
-import plotly.express as px
-
-class SequenceAlign:
+import numpy as np
+from Align_Engines import (banded_numpy, decode_sub_matrix, encode_sub_matrix, global_score_affine, global_score_numpy,
+                           hirschberg_numpy, local_score_affine, local_score_profile, matrix_digest,
+                           needleman_wunsch_affine, needleman_wunsch_numpy, query_profile, semi_global_numpy,
+                           semi_global_score_numpy, smith_waterman_affine, smith_waterman_numpy, waterman_eggert_numpy)
+from Align_Metrics import Instrumented, matrix_bytes
+from Disk_Buffers import DiskBuffers
+from Heatmap_Render import output_name, render_heatmap
+from Result_Cache import result_key
+from Traceback_Store import PackedTraceback, PathMatrix
+from Wavefront_Align import wavefront_fill
+
+class SequenceAlign(Instrumented):
     #SETUP
-    def __init__(self, sub_matrix, gap_penalty):
+    def __init__(self, sub_matrix, gap_penalty, gap_open=None, gap_extend=None, cache=None, metrics=None,
+                 scratch_dir=None):
+        """
+        :param sub_matrix: "AC" score dict, or (alphabet index, dense array) from SubstitutionMatrix(..., encoded=True)
+        :param gap_penalty: linear gap penalty (every gap position costs the same)
+        :param gap_open: optional affine gaps (Gotoh) - penalty of the first position of a gap, set with gap_extend
+        :param gap_extend: penalty of every further position of the same gap (numpy engine only)
+        :param cache: optional Result_Cache.AlignmentCache - gen_global_data / gen_local_data then reuse stored
+        scores + aligned sequences for pairs seen before (a cache hit keeps no matrices)
+        :param metrics: optional Align_Metrics.AlignMetrics - records time, DP cells and matrix memory per phase
+        (fill, traceback, path, plot ...), off by default
+        :param scratch_dir: optional directory - the numpy engine matrices are then memory-mapped files in a scratch
+        subdirectory there (Disk_Buffers) instead of arrays in RAM, for alignments too large for memory. The engines
+        default to numpy, and the subdirectory is deleted with the aligner (or by self.buffers.cleanup())
+        """
+        if (gap_open is None) != (gap_extend is None):
+            raise ValueError("Affine gaps need both gap_open and gap_extend")
+        if gap_open is not None and gap_open > gap_extend:
+            raise ValueError("gap_open must be <= gap_extend (opening a gap can't cost less than extending one)")
+        self.encoded_sub_matrix = None  # (alphabet index, dense array) built on first use by the engines
+        if isinstance(sub_matrix, tuple):  # already encoded - keep it and derive the dict for score_pos/score_align
+            self.encoded_sub_matrix = sub_matrix
+            sub_matrix = decode_sub_matrix(sub_matrix)
         self.sub_matrix = sub_matrix
         self.gap_penalty = gap_penalty
+        self.gap_open = gap_open
+        self.gap_extend = gap_extend
         self.seq_1 = None
         self.seq_2 = None
+        self.sub_matrix_digest = None  # hash of the sub_matrix contents, computed on first use
+        self.query_profile = None  # ((query, sub_matrix digest), profile) of the last local_score query
+        # DPBuffers pool for the numpy engine matrices (set by ReusableAligner), or DiskBuffers with scratch_dir
+        self.buffers = DiskBuffers(scratch_dir) if scratch_dir is not None else None
+        self.result_cache = cache
+        self.metrics = metrics
 
         # Store Needleman-Wunsch data
         self.nw_s_matrix = None
@@ -14,6 +54,9 @@ class SequenceAlign:
         self.nw_optimal_alignment = None
         self.nw_result = []
         self.nw_path_matrix = None
+        self.nw_engine = None  # engine used by the last gen_global_data call
+        self.nw_bandwidth = None  # bandwidth accepted by the last banded run
+        self.sw_engine = None  # engine used by the last gen_local_data call
 
         # Store Smith-Waterman data
         self.sw_s_matrix = None
@@ -21,6 +64,14 @@ class SequenceAlign:
         self.sw_optimal_alignment = None
         self.sw_result = []
         self.sw_path_matrix = None
+        self.sw_max_cell = None  # (row, col) of the best local score, recorded by gen_local_data
+        self.sw_top_hits = []  # top-k non-overlapping local alignments from gen_top_local_data
+
+        # Store semi-global data (gen_semi_global_data)
+        self.sg_optimal_alignment = None
+        self.sg_result = []
+        self.sg_span_1 = None  # (start, end) slice of seq_1 inside the overlap
+        self.sg_span_2 = None  # (start, end) slice of seq_2 inside the overlap -> mapped reference region
 
     def set_sequences(self, seq1, seq2):
         """Run this first and choose which two sequences you want to align"""
@@ -28,16 +79,20 @@ class SequenceAlign:
         self.seq_2 = seq2.upper()
 
 # DATA GENERATION FUNCTIONS
-    def gen_all_data(self):
+    def gen_all_data(self, engine=None):
         """
         If you want to generate data for both alignment methods run this
         Generates all needed data to use the rest of the functions in this class.
+        :param engine: "python" (nested lists) or "numpy" (vectorized rows, much faster for long sequences) - None ->
+        "python", or "numpy" with scratch_dir
         """
-        self.gen_local_data()
-        self.gen_global_data()
+        self.gen_local_data(engine)
+        self.gen_global_data(engine)
 
-        self.global_path_matrix()
-        self.local_path_matrix()
+        if self.nw_engine != "cache":  # cache hits have no matrices to trace a path through
+            self.global_path_matrix()
+        if self.sw_engine != "cache":
+            self.local_path_matrix()
 
     def needleman_wunsch(self):
         """
@@ -59,10 +114,10 @@ class SequenceAlign:
             traceback_matrix.append([2])
 
         # apply recurrence relation to fill remaining of matrix
-        for row in range(0, len(self.seq_1)):
+        for row, sub_row in enumerate(self.python_sub_rows()):
             for col in range(len(self.seq_2)):
                 # calculate scores for 3 possible moves:
-                diagonal_score = score_matrix[row][col] + self.score_pos(self.seq_1[row], self.seq_2[col], self.sub_matrix, self.gap_penalty)  # Diagonal
+                diagonal_score = score_matrix[row][col] + sub_row[col]  # Diagonal
                 up_score = score_matrix[row][col + 1] + self.gap_penalty  # Up
                 left_score = score_matrix[row + 1][col] + self.gap_penalty  # Left
                 # choose best score and move
@@ -71,6 +126,7 @@ class SequenceAlign:
         return score_matrix, traceback_matrix
 
     def smith_waterman(self):
+        self.sw_max_cell = (0, 0)
         score_matrix = [[0]]
         traceback_matrix = [[0]]
         maxscore = 0
@@ -83,10 +139,10 @@ class SequenceAlign:
             score_matrix.append([0])
             traceback_matrix.append([0])
 
-        for row in range(0, len(self.seq_1)):
+        for row, sub_row in enumerate(self.python_sub_rows()):
             for col in range(len(self.seq_2)):
                 # calculate the scores for 3 possible moves
-                diagonal_score = score_matrix[row][col] + self.score_pos(self.seq_1[row], self.seq_2[col], self.sub_matrix, self.gap_penalty)
+                diagonal_score = score_matrix[row][col] + sub_row[col]
                 up_score = score_matrix[row][col + 1] + self.gap_penalty
                 left_score = score_matrix[row + 1][col] + self.gap_penalty
                 best_score = max(diagonal_score, up_score, left_score)
@@ -98,8 +154,105 @@ class SequenceAlign:
                     traceback_matrix[row + 1].append(self.max3t(diagonal_score, up_score, left_score))
                     if best_score > maxscore:
                         maxscore = best_score
+                        self.sw_max_cell = (row + 1, col + 1)  # first max in row order, no max_mat scan needed
         return score_matrix, traceback_matrix, maxscore
 
+    def python_sub_rows(self):
+        """
+        Yields, for each residue of seq_1, the substitution scores against every residue of seq_2 as a plain list
+        \n uses the integer-encoded matrix, so the python engine does no "AC" string building per cell
+        """
+        index, dense = self.get_encoded_sub_matrix()
+        scores = dense.tolist()
+        codes_2 = [index[char] for char in self.seq_2]
+        for char in self.seq_1:
+            row_scores = scores[index[char]]
+            yield [row_scores[code] for code in codes_2]
+
+    def get_encoded_sub_matrix(self):
+        """Returns the integer-encoded substitution matrix used by the numpy engine, building it once per instance"""
+        if self.encoded_sub_matrix is None:
+            self.encoded_sub_matrix = encode_sub_matrix(self.sub_matrix)
+        return self.encoded_sub_matrix
+
+    def get_sub_matrix_digest(self):
+        """Hash of the sub_matrix contents, computed on first use"""
+        if self.sub_matrix_digest is None:
+            self.sub_matrix_digest = matrix_digest(self.sub_matrix)
+        return self.sub_matrix_digest
+
+    def needleman_wunsch_numpy(self):
+        """
+        Same output as needleman_wunsch but filled row by row with NumPy, matrices are returned as arrays
+        \n With affine gaps this runs Gotoh's three-state DP instead
+        """
+        if self.gap_open is not None:
+            return needleman_wunsch_affine(self.seq_1, self.seq_2, self.get_encoded_sub_matrix(), self.gap_open,
+                                           self.gap_extend, self.buffers)
+        return needleman_wunsch_numpy(self.seq_1, self.seq_2, self.get_encoded_sub_matrix(), self.gap_penalty,
+                                      self.buffers)
+
+    def smith_waterman_numpy(self):
+        """
+        Same output as smith_waterman but filled row by row with NumPy, matrices are returned as arrays
+        \n With affine gaps this runs Gotoh's three-state DP instead
+        """
+        if self.gap_open is not None:
+            return smith_waterman_affine(self.seq_1, self.seq_2, self.get_encoded_sub_matrix(), self.gap_open,
+                                         self.gap_extend, self.buffers)
+        return smith_waterman_numpy(self.seq_1, self.seq_2, self.get_encoded_sub_matrix(), self.gap_penalty,
+                                    self.buffers)
+
+    def resolve_engine(self, engine):
+        """
+        engine=None -> "numpy" when the matrices go to scratch files (scratch_dir), "python" otherwise
+        \n raises a clear error for an engine that would ignore the scratch files and keep its data in RAM
+        """
+        on_disk = isinstance(self.buffers, DiskBuffers)
+        if engine is None:
+            return "numpy" if on_disk else "python"
+        if on_disk and engine in ("python", "hirschberg", "banded"):
+            raise ValueError(f"The {engine} engine doesn't use scratch_dir - "
+                             "use engine 'numpy' or 'wavefront' for on-disk matrices")
+        return engine
+
+    def check_linear_gaps(self, engine):
+        """Raises a clear error when an engine that only knows the linear gap_penalty is used with affine gaps"""
+        if self.gap_open is not None:
+            raise ValueError(f"The {engine} engine only supports a linear gap_penalty - "
+                             "use engine 'numpy' for affine gaps")
+
+    def global_score(self, seq1, seq2):
+        """
+        Score-only Needleman-Wunsch: no matrices, traceback or aligned strings are built and the class variables are
+        left untouched - use this when only the optimal score is needed (e.g. all-vs-all screening)
+        """
+        with self.phase("nw_score", (len(seq1) + 1) * (len(seq2) + 1)):
+            if self.gap_open is not None:
+                return global_score_affine(seq1.upper(), seq2.upper(), self.get_encoded_sub_matrix(), self.gap_open,
+                                           self.gap_extend)
+            return global_score_numpy(seq1.upper(), seq2.upper(), self.get_encoded_sub_matrix(), self.gap_penalty)
+
+    def local_score(self, seq1, seq2):
+        """
+        Score-only Smith-Waterman, same idea as global_score - with a linear gap_penalty seq1 is treated as the query
+        of a database search: its query profile is built once and reused while the following calls pass the same seq1
+        :return: optimal score, end row, end col (cell the local traceback would start from)
+        """
+        with self.phase("sw_score", (len(seq1) + 1) * (len(seq2) + 1)):
+            if self.gap_open is not None:
+                return local_score_affine(seq1.upper(), seq2.upper(), self.get_encoded_sub_matrix(), self.gap_open,
+                                          self.gap_extend)
+            return local_score_profile(self.get_query_profile(seq1.upper()), seq2.upper(),
+                                       self.get_encoded_sub_matrix()[0], self.gap_penalty)
+
+    def get_query_profile(self, query):
+        """Query profile (Align_Engines.query_profile) of local_score, rebuilt when the query or sub_matrix changes"""
+        key = (query, self.get_sub_matrix_digest())
+        if self.query_profile is None or self.query_profile[0] != key:
+            self.query_profile = (key, query_profile(query, self.get_encoded_sub_matrix()))
+        return self.query_profile[1]
+
     @staticmethod
     def score_pos(char_1, char_2, sub_matrix, gap_penalty):
         """
@@ -153,12 +306,13 @@ class SequenceAlign:
         col = len(self.seq_2)
 
         while row > 0 or col > 0:
-            if self.nw_t_matrix[row][col] == 1:  # Diagonal move
+            move = self.nw_t_matrix[row, col]
+            if move == 1:  # Diagonal move
                 aligned_seqs[0] = self.seq_1[row - 1] + aligned_seqs[0]  # Match/Mismatch two amino acids
                 aligned_seqs[1] = self.seq_2[col - 1] + aligned_seqs[1]
                 row -= 1
                 col -= 1
-            elif self.nw_t_matrix[row][col] == 3:  # Left move
+            elif move == 3:  # Left move
                 aligned_seqs[0] = "-" + aligned_seqs[0]  # Insert gap in first sequence
                 aligned_seqs[1] = self.seq_2[col - 1] + aligned_seqs[1]  # Character from second sequence
                 col -= 1
@@ -171,10 +325,10 @@ class SequenceAlign:
     def recover_align_local(self):
         """Reconstructs alignment for Smith-Waterman starting from highest score until 0 is reached"""
         aligned_seqs = ["", ""]
-        current_row, current_col = self.max_mat(self.sw_s_matrix) # start at the highest score
+        current_row, current_col = self.sw_max_cell # start at the highest score
 
-        while self.sw_t_matrix[current_row][current_col] > 0: # stop when 0 is reached
-            move = self.sw_t_matrix[current_row][current_col]
+        while self.sw_t_matrix[current_row, current_col] > 0: # stop when 0 is reached
+            move = self.sw_t_matrix[current_row, current_col]
             if move == 1:           # diagonal move
                 aligned_seqs[0] = self.seq_1[current_row - 1] + aligned_seqs[0]
                 aligned_seqs[1] = self.seq_2[current_col - 1] + aligned_seqs[1]
@@ -195,6 +349,9 @@ class SequenceAlign:
         """
         Obtain the maximum value from the matrix
         """
+        if isinstance(mat, np.ndarray):  # numpy engine - argmax also returns the first max in row order
+            maxrow, maxcol = np.unravel_index(np.argmax(mat), mat.shape)
+            return int(maxrow), int(maxcol)
         maxval = mat[0][0]
         maxrow = 0
         maxcol = 0
@@ -209,90 +366,276 @@ class SequenceAlign:
     @staticmethod
     def print_matrix(sub_matrix):
         """
-        Neatly prints out any matrix
+        Neatly prints out any matrix (nested lists, arrays, PackedTraceback or PathMatrix - one row at a time)
         """
-        for i in range(0, len(sub_matrix)):
-            print(" ".join(map(str, sub_matrix[i])))
+        for row in sub_matrix:
+            print(" ".join(map(str, row)))
 
-    def gen_global_data(self):
+    def gen_global_data(self, engine=None, bandwidth=None, widen=True, workers=None):
         """
         FETCHES + GEN. RAW DATA
         stores optimal alignments, score + traceback matrices
+        :param engine: "python", "numpy", "wavefront" (numpy fill split into tiles run on a process pool, for one huge
+        pair), "hirschberg" (linear memory) or "banded" (only cells near the diagonal, for near-identical sequences)
+        - hirschberg and banded store score + alignment only, no matrices are kept. None -> "python", or "numpy"
+        with scratch_dir (only numpy and wavefront can keep their matrices on disk)
+        :param bandwidth: banded engine - cells computed on each side of the diagonal, None -> estimated from length
+        :param widen: banded engine - redo with a doubled band until no path outside the band can score higher
+        :param workers: wavefront engine - worker processes, None -> one per core
         :return:
         """
-        nw_raw_data = self.needleman_wunsch()
-        self.nw_s_matrix = nw_raw_data[0] # data matrices from needleman-wunsch is now class variable
-        self.nw_t_matrix = nw_raw_data[1]
-        self.nw_optimal_alignment = self.nw_s_matrix[len(self.seq_1)][len(self.seq_2)]
-        align_global = self.recover_align_global()
+        engine = self.resolve_engine(engine)
+        if engine in ("python", "wavefront", "hirschberg", "banded"):
+            self.check_linear_gaps(engine)
+        if engine != "banded":  # every other engine gives the exact optimal alignment, so results are shared
+            cached = self.cached_result("global")
+            if cached is not None:
+                self.nw_engine = "cache"
+                self.nw_s_matrix = None
+                self.nw_t_matrix = None
+                self.nw_path_matrix = None
+                self.nw_optimal_alignment, self.nw_result = cached[0], list(cached[1])
+                return
+        self.nw_engine = engine
+        if engine in ("hirschberg", "banded"):
+            self.nw_s_matrix = None
+            self.nw_t_matrix = None
+            self.nw_path_matrix = None
+            with self.phase("nw_fill", self.dp_cells()):  # fill and traceback in one go for these engines
+                if engine == "hirschberg":
+                    self.nw_optimal_alignment, self.nw_result = hirschberg_numpy(self.seq_1, self.seq_2,
+                                                                                 self.get_encoded_sub_matrix(),
+                                                                                 self.gap_penalty)
+                    self.store_result("global", (self.nw_optimal_alignment, self.nw_result))
+                else:
+                    self.nw_optimal_alignment, self.nw_result, self.nw_bandwidth = banded_numpy(
+                        self.seq_1, self.seq_2, self.get_encoded_sub_matrix(), self.gap_penalty, bandwidth, widen)
+            return
+
+        with self.phase("nw_fill", self.dp_cells()):
+            if engine == "python":
+                nw_raw_data = self.needleman_wunsch()
+            elif engine == "numpy":
+                nw_raw_data = self.needleman_wunsch_numpy()
+            elif engine == "wavefront":
+                nw_raw_data = wavefront_fill(self.seq_1, self.seq_2, self.get_encoded_sub_matrix(), self.gap_penalty,
+                                             workers=workers, buffers=self.buffers)
+            else:
+                raise ValueError("Invalid engine - Choose from: python, numpy, wavefront, hirschberg or banded")
+            self.nw_s_matrix = nw_raw_data[0] # data matrices from needleman-wunsch is now class variable
+            self.nw_t_matrix = self.pack_traceback(nw_raw_data[1])
+        self.record_matrices("nw_fill", self.nw_s_matrix, self.nw_t_matrix)
+        self.nw_optimal_alignment = int(self.nw_s_matrix[len(self.seq_1)][len(self.seq_2)])
+        with self.phase("nw_traceback"):
+            align_global = self.recover_align_global()
         self.nw_result = [align_global[0], align_global[1]]
+        self.store_result("global", (self.nw_optimal_alignment, self.nw_result))
 
-    def gen_local_data(self):
+    def gen_local_data(self, engine=None, workers=None):
         """
         FETCHES + GEN. RAW DATA to store in class variables
         stores optimal alignments, score + traceback matrices
+        :param engine: "python", "numpy" or "wavefront" (parallel tiled numpy fill, see gen_global_data) - None ->
+        "python", or "numpy" with scratch_dir
+        :param workers: wavefront engine - worker processes, None -> one per core
         """
-        sw_raw_data = self.smith_waterman() # same principle, convert data matrices from smith-waterman to class variables
-        self.sw_s_matrix = sw_raw_data[0]
-        self.sw_t_matrix = sw_raw_data[1]
+        engine = self.resolve_engine(engine)
+        if engine in ("python", "wavefront"):
+            self.check_linear_gaps(engine)
+        elif engine != "numpy":
+            raise ValueError("Invalid engine - Choose from: python, numpy or wavefront")
+        cached = self.cached_result("local")
+        if cached is not None:
+            self.sw_engine = "cache"
+            self.sw_s_matrix = None
+            self.sw_t_matrix = None
+            self.sw_path_matrix = None
+            self.sw_optimal_alignment, self.sw_result, self.sw_max_cell = cached[0], list(cached[1]), cached[2]
+            return
+        self.sw_engine = engine
+        with self.phase("sw_fill", self.dp_cells()):
+            if engine == "python":
+                # same principle, convert data matrices from smith-waterman to class variables
+                sw_raw_data = self.smith_waterman()
+            elif engine == "wavefront":
+                sw_raw_data = wavefront_fill(self.seq_1, self.seq_2, self.get_encoded_sub_matrix(), self.gap_penalty,
+                                             local=True, workers=workers, buffers=self.buffers)
+                self.sw_max_cell = sw_raw_data[3]  # first max in row order, collected from the tiles
+            else:
+                sw_raw_data = self.smith_waterman_numpy()
+                self.sw_max_cell = self.max_mat(sw_raw_data[0])  # NumPy argmax, same cell as the python scan
+            self.sw_s_matrix = sw_raw_data[0]
+            self.sw_t_matrix = self.pack_traceback(sw_raw_data[1])
+        self.record_matrices("sw_fill", self.sw_s_matrix, self.sw_t_matrix)
         self.sw_optimal_alignment = sw_raw_data[2]
-        align_local = self.recover_align_local()
+        with self.phase("sw_traceback"):
+            align_local = self.recover_align_local()
         self.sw_result = [align_local[0], align_local[1]]
+        self.store_result("local", (self.sw_optimal_alignment, self.sw_result, self.sw_max_cell))
+
+    def cache_key(self, mode):
+        """Result cache key of the current pair - both sequences, sub_matrix contents and gap parameters"""
+        return result_key(mode, self.seq_1, self.seq_2, self.get_sub_matrix_digest(), self.gap_penalty, self.gap_open,
+                          self.gap_extend)
+
+    def cached_result(self, mode):
+        """Looks the current pair up in the result cache (None when there is no cache or no stored result)"""
+        if self.result_cache is None:
+            return None
+        with self.phase("cache_lookup"):
+            return self.result_cache.get(self.cache_key(mode))
+
+    def store_result(self, mode, result):
+        if self.result_cache is not None:
+            self.result_cache.put(self.cache_key(mode), result)
+
+    def gen_top_local_data(self, k=5, min_score=1):
+        """
+        Waterman-Eggert: the k best local alignments that share no aligned cell, for repeats and domain hits
+        \n one fill, then after each hit its path is masked and only the region below/right of it is refilled
+        \n the score, traceback and mask matrices are memory-mapped scratch files with scratch_dir
+        :param k: most alignments returned
+        :param min_score: ignore alignments scoring below this
+        :return: list of (score, [aligned seq 1, aligned seq 2], (start, end) in seq 1, (start, end) in seq 2), best
+        first - the spans are slice indices into the sequences
+        """
+        self.check_linear_gaps("top-k local")
+        with self.phase("sw_top_k", self.dp_cells()):
+            self.sw_top_hits = waterman_eggert_numpy(self.seq_1, self.seq_2, self.get_encoded_sub_matrix(),
+                                                     self.gap_penalty, k, min_score, self.buffers)
+        return self.sw_top_hits
+
+    def gen_semi_global_data(self, free_start_1=True, free_end_1=True, free_start_2=False, free_end_2=False):
+        """
+        Semi-global (overlap) alignment - Needleman-Wunsch where gaps at the chosen ends are free, numpy engine only
+        \n the defaults are for read mapping with set_sequences(read, reference): the reference may overhang the read
+        on both sides for free, the read itself is aligned end to end (set every flag for a dovetail/overlap alignment)
+        :param free_start_1: gaps in seq 1 before its first residue cost nothing
+        :param free_end_1: gaps in seq 1 after its last residue cost nothing
+        :param free_start_2: gaps in seq 2 before its first residue cost nothing
+        :param free_end_2: gaps in seq 2 after its last residue cost nothing
+        :return: score, [aligned seq 1, aligned seq 2], (start, end) in seq 1, (start, end) in seq 2 - the spans are
+        slice indices of the overlap, e.g. seq_2[start:end] is the reference region the read maps to
+        """
+        self.check_linear_gaps("semi-global")
+        with self.phase("sg_align", self.dp_cells()):
+            self.sg_optimal_alignment, self.sg_result, self.sg_span_1, self.sg_span_2 = semi_global_numpy(
+                self.seq_1, self.seq_2, self.get_encoded_sub_matrix(), self.gap_penalty, free_start_1, free_end_1,
+                free_start_2, free_end_2, self.buffers)
+        return self.sg_optimal_alignment, self.sg_result, self.sg_span_1, self.sg_span_2
+
+    def semi_global_score(self, seq1, seq2, free_start_1=True, free_end_1=True, free_start_2=False, free_end_2=False):
+        """
+        Score-only semi-global alignment (same free end gaps as gen_semi_global_data), class variables are untouched
+        :return: optimal score, end row, end col (for the defaults: end col = where the read ends on the reference)
+        """
+        self.check_linear_gaps("semi-global")
+        with self.phase("sg_score", (len(seq1) + 1) * (len(seq2) + 1)):
+            return semi_global_score_numpy(seq1.upper(), seq2.upper(), self.get_encoded_sub_matrix(), self.gap_penalty,
+                                           free_start_1, free_end_1, free_start_2, free_end_2)
+
+    def record_matrices(self, name, *matrices):
+        """Adds the memory of the given matrices to a phase of self.metrics (if any)"""
+        if self.metrics is not None:
+            self.metrics.add_bytes(name, sum(matrix_bytes(matrix) for matrix in matrices))
+
+    def dp_cells(self):
+        """Cells of the full (n+1) x (m+1) DP matrix of the current pair"""
+        return (len(self.seq_1) + 1) * (len(self.seq_2) + 1)
+
+    @staticmethod
+    def pack_traceback(traceback_matrix):
+        """Stores a traceback 2 bits per cell (the python engine builds nested lists, the numpy engine packs as it fills)
+        """
+        if isinstance(traceback_matrix, PackedTraceback):
+            return traceback_matrix
+        return PackedTraceback.from_codes(traceback_matrix)
+
+    def check_nw_matrices(self):
+        """Raises a clear error when Needleman-Wunsch matrices were not kept (hirschberg/banded engine, no data yet)"""
+        if self.nw_engine in ("hirschberg", "banded"):
+            raise ValueError(f"Needleman-Wunsch matrices are not stored by the {self.nw_engine} engine - "
+                             "run gen_global_data with engine 'python', 'numpy' or 'wavefront' for paths, "
+                             "raw matrices and heatmaps")
+        if self.nw_engine == "cache":
+            raise ValueError("Needleman-Wunsch matrices are not stored for cached results - "
+                             "run gen_global_data without a result cache for paths, raw matrices and heatmaps")
+        if self.nw_t_matrix is None:
+            raise ValueError("No Needleman-Wunsch data - run gen_global_data first")
+
+    def check_sw_matrices(self):
+        """Raises a clear error when Smith-Waterman matrices were not kept (result cache hit, no data yet)"""
+        if self.sw_engine == "cache":
+            raise ValueError("Smith-Waterman matrices are not stored for cached results - "
+                             "run gen_local_data without a result cache for paths, raw matrices and heatmaps")
+        if self.sw_t_matrix is None:
+            raise ValueError("No Smith-Waterman data - run gen_local_data first")
 
     def global_path_matrix(self):
         """
         Generates matrix showing the path of optimal alignment via 1's and 0's
         \n 1 indicates cell 'travelled' and 0 means not taken
+        \n stored as a sparse PathMatrix (path cells only), expanded to 1's and 0's when printed or plotted
         """
-        trace_matrix = self.nw_t_matrix # copy traceback matrix since we're going to build on that
+        self.check_nw_matrices()
+        trace_matrix = self.nw_t_matrix
         row = len(self.seq_1) + 1
         col = len(self.seq_2) + 1
 
-        self.nw_path_matrix = [[0] * col for _ in range(row)]
+        self.nw_path_matrix = PathMatrix(row, col)
 
         # start from bottom right corner -> needleman-wunsch
         r, c = row - 1, col - 1
 
-        while r > 0 or c > 0: # iterate through matrix
-            self.nw_path_matrix[r][c] = 1 # fill target w/ a 1
-            if trace_matrix[r][c] == 1: # if cell has value 1, move diagonal
-                r -= 1
-                c -= 1
-            elif trace_matrix[r][c] == 2: # if cell has value 2, move up
-                r -= 1
-            else:
-                c -= 1 # if cell has value 3, move left
+        with self.phase("nw_path"):
+            while r > 0 or c > 0: # iterate through matrix
+                self.nw_path_matrix.add(r, c) # mark target w/ a 1
+                move = trace_matrix[r, c]
+                if move == 1: # if cell has value 1, move diagonal
+                    r -= 1
+                    c -= 1
+                elif move == 2: # if cell has value 2, move up
+                    r -= 1
+                else:
+                    c -= 1 # if cell has value 3, move left
+        self.record_matrices("nw_path", self.nw_path_matrix)
         return self.nw_path_matrix
 
     def local_path_matrix(self):
         """
         Generates matrix showing the path of optimal alignment via 1's and 0's
         \n 1 indicates cell 'travelled' and 0 means not taken
+        \n stored as a sparse PathMatrix (path cells only), expanded to 1's and 0's when printed or plotted
         """
+        self.check_sw_matrices()
         trace_matrix = self.sw_t_matrix # this function needs both traceback and score
         score_matrix = self.sw_s_matrix
         row = len(self.seq_1) + 1
         col = len(self.seq_2) + 1
 
-        self.sw_path_matrix = [[0] * col for _ in range(row)]
-
-        r, c = self.max_mat(score_matrix) # start at highest-scoring cell as per smith-waterman algorithm
-
-        while (r > 0 and c > 0) and trace_matrix[r][c] > 0: # iterate through the matrix and stop once 0 is found
-            self.sw_path_matrix[r][c] = 1
-            if trace_matrix[r][c] == 1: # move diagonal
-                r -= 1
-                c -= 1
-            elif trace_matrix[r][c] == 2: # move up
-                r -= 1
-            else: # move left
-                c -= 1
+        self.sw_path_matrix = PathMatrix(row, col)
+
+        r, c = self.sw_max_cell # start at highest-scoring cell as per smith-waterman algorithm
+
+        with self.phase("sw_path"):
+            while (r > 0 and c > 0) and trace_matrix[r, c] > 0: # iterate through the matrix and stop once 0 is found
+                self.sw_path_matrix.add(r, c)
+                move = trace_matrix[r, c]
+                if move == 1: # move diagonal
+                    r -= 1
+                    c -= 1
+                elif move == 2: # move up
+                    r -= 1
+                else: # move left
+                    c -= 1
+        self.record_matrices("sw_path", self.sw_path_matrix)
         return  self.sw_path_matrix
 
 
 # DATA OUTPUT FUNCTIONS
     def output_nw_raw_matrices(self):
         """Outputs Score and Traceback Matrices from Needleman-Wunsch Algorithm"""
+        self.check_nw_matrices()
         print("\n===[GLOBAL / Needleman-Wunsch] Raw Data===")
 
         print("--Score Matrix--")
@@ -303,6 +646,7 @@ class SequenceAlign:
 
     def output_sw_raw_matrices(self):
         """Outputs Score and Traceback Matrices from Smith-Waterman Algorithm"""
+        self.check_sw_matrices()
         print("\n===[Local / Smith-Waterman] Raw Data===")
         print("--Score Matrix--")
         self.print_matrix(self.sw_s_matrix)
@@ -312,11 +656,13 @@ class SequenceAlign:
 
     def output_nw_path(self):
         """Outputs Path Matrix from Needleman-Wunsch Algorithm"""
+        self.check_nw_matrices()
         print("\n===[Global / Needleman-Wunsch] Path===")
         self.print_matrix(self.nw_path_matrix)
 
     def output_sw_path(self):
         """Outputs Path Matrix from Smith-Waterman Algorithm"""
+        self.check_sw_matrices()
         print("\n===[Local / Smith-Waterman] Path===")
         self.print_matrix(self.sw_path_matrix)
 
@@ -327,6 +673,23 @@ class SequenceAlign:
         for item in self.nw_result:
             print(item)
 
+    def output_sw_top_results(self):
+        """Outputs the top-k local alignments from gen_top_local_data"""
+        print("\n[[LOCAL / Waterman-Eggert Top Alignments]]:")
+        for rank, (score, aligned_seqs, span_1, span_2) in enumerate(self.sw_top_hits, 1):
+            print(f"#{rank} Score: {score} | Sequence 1 [{span_1[0]}:{span_1[1]}] | "
+                  f"Sequence 2 [{span_2[0]}:{span_2[1]}]")
+            for item in aligned_seqs:
+                print(item)
+
+    def output_sg_results(self):
+        """Outputs Aligned Sequences, Score and overlap spans from the semi-global alignment"""
+        print("\n[[SEMI-GLOBAL / End-Gap-Free Aligned Sequences]]:")
+        print(f"Optimal Score: {self.sg_optimal_alignment} | Sequence 1 [{self.sg_span_1[0]}:{self.sg_span_1[1]}] | "
+              f"Sequence 2 [{self.sg_span_2[0]}:{self.sg_span_2[1]}]")
+        for item in self.sg_result:
+            print(item)
+
     def output_sw_results(self):
         """Outputs Aligned Sequences and Optimal Alignment Score from Smith-Waterman Algorithm"""
         print("\n[[LOCAL / Smith-Waterman Aligned Sequences]]:")
@@ -335,70 +698,37 @@ class SequenceAlign:
             print(item)
 
 # HEATMAP DISPLAY FUNCTIONS
-    def heatmaps_nw_raw(self):
+# max_size: matrices with more rows/columns than this are pooled into blocks (see Heatmap_Render)
+# pooling: "max" or "mean" pooling for score matrices, output: None -> show, or a .html / .png filename to write to
+# (the raw functions write two files, <name>_score and <name>_traceback)
+    def heatmaps_nw_raw(self, max_size=300, pooling="max", output=None):
         """Display heatmaps for Needleman-Wunsch Scoring and Traceback Matrices"""
-        fig = px.imshow(self.nw_s_matrix,
-                        labels=dict(x="Sequence 1", y="Sequence 2", color = "Productivity"),
-                        y=[""]+[f"{char}-{i}" for i, char in enumerate(self.seq_1)],
-                        x=[""]+[f"{char}-{i}" for i, char in enumerate(self.seq_2)],
-                        text_auto=True,
-                        color_continuous_scale='Viridis')
-        fig.update_layout(title="Needleman-Wunsch Scoring Matrix Heatmap")
-        fig.update_xaxes(side="top")
-        fig.show()
-
-        fig_2 = px.imshow(self.nw_t_matrix,
-                          labels=dict(x="Sequence 1", y="Sequence 2", color="Productivity"),
-                          y=[""] + [f"{char}-{i}" for i, char in enumerate(self.seq_1)],
-                          x=[""] + [f"{char}-{i}" for i, char in enumerate(self.seq_2)],
-                          text_auto=True,
-                          color_continuous_scale='Viridis')
-        fig_2.update_layout(title="Needleman-Wunsch Traceback Matrix Heatmap")
-        fig_2.update_xaxes(side="top")
-        fig_2.show()
-
-    def heatmaps_sw_raw(self):
+        self.check_nw_matrices()
+        with self.phase("plot"):
+            render_heatmap(self.nw_s_matrix, "Needleman-Wunsch Scoring Matrix Heatmap", self.seq_1, self.seq_2,
+                           'Viridis', pooling, max_size, output=output_name(output, "score"))
+            render_heatmap(self.nw_t_matrix, "Needleman-Wunsch Traceback Matrix Heatmap", self.seq_1, self.seq_2,
+                           'Viridis', pooling, max_size, output=output_name(output, "traceback"))
+
+    def heatmaps_sw_raw(self, max_size=300, pooling="max", output=None):
         """Display heatmaps for Smith-Waterman Scoring and Traceback Matrices"""
-        fig = px.imshow(self.sw_s_matrix,
-                        labels=dict(x="Sequence 1", y="Sequence 2", color="Productivity"),
-                        y=[""] + [f"{char}-{i}" for i, char in enumerate(self.seq_1)],
-                        x=[""] + [f"{char}-{i}" for i, char in enumerate(self.seq_2)],
-                        text_auto=True,
-                        color_continuous_scale='Viridis')
-        fig.update_layout(title="Smith-Waterman Scoring Matrix Heatmap")
-        fig.update_xaxes(side="top")
-        fig.show()
-
-        fig_2 = px.imshow(self.sw_t_matrix,
-                          labels=dict(x="Sequence 1", y="Sequence 2", color="Productivity"),
-                          y=[""] + [f"{char}-{i}" for i, char in enumerate(self.seq_1)],
-                          x=[""] + [f"{char}-{i}" for i, char in enumerate(self.seq_2)],
-                          text_auto=True,
-                          color_continuous_scale='Viridis')
-        fig_2.update_layout(title="Smith-Waterman Traceback Matrix Heatmap")
-        fig_2.update_xaxes(side="top")
-        fig_2.show()
-
-    def heatmap_nw_path(self):
+        self.check_sw_matrices()
+        with self.phase("plot"):
+            render_heatmap(self.sw_s_matrix, "Smith-Waterman Scoring Matrix Heatmap", self.seq_1, self.seq_2,
+                           'Viridis', pooling, max_size, output=output_name(output, "score"))
+            render_heatmap(self.sw_t_matrix, "Smith-Waterman Traceback Matrix Heatmap", self.seq_1, self.seq_2,
+                           'Viridis', pooling, max_size, output=output_name(output, "traceback"))
+
+    def heatmap_nw_path(self, max_size=300, output=None):
         """Display heatmap for Needleman-Wunsch Path Matrix"""
-        fig = px.imshow(self.nw_path_matrix,
-                        labels=dict(x="Sequence 1", y="Sequence 2", color="Productivity"),
-                        y=[""] + [f"{char}-{i}" for i, char in enumerate(self.seq_1)],
-                        x=[""] + [f"{char}-{i}" for i, char in enumerate(self.seq_2)],
-                        text_auto=True,
-                        color_continuous_scale='thermal')
-        fig.update_layout(title="Needleman-Wunsch Path Matrix Heatmap")
-        fig.update_xaxes(side="top")
-        fig.show()
-
-    def heatmap_sw_path(self):
+        self.check_nw_matrices()
+        with self.phase("plot"):
+            render_heatmap(self.nw_path_matrix, "Needleman-Wunsch Path Matrix Heatmap", self.seq_1, self.seq_2,
+                           'thermal', max_size=max_size, output=output)
+
+    def heatmap_sw_path(self, max_size=300, output=None):
         """Display heatmap for Smith-Waterman Path Matrix"""
-        fig = px.imshow(self.sw_path_matrix,
-                        labels=dict(x="Sequence 1", y="Sequence 2", color="Productivity"),
-                        y=[""] + [f"{char}-{i}" for i, char in enumerate(self.seq_1)],
-                        x=[""] + [f"{char}-{i}" for i, char in enumerate(self.seq_2)],
-                        text_auto=True,
-                        color_continuous_scale='thermal')
-        fig.update_layout(title="Smith-Waterman Path Matrix Heatmap")
-        fig.update_xaxes(side="top")
-        fig.show()
+        self.check_sw_matrices()
+        with self.phase("plot"):
+            render_heatmap(self.sw_path_matrix, "Smith-Waterman Path Matrix Heatmap", self.seq_1, self.seq_2,
+                           'thermal', max_size=max_size, output=output)
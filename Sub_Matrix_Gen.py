@@ -1,10 +1,61 @@
+import os
+from Align_Engines import encode_sub_matrix
+
+# process-wide caches of parsed .mat files, keyed by (absolute path, modification time) so an edited file is re-read
+# -> every SubstitutionMatrix instance (and every forked worker process) parses and encodes each file only once
+_parsed_matrices = {}
+_encoded_matrices = {}
+
+
+def matrix_file_key(filename):
+    """Cache key for a matrix file: (absolute path, modification time)"""
+    path = os.path.abspath(filename)
+    return path, os.path.getmtime(path)
+
+
+def parse_matrix_file(filename):
+    """
+    Parses a .mat file (header line of residues, then one row per residue) into a dict like {"AC": 0, ...}
+    \n results are cached per (path, mtime) - treat the returned dict as read-only
+    """
+    key = matrix_file_key(filename)
+    if key not in _parsed_matrices:
+        sub_matrix = {}
+        with open(filename, 'r') as f:
+            header = f.readline().strip().split()
+            alphabet = header
+
+            for line in f:
+                tokens = line.strip().split()
+                row_aa = tokens[0]
+                scores = tokens[1:]
+
+                for col_aa, score in zip(alphabet, scores):
+                    pair = row_aa + col_aa
+                    sub_matrix[pair] = int(score)
+        _parsed_matrices[key] = sub_matrix
+    return _parsed_matrices[key]
+
+
+def encode_matrix_file(filename):
+    """Integer-encoded (alphabet index, dense array) form of a .mat file, cached per (path, mtime)"""
+    key = matrix_file_key(filename)
+    if key not in _encoded_matrices:
+        _encoded_matrices[key] = encode_sub_matrix(parse_matrix_file(filename))
+    return _encoded_matrices[key]
+
+
 class SubstitutionMatrix:
     """
     Generates substitution matrices depending on which biotype is chosen
+    \n encoded=True -> the load functions return (alphabet index, dense int8/int16 array) instead of the "AC" dict,
+    which SequenceAlign, MultipleAlignment and BatchAlignment accept directly
     """
-    def __init__(self, seq_type):
+    def __init__(self, seq_type, encoded=False):
         self.seq_type = seq_type.upper()
+        self.encoded = encoded
         self.sub_matrix = {}
+        self.matrix_file = None  # set when the matrix was loaded from a .mat file (its encoding is cached per file)
 
     def auto_load(self):
         """
@@ -22,8 +73,23 @@ class SubstitutionMatrix:
             self.RNA_submat(1, 0)
         else:
             raise ValueError("Invalid Sequence Type - Choose from: Protein, DNA, or RNA")
+        return self.result()
+
+    def result(self):
+        """Returns the loaded matrix in the form chosen at init - "AC" dict, or (index, dense) if encoded"""
+        if self.encoded:
+            return self.encode()
         return self.sub_matrix
 
+    def encode(self):
+        """
+        Integer-encoded form of the loaded matrix: alphabet -> index map plus a dense int8/int16 NumPy array
+        \n matrices loaded from an unchanged (and unedited) .mat file share one cached encoding
+        """
+        if self.matrix_file is not None and self.sub_matrix == parse_matrix_file(self.matrix_file):
+            return encode_matrix_file(self.matrix_file)
+        return encode_sub_matrix(self.sub_matrix)
+
     def load_protein_matrix(self, filename="blosum62.mat"):
         """
         When calling any matrix (default is blosum62), will parse the .mat file into a substitution matrix
@@ -31,19 +97,9 @@ class SubstitutionMatrix:
         """
         if self.seq_type != "PROTEIN": # error handling in case you try to use a protein sub matrix for R/DNA
             raise ValueError("File loading is for protein sequences")
-        with open(filename, 'r') as f:
-            header = f.readline().strip().split()
-            alphabet = header
-
-            for line in f:
-                tokens = line.strip().split()
-                row_aa = tokens[0]
-                scores = tokens[1:]
-
-                for col_aa, score in zip(alphabet, scores):
-                    pair = row_aa + col_aa
-                    self.sub_matrix[pair] = int(score)
-        return self.sub_matrix
+        self.sub_matrix.update(parse_matrix_file(filename))  # parsed once per process, copied so edits stay local
+        self.matrix_file = filename
+        return self.result()
 
     def DNA_submat(self, match, mismatch, alphabet="ATCG"):
         """
@@ -59,7 +115,7 @@ class SubstitutionMatrix:
                     self.sub_matrix[char_1 + char_2] = match
                 else:
                     self.sub_matrix[char_1 + char_2] = mismatch
-        return self.sub_matrix
+        return self.result()
 
 
     def RNA_submat(self, match, mismatch, alphabet="AUCG"):
@@ -76,7 +132,7 @@ class SubstitutionMatrix:
                     self.sub_matrix[char_1 + char_2] = match
                 else:
                     self.sub_matrix[char_1 + char_2] = mismatch
-        return self.sub_matrix
+        return self.result()
 
 
 
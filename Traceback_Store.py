@@ -0,0 +1,118 @@
+import numpy as np
+
+# Compact storage for traceback and path matrices
+# Traceback codes only take the values 0-3 (0=stop, 1=diagonal, 2=up, 3=left), so 4 cells share one byte. A path
+# matrix is all zeros apart from one cell per alignment step, so only the coordinates of those cells are kept.
+# Both still answer matrix[row][col] and len()/row iteration, and expand to a dense array only when asked to.
+
+
+class PackedTraceback:
+    """
+    (n+1) x (m+1) traceback matrix stored with 2 bits per cell - about 25 MB for a 10k x 10k alignment
+    \n matrix[row, col] returns one code, matrix[row] returns an unpacked row (so matrix[row][col] works as well)
+    """
+    def __init__(self, rows, cols, packed=None):
+        """:param packed: optional zeroed uint8 array of shape packed_shape(rows, cols) to use as storage"""
+        self.shape = (rows, cols)
+        self.packed = np.zeros(self.packed_shape(rows, cols), dtype=np.uint8) if packed is None else packed
+
+    @staticmethod
+    def packed_shape(rows, cols):
+        return rows, (cols + 3) // 4
+
+    @classmethod
+    def from_codes(cls, codes, packed=None):
+        """Packs a full traceback given as nested lists or a 2-D array"""
+        codes = np.asarray(codes, dtype=np.uint8)
+        traceback = cls(*codes.shape, packed=packed)
+        for row in range(codes.shape[0]):
+            traceback.set_row(row, codes[row])
+        return traceback
+
+    def set_row(self, row, codes):
+        """Packs one full row of codes (length cols)"""
+        padded = np.zeros(self.packed.shape[1] * 4, dtype=np.uint8)
+        padded[:self.shape[1]] = codes
+        quads = padded.reshape(-1, 4)
+        self.packed[row] = quads[:, 0] | (quads[:, 1] << 2) | (quads[:, 2] << 4) | (quads[:, 3] << 6)
+
+    def set_block(self, row, col, codes):
+        """
+        Packs a 2-D block of codes with its top left cell at (row, col) - col must be a multiple of 4, so only whole
+        bytes are written (parallel writers of neighbouring blocks never share a byte)
+        """
+        count = -(-codes.shape[1] // 4)
+        padded = np.zeros((codes.shape[0], count * 4), dtype=np.uint8)
+        padded[:, :codes.shape[1]] = codes
+        quads = padded.reshape(codes.shape[0], count, 4)
+        self.packed[row:row + codes.shape[0], col >> 2:(col >> 2) + count] = (
+            quads[:, :, 0] | (quads[:, :, 1] << 2) | (quads[:, :, 2] << 4) | (quads[:, :, 3] << 6))
+
+    def get_row(self, row):
+        """Unpacks one row into an int8 array"""
+        packed_row = self.packed[row]
+        quads = np.stack([(packed_row >> shift) & 3 for shift in (0, 2, 4, 6)], axis=1)
+        return quads.reshape(-1)[:self.shape[1]].astype(np.int8)
+
+    def unpack(self):
+        """Dense int8 array of every code (used for printouts and heatmaps)"""
+        quads = np.stack([(self.packed >> shift) & 3 for shift in (0, 2, 4, 6)], axis=2)
+        return quads.reshape(self.shape[0], -1)[:, :self.shape[1]].astype(np.int8)
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            row, col = key
+            return (int(self.packed[row, col >> 2]) >> ((col & 3) * 2)) & 3
+        return self.get_row(key)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __iter__(self):
+        for row in range(self.shape[0]):
+            yield self.get_row(row)
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+
+class PathMatrix:
+    """
+    Sparse (n+1) x (m+1) path matrix - keeps the (row, col) cells of the optimal path, everything else is 0
+    \n matrix[row] builds that row as a list and dense() the whole 0/1 array, only when a printout or heatmap needs it
+    """
+    def __init__(self, rows, cols, cells=()):
+        self.shape = (rows, cols)
+        self.cells = list(cells)
+
+    def add(self, row, col):
+        self.cells.append((row, col))
+
+    def dense(self):
+        """Full 0/1 uint8 array"""
+        matrix = np.zeros(self.shape, dtype=np.uint8)
+        if self.cells:
+            rows, cols = zip(*self.cells)
+            matrix[list(rows), list(cols)] = 1
+        return matrix
+
+    def __getitem__(self, row):
+        path_row = [0] * self.shape[1]
+        for cell_row, cell_col in self.cells:
+            if cell_row == row:
+                path_row[cell_col] = 1
+        return path_row
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __iter__(self):
+        by_row = {}
+        for cell_row, cell_col in self.cells:
+            by_row.setdefault(cell_row, []).append(cell_col)
+        for row in range(self.shape[0]):
+            path_row = [0] * self.shape[1]
+            for col in by_row.get(row, ()):
+                path_row[col] = 1
+            yield path_row
@@ -0,0 +1,181 @@
+import os
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+import numpy as np
+from Align_Engines import _fill_row, _moves, encode_sequence
+from Disk_Buffers import DiskBuffers
+from Traceback_Store import PackedTraceback
+
+# Parallel wavefront fill for one huge pairwise alignment
+# The DP matrix is cut into tiles of tile_rows x tile_cols cells. A tile only needs the row above it and the column to
+# its left, so it can run as soon as its top and left neighbours are done - every tile on one anti-diagonal of the
+# tile grid is independent of the others. The score matrix and the packed traceback live in
+# multiprocessing.shared_memory (or in the scratch files of a DiskBuffers pool): a worker reads the boundary row and
+# column of its tile straight from the neighbours' cells and writes its own cells in place, the parent only schedules
+# tiles. Tiles are filled with the same row kernel as the serial numpy engine, so the results are identical.
+
+TILE_SHAPE = (512, 4096)  # default tile - wide rows keep NumPy's per-call overhead small next to the work per call
+
+# every worker process maps the shared matrices once, through the pool initializer
+_worker_state = None
+
+
+def _attach(location, shape, dtype):
+    """Maps a shared matrix - ("shm", segment name) or ("file", path of a DiskBuffers file)"""
+    kind, name = location
+    if kind == "file":
+        return np.memmap(name, dtype=dtype, mode="r+", shape=shape), None
+    segment = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=dtype, buffer=segment.buf), segment
+
+
+def _init_tile_worker(score_location, packed_location, codes_1, codes_2, dense, gap_penalty, local):
+    global _worker_state
+    rows, cols = len(codes_1) + 1, len(codes_2) + 1
+    score_matrix, score_segment = _attach(score_location, (rows, cols), np.int64)
+    packed, packed_segment = _attach(packed_location, PackedTraceback.packed_shape(rows, cols), np.uint8)
+    # the segments are kept referenced - closing one would unmap the arrays built on it
+    _worker_state = (score_matrix, PackedTraceback(rows, cols, packed), codes_1, codes_2, dense, gap_penalty, local,
+                     (score_segment, packed_segment))
+
+
+def _run_tile(tile):
+    """Work unit - fills one tile of the shared matrices"""
+    return fill_tile(*_worker_state[:7], *tile)
+
+
+def fill_tile(score_matrix, traceback_matrix, codes_1, codes_2, dense, gap_penalty, local, row_start, row_end,
+              col_start, col_end):
+    """
+    Fills rows row_start..row_end-1 x columns col_start..col_end-1 (row_start >= 1, col_start a multiple of 4)
+    \n the row above and the column to the left must be filled already, as must the gap row and column
+    :return: local -> (best score, row, col) of the tile, first best in row order; global (or no cells) -> None
+    """
+    first = max(col_start, 1)  # column 0 is the gap column, filled before any tile runs
+    gap_steps = gap_penalty * np.arange(col_end - first + 1, dtype=np.int64)
+    tile_codes_2 = codes_2[first - 1:col_end - 1]
+    tile_codes = np.empty((row_end - row_start, col_end - col_start), dtype=np.uint8)
+    if col_start == 0:
+        tile_codes[:, 0] = 0 if local else 2
+    for row in range(row_start, row_end):
+        sub_row = dense[codes_1[row - 1]][tile_codes_2]
+        new_row, diagonal, up, left = _fill_row(score_matrix[row - 1, first - 1:col_end], sub_row, gap_penalty,
+                                                gap_steps, score_matrix[row, first - 1], 0 if local else None)
+        score_matrix[row, first:col_end] = new_row[1:]
+        moves = _moves(diagonal, up, left)
+        if local:
+            moves = np.where(np.maximum(np.maximum(diagonal, up), left) <= 0, 0, moves)  # 0 when cell is clamped
+        tile_codes[row - row_start, first - col_start:] = moves
+    traceback_matrix.set_block(row_start, col_start, tile_codes)  # packed once per tile
+    tile = score_matrix[row_start:row_end, first:col_end]
+    if not local or tile.size == 0:
+        return None
+    tile_row, tile_col = np.unravel_index(np.argmax(tile), tile.shape)
+    return int(tile[tile_row, tile_col]), row_start + int(tile_row), first + int(tile_col)
+
+
+def _shared_array(shape, dtype):
+    """
+    Array in a new shared memory segment, returned with the segment - the caller unlinks it once the workers are done
+    \n the mapping stays until the array (and every view of it) is gone, then the segment is closed
+    """
+    segment = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize))
+    array = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+    weakref.finalize(array, segment.close)
+    return array, segment
+
+
+def tile_grid(rows, cols, tile_rows, tile_cols):
+    """Row and column boundaries of the tiles covering rows 1..rows-1 and columns 0..cols-1"""
+    tile_cols = max(4, -(-tile_cols // 4) * 4)  # whole packed traceback bytes per tile
+    row_bounds = list(range(1, rows, max(1, tile_rows))) + [rows]
+    col_bounds = list(range(0, cols, tile_cols)) + [cols]
+    return row_bounds, col_bounds
+
+
+def wavefront_fill(seq_1, seq_2, encoded_matrix, gap_penalty, local=False, workers=None, tile_shape=TILE_SHAPE,
+                   buffers=None):
+    """
+    Needleman-Wunsch (local=False) or Smith-Waterman (local=True) fill, tiles computed in parallel
+    :param encoded_matrix: (index, dense) tuple from encode_sub_matrix
+    :param workers: worker processes (None -> one per core, 1 -> every tile in this process, no shared memory)
+    :param tile_shape: (rows, cols) of a tile - cols is rounded up to a multiple of 4
+    :param buffers: optional DiskBuffers - the matrices are then its memory-mapped files, which the workers open too
+    :return: score_matrix, traceback_matrix (PackedTraceback) - local also returns the max score and its first cell
+    in row order, same as smith_waterman_numpy + max_mat
+    """
+    index, dense = encoded_matrix
+    codes_1 = encode_sequence(seq_1, index)
+    codes_2 = encode_sequence(seq_2, index)
+    rows, cols = len(codes_1) + 1, len(codes_2) + 1
+    workers = workers or os.cpu_count() or 1
+    packed_shape = PackedTraceback.packed_shape(rows, cols)
+
+    segments = []
+    if isinstance(buffers, DiskBuffers):
+        score_matrix = buffers.get("sw_score" if local else "nw_score", (rows, cols), np.int64, True)
+        packed = buffers.get("sw_traceback" if local else "nw_traceback", packed_shape, np.uint8, True)
+        locations = (("file", score_matrix.filename), ("file", packed.filename))
+    elif workers > 1:
+        score_matrix, score_segment = _shared_array((rows, cols), np.int64)
+        packed, packed_segment = _shared_array(packed_shape, np.uint8)
+        segments = [score_segment, packed_segment]
+        locations = (("shm", score_segment.name), ("shm", packed_segment.name))
+    else:
+        score_matrix = np.empty((rows, cols), dtype=np.int64)
+        packed = np.empty(packed_shape, dtype=np.uint8)
+    traceback_matrix = PackedTraceback(rows, cols, packed)
+
+    # gap row and column, filled before any tile runs (a shared segment starts out zeroed, np.empty doesn't)
+    if local:
+        score_matrix[0] = 0
+        score_matrix[:, 0] = 0
+        packed[0] = 0
+    else:
+        score_matrix[0] = gap_penalty * np.arange(cols, dtype=np.int64)
+        score_matrix[:, 0] = gap_penalty * np.arange(rows, dtype=np.int64)
+        row_codes = np.full(cols, 3, dtype=np.uint8)
+        row_codes[0] = 0
+        traceback_matrix.set_row(0, row_codes)
+
+    row_bounds, col_bounds = tile_grid(rows, cols, *tile_shape)
+    grid_rows, grid_cols = len(row_bounds) - 1, len(col_bounds) - 1
+
+    def tile(i, j):
+        return row_bounds[i], row_bounds[i + 1], col_bounds[j], col_bounds[j + 1]
+
+    best = (0, 0, 0)  # (score, row, col) - cell (0, 0) holds 0 and is the first cell in row order
+    tile_results = []
+    try:
+        if workers == 1 or grid_rows * grid_cols <= 1:
+            # row by row through the tile grid is a valid wavefront order
+            tile_results = [fill_tile(score_matrix, traceback_matrix, codes_1, codes_2, dense, gap_penalty, local,
+                                      *tile(i, j)) for i in range(grid_rows) for j in range(grid_cols)]
+        else:
+            init_args = (*locations, codes_1, codes_2, dense, gap_penalty, local)
+            waiting = np.zeros((grid_rows, grid_cols), dtype=np.int8)  # unfinished top / left neighbours
+            waiting[1:, :] += 1
+            waiting[:, 1:] += 1
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_tile_worker, initargs=init_args) as pool:
+                running = {pool.submit(_run_tile, tile(0, 0)): (0, 0)}
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        i, j = running.pop(future)
+                        tile_results.append(future.result())
+                        for next_i, next_j in ((i + 1, j), (i, j + 1)):
+                            if next_i < grid_rows and next_j < grid_cols:
+                                waiting[next_i, next_j] -= 1
+                                if waiting[next_i, next_j] == 0:
+                                    running[pool.submit(_run_tile, tile(next_i, next_j))] = (next_i, next_j)
+    finally:
+        for segment in segments:
+            segment.unlink()  # the parent's mapping stays valid, the name is freed even if a tile failed
+
+    if not local:
+        return score_matrix, traceback_matrix
+    for score, row, col in filter(None, tile_results):
+        if score > best[0] or (score == best[0] and (row, col) < best[1:]):
+            best = (score, row, col)
+    return score_matrix, traceback_matrix, best[0], best[1:]
@@ -1,3 +1,5 @@
+import sys
+from Align_CLI import main
 from Sub_Matrix_Gen import SubstitutionMatrix
 from Sequence_Align_Toolkit import SequenceAlign
 from MultipleAlign import MultipleAlignment
@@ -5,8 +7,8 @@ from MultipleAlign import MultipleAlignment
 # NEEDLEMAN WUNSCH IS GLOBAL ALIGNMENT
 # SMITH WATERMAN IS LOCAL ALIGNMENT
 
-# create instance of our class by choosing which two sequences we want to align, their biotype and gap penalty
-pair_test = SequenceAlign(SubstitutionMatrix("proTeIn").auto_load(), -8)
+# The functions below are usage examples. Running this file runs the command line tool (same as python -m Align_CLI),
+# e.g. python main.py msa family.fa --format clustal
 
 def pairwise_alignment_and_heatmap_demonstration():
     """Run this to see how to use the SequenceAlign Class"""
@@ -49,4 +51,6 @@ def multiple_sequence_demonstration():
 
     print("Consensus Sequence: ", msa.consensus())
 
-multiple_sequence_demonstration()
+
+if __name__ == "__main__":
+    sys.exit(main())
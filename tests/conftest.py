@@ -0,0 +1,56 @@
+import os
+import random
+import sys
+import pytest
+
+# the modules live flat in the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Sub_Matrix_Gen import SubstitutionMatrix
+
+AMINO_ACIDS = "ARNDCQEGHILKMFPSTWYV"
+
+
+@pytest.fixture(scope="session")
+def blosum62():
+    """Encoded BLOSUM62 - (alphabet index, dense array)"""
+    return SubstitutionMatrix("protein", encoded=True).load_protein_matrix(os.path.join(ROOT, "blosum62.mat"))
+
+
+@pytest.fixture(scope="session")
+def dna_matrix():
+    """Encoded DNA matrix, match 2 / mismatch -1"""
+    return SubstitutionMatrix("dna", encoded=True).DNA_submat(2, -1)
+
+
+@pytest.fixture
+def rng():
+    return random.Random(7)
+
+
+def random_protein(rng, length):
+    return "".join(rng.choice(AMINO_ACIDS) for _ in range(length))
+
+
+def random_dna(rng, length):
+    return "".join(rng.choice("ACGT") for _ in range(length))
+
+
+def mutate(rng, seq, substitutions=0, indels=0, max_indel=5, alphabet=AMINO_ACIDS):
+    """Copy of seq with random point substitutions and short insertions / deletions"""
+    seq = list(seq)
+    for _ in range(substitutions):
+        seq[rng.randrange(len(seq))] = rng.choice(alphabet)
+    for _ in range(indels):
+        pos, length = rng.randrange(len(seq) + 1), rng.randint(1, max_indel)
+        if rng.random() < 0.5:
+            seq[pos:pos] = rng.choice(alphabet) * length
+        else:
+            del seq[pos:pos + length]
+    return "".join(seq)
+
+
+def score_alignment(aligned, sub_matrix, gap_penalty):
+    """Linear gap score of an alignment, column by column"""
+    return sum(gap_penalty if "-" in (a, b) else sub_matrix[a + b] for a, b in zip(*aligned))
@@ -0,0 +1,73 @@
+import pytest
+from Align_Engines import (decode_sub_matrix, global_score_affine, global_score_numpy, local_score_affine,
+                           needleman_wunsch_affine)
+from Sequence_Align_Toolkit import SequenceAlign
+from conftest import mutate, random_protein
+
+NO_SCORE = -10 ** 9
+
+
+def gotoh(seq_1, seq_2, sub_matrix, gap_open, gap_extend, local=False):
+    """Cell by cell three-state reference - optimal score (global, or local as max over cells)"""
+    n, m = len(seq_1), len(seq_2)
+    h = [[NO_SCORE] * (m + 1) for _ in range(n + 1)]
+    e = [[NO_SCORE] * (m + 1) for _ in range(n + 1)]
+    f = [[NO_SCORE] * (m + 1) for _ in range(n + 1)]
+    h[0][0] = 0
+    best = 0
+    for i in range(n + 1):
+        for j in range(m + 1):
+            if i == 0 and j == 0:
+                continue
+            if j > 0:
+                e[i][j] = max(h[i][j - 1] + gap_open, e[i][j - 1] + gap_extend)
+            if i > 0:
+                f[i][j] = max(h[i - 1][j] + gap_open, f[i - 1][j] + gap_extend)
+            diagonal = h[i - 1][j - 1] + sub_matrix[seq_1[i - 1] + seq_2[j - 1]] if i > 0 and j > 0 else NO_SCORE
+            h[i][j] = max(diagonal, e[i][j], f[i][j], 0 if local else NO_SCORE)
+            best = max(best, h[i][j])
+    return best if local else h[n][m]
+
+
+def affine_alignment_score(aligned, sub_matrix, gap_open, gap_extend):
+    """Score of an alignment where each gap run (per sequence) costs gap_open + (length - 1) * gap_extend"""
+    score, previous = 0, None
+    for a, b in zip(*aligned):
+        column = 1 if a == "-" else 2 if b == "-" else 0
+        if column == 0:
+            score += sub_matrix[a + b]
+        else:
+            score += gap_extend if column == previous else gap_open
+        previous = column
+    return score
+
+
+@pytest.mark.parametrize("gap_open, gap_extend", [(-11, -1), (-10, -2), (-5, -5), (-12, 0)])
+def test_affine_engine_matches_gotoh_reference(blosum62, rng, gap_open, gap_extend):
+    sub_matrix = decode_sub_matrix(blosum62)
+    aligner = SequenceAlign(blosum62, -8, gap_open, gap_extend)
+    for _ in range(30):
+        seq_1 = random_protein(rng, rng.randint(0, 30))
+        seq_2 = mutate(rng, seq_1, substitutions=3, indels=3) if rng.random() < 0.6 else \
+            random_protein(rng, rng.randint(0, 30))
+        expected_global = gotoh(seq_1, seq_2, sub_matrix, gap_open, gap_extend)
+        expected_local = gotoh(seq_1, seq_2, sub_matrix, gap_open, gap_extend, local=True)
+
+        assert global_score_affine(seq_1, seq_2, blosum62, gap_open, gap_extend) == expected_global
+        assert local_score_affine(seq_1, seq_2, blosum62, gap_open, gap_extend)[0] == expected_local
+        score_matrix, _ = needleman_wunsch_affine(seq_1, seq_2, blosum62, gap_open, gap_extend)
+        assert score_matrix[len(seq_1), len(seq_2)] == expected_global
+
+        aligner.set_sequences(seq_1, seq_2)
+        aligner.gen_all_data("numpy")
+        assert aligner.nw_optimal_alignment == expected_global
+        assert affine_alignment_score(aligner.nw_result, sub_matrix, gap_open, gap_extend) == expected_global
+        assert [row.replace("-", "") for row in aligner.nw_result] == [seq_1, seq_2]
+        assert aligner.sw_optimal_alignment == expected_local
+        assert affine_alignment_score(aligner.sw_result, sub_matrix, gap_open, gap_extend) == expected_local
+
+
+def test_affine_with_equal_open_and_extend_is_linear(blosum62, rng):
+    for _ in range(20):
+        seq_1, seq_2 = random_protein(rng, rng.randint(0, 50)), random_protein(rng, rng.randint(0, 50))
+        assert global_score_affine(seq_1, seq_2, blosum62, -8, -8) == global_score_numpy(seq_1, seq_2, blosum62, -8)
@@ -0,0 +1,146 @@
+import numpy as np
+import pytest
+from Align_CLI import main
+from Align_Engines import global_score_numpy, local_score_numpy
+from Fasta_IO import iter_fasta
+from MultipleAlign import MultipleAlignment
+from Sequence_Align_Toolkit import SequenceAlign
+from conftest import mutate, random_protein
+
+
+def write_fasta(path, records):
+    path.write_text("".join(f">{name}\n{seq}\n" for name, seq in records))
+    return str(path)
+
+
+def read_tsv(path):
+    return [line.split("\t") for line in path.read_text().splitlines()]
+
+
+def read_clustal(path):
+    """Rows of a Clustal file joined across blocks, in first-seen order"""
+    lines = path.read_text().splitlines()
+    assert lines[0].startswith("CLUSTAL")
+    rows = {}
+    for line in lines[1:]:
+        if line and not line[0].isspace():
+            name, part = line.split()
+            rows[name] = rows.get(name, "") + part
+    return list(rows.items())
+
+
+def family(rng, size):
+    ancestor = random_protein(rng, 70)
+    return [(f"s{i}", mutate(rng, ancestor, substitutions=8, indels=2)) for i in range(size)]
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+@pytest.mark.parametrize("mode", ["global", "local"])
+def test_pairwise_tsv(blosum62, rng, tmp_path, workers, mode):
+    records = family(rng, 6)
+    fasta = write_fasta(tmp_path / "pairs.fa", records)
+    assert main(["pairwise", fasta, "--mode", mode, "--workers", workers, "--chunk-size", "1",
+                 "-o", str(tmp_path / "out.tsv")]) == 0
+    rows = read_tsv(tmp_path / "out.tsv")
+    assert rows[0] == ["name_1", "name_2", "score", "identity", "aligned_1", "aligned_2"]
+    assert len(rows) == 4
+    aligner = SequenceAlign(blosum62, -8)
+    for (name_1, seq_1), (name_2, seq_2), row in zip(records[::2], records[1::2], rows[1:]):
+        aligner.set_sequences(seq_1, seq_2)
+        if mode == "global":
+            aligner.gen_global_data("numpy")
+            expected = aligner.nw_optimal_alignment, aligner.nw_result
+        else:
+            aligner.gen_local_data("numpy")
+            expected = aligner.sw_optimal_alignment, aligner.sw_result
+        assert row[:3] == [name_1, name_2, str(expected[0])]
+        assert row[4:] == expected[1]
+
+
+def test_pairwise_fasta_and_clustal_read_back(rng, tmp_path):
+    first = write_fasta(tmp_path / "a.fa", family(rng, 3))
+    second = write_fasta(tmp_path / "b.fa", [(f"t{i}", seq) for i, (_, seq) in enumerate(family(rng, 3))])
+    assert main(["pairwise", first, second, "--format", "fasta", "--workers", "1",
+                 "-o", str(tmp_path / "out.fa")]) == 0
+    assert main(["pairwise", first, second, "--format", "clustal", "--workers", "1",
+                 "-o", str(tmp_path / "out.aln")]) == 0
+    assert main(["pairwise", first, second, "--workers", "1", "-o", str(tmp_path / "out.tsv")]) == 0
+    expected = [(row[0], row[4], row[1], row[5]) for row in read_tsv(tmp_path / "out.tsv")[1:]]
+    fasta = list(iter_fasta(str(tmp_path / "out.fa")))
+    assert [(*fasta[i], *fasta[i + 1]) for i in range(0, len(fasta), 2)] == expected
+    clustal = read_clustal(tmp_path / "out.aln")  # every pair has its own names, so no rows are merged
+    assert [(*clustal[i], *clustal[i + 1]) for i in range(0, len(clustal), 2)] == expected
+
+
+def test_all_vs_all_matrix(blosum62, rng, tmp_path, capsys):
+    records = family(rng, 5)
+    fasta = write_fasta(tmp_path / "family.fa", records)
+    for mode, score in (("global", global_score_numpy), ("local", lambda *args: local_score_numpy(*args)[0])):
+        assert main(["all-vs-all", fasta, "--mode", mode, "--workers", "2", "--chunk-size", "3"]) == 0
+        rows = [line.split("\t") for line in capsys.readouterr().out.splitlines()]
+        assert rows[0] == ["name"] + [name for name, _ in records]
+        matrix = np.array([[int(value) for value in row[1:]] for row in rows[1:]])
+        expected = [[score(seq_1, seq_2, blosum62, -8) for _, seq_2 in records] for _, seq_1 in records]
+        assert np.array_equal(matrix, expected) and np.array_equal(matrix, matrix.T)
+
+
+def test_search_finds_the_planted_homolog(rng, tmp_path):
+    domain = random_protein(rng, 60)
+    database = [(f"db{i}", random_protein(rng, 150)) for i in range(30)]
+    host = database[11][1]
+    database[11] = ("host", host[:50] + mutate(rng, domain, substitutions=6) + host[50:])
+    queries = write_fasta(tmp_path / "queries.fa", [("query", domain)])
+    db = write_fasta(tmp_path / "db.fa", database)
+    assert main(["search", queries, db, "--seed", "11011", "--top", "2", "--workers", "1",
+                 "--index-dir", str(tmp_path / "index"), "-o", str(tmp_path / "hits.tsv")]) == 0
+    rows = read_tsv(tmp_path / "hits.tsv")
+    assert rows[0][:3] == ["query", "target", "score"] and rows[1][:2] == ["query", "host"]
+    target_start, target_end = int(rows[1][5]), int(rows[1][6])
+    assert rows[1][8].replace("-", "") == database[11][1][target_start:target_end]
+    # the saved index directory can be searched directly
+    assert main(["search", queries, str(tmp_path / "index"), "--top", "2", "--workers", "2",
+                 "-o", str(tmp_path / "again.tsv")]) == 0
+    assert read_tsv(tmp_path / "again.tsv") == rows
+
+
+def test_msa_save_load_round_trip(blosum62, rng, tmp_path):
+    records = family(rng, 7)
+    first = write_fasta(tmp_path / "first.fa", records[:4])
+    rest = write_fasta(tmp_path / "rest.fa", records[4:])
+    saved = str(tmp_path / "family.msa")
+    assert main(["msa", first, "--save", saved, "-o", str(tmp_path / "first_out.fa")]) == 0
+    assert main(["msa", rest, "--load", saved, "--save", saved, "--format", "clustal",
+                 "-o", str(tmp_path / "all.aln")]) == 0
+    full = MultipleAlignment([seq for _, seq in records], blosum62, -8, engine="numpy")
+    full.global_progressive_align()
+    assert read_clustal(tmp_path / "all.aln") == list(zip([name for name, _ in records], full.aligned_seqs))
+    reloaded = MultipleAlignment.load(saved, blosum62, -8)
+    assert reloaded.names == [name for name, _ in records] and reloaded.aligned_seqs == full.aligned_seqs
+
+
+@pytest.mark.parametrize("method", ["progressive", "upgma", "nj"])
+def test_msa_methods_keep_the_sequences(rng, tmp_path, method):
+    records = family(rng, 5)
+    fasta = write_fasta(tmp_path / "family.fa", records)
+    assert main(["msa", fasta, "--method", method, "--workers", "1", "-o", str(tmp_path / "out.fa")]) == 0
+    aligned = list(iter_fasta(str(tmp_path / "out.fa")))
+    assert [name for name, _ in aligned] == [name for name, _ in records]
+    assert [seq.replace("-", "") for _, seq in aligned] == [seq for _, seq in records]
+    assert len({len(seq) for _, seq in aligned}) == 1
+
+
+@pytest.mark.parametrize("argv, message", [
+    (["pairwise", "{odd}"], "odd number of records - c has no record to pair with"),
+    (["pairwise", "{bad}"], "KeyError"),
+    (["pairwise", "{pairs}", "{odd}"], "ValueError"),  # files with different record counts
+    (["pairwise", "{pairs}", "--gap-open", "-11"], "Affine gaps need both --gap-open and --gap-extend"),
+    (["msa", "{single}"], "You need more than two sequences"),
+    (["all-vs-all", "{pairs}", "--seq-type", "dna", "--matrix", "x.mat"], "--matrix files are for protein"),
+])
+def test_bad_input_exits_with_a_message(tmp_path, capsys, argv, message):
+    files = {"odd": [("a", "HEAGAWGHEE"), ("b", "PAWHEAE"), ("c", "HEAGAW")], "bad": [("a", "HEAG1W"), ("b", "PAW")],
+             "pairs": [("a", "HEAGAWGHEE"), ("b", "PAWHEAE")], "single": [("a", "HEAGAWGHEE")]}
+    paths = {key: write_fasta(tmp_path / f"{key}.fa", records) for key, records in files.items()}
+    assert main([arg.format(**paths) for arg in argv] + ["--workers", "1"]) == 1
+    captured = capsys.readouterr()
+    assert message in captured.err and captured.err.startswith(argv[0] + ": ")
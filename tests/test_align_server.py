@@ -0,0 +1,49 @@
+import asyncio
+import random
+from Align_Engines import global_score_numpy
+from Align_Server import AlignmentServer, request_json
+from conftest import random_protein
+
+
+async def round_trip(blosum62):
+    server = AlignmentServer(blosum62, -8, port=0, workers=1, queue_size=1, batch_wait=0)
+    await server.start()
+    try:
+        host, port = server.host, server.port
+        status, result = await request_json(host, port, "POST", "/align", {"seq1": "HEAGAWGHEE", "seq2": "PAWHEAE"})
+        assert status == 200
+        assert result["score"] == global_score_numpy("HEAGAWGHEE", "PAWHEAE", blosum62, -8)
+        assert [row.replace("-", "") for row in result["aligned"]] == ["HEAGAWGHEE", "PAWHEAE"]
+
+        status, result = await request_json(host, port, "POST", "/msa",
+                                            {"sequences": ["HEAGAWGHEE", "PAWHEAE", "HEAWGHE"], "method": "upgma"})
+        assert status == 200 and len(result["aligned"]) == 3
+
+        assert (await request_json(host, port, "POST", "/align", {"seq1": "HEAG", "mode": "x"}))[0] == 400
+        assert (await request_json(host, port, "POST", "/align", [1, 2]))[0] == 400
+        assert (await request_json(host, port, "GET", "/nowhere"))[0] == 404
+
+        # a long job keeps the only worker busy: the next job waits in the queue, the one after finds it full
+        long_seq = random_protein(random.Random(5), 6000)
+        running = asyncio.create_task(request_json(host, port, "POST", "/align", {"seq1": long_seq,
+                                                                                  "seq2": long_seq[::-1]}))
+        while server.in_flight == 0:
+            await asyncio.sleep(0.01)
+        queued = asyncio.create_task(request_json(host, port, "POST", "/align", {"seq1": "HEAG", "seq2": "HEG"}))
+        while server.queue.qsize() == 0:
+            await asyncio.sleep(0.01)
+        status, result = await request_json(host, port, "POST", "/align", {"seq1": "HEAG", "seq2": "HEG"})
+        assert status == 503
+        assert (await running)[0] == 200 and (await queued)[0] == 200
+
+        status, stats = await request_json(host, port, "GET", "/stats")
+        assert status == 200
+        assert (stats["completed"], stats["failed"], stats["rejected"]) == (4, 1, 1)
+        assert stats["queue_depth"] == 0 and stats["in_flight"] == 0
+        assert stats["latency_ms"]["max"] >= stats["latency_ms"]["p50"]
+    finally:
+        await server.stop()
+
+
+def test_server_round_trip(blosum62):
+    asyncio.run(round_trip(blosum62))
@@ -0,0 +1,50 @@
+import random
+import pytest
+from Align_Engines import banded_numpy, decode_sub_matrix, global_score_numpy
+from conftest import mutate, random_protein, score_alignment
+
+
+def moved_block(rng, seq, length):
+    """seq with one block of `length` residues deleted and re-inserted further along"""
+    start = rng.randrange(50, len(seq) - length - 100)
+    rest = seq[:start] + seq[start + length:]
+    insert_at = rng.randrange(start + 50, len(rest))
+    return rest[:insert_at] + seq[start:start + length] + rest[insert_at:]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_banded_matches_full_score_on_moved_blocks(blosum62, seed):
+    rng = random.Random(seed)
+    seq_1 = random_protein(rng, 600)
+    seq_2 = moved_block(rng, seq_1, rng.randint(20, 60))
+    score, aligned, _ = banded_numpy(seq_1, seq_2, blosum62, -8)
+    assert score == global_score_numpy(seq_1, seq_2, blosum62, -8)
+    assert score_alignment(aligned, decode_sub_matrix(blosum62), -8) == score
+
+
+def test_banded_matches_full_score_on_unrelated_pair(blosum62, rng):
+    seq_1, seq_2 = random_protein(rng, 1500), random_protein(rng, 1400)
+    assert banded_numpy(seq_1, seq_2, blosum62, -8)[0] == global_score_numpy(seq_1, seq_2, blosum62, -8)
+
+
+@pytest.mark.parametrize("bandwidth", [0, 1, 2, 5, None])
+@pytest.mark.parametrize("gap_penalty", [-1, -4, -8])
+def test_banded_matches_full_score_on_short_indel_heavy_pairs(blosum62, rng, bandwidth, gap_penalty):
+    assert banded_numpy("WSDKMHTMC", "IPWYTTRV", blosum62, gap_penalty, bandwidth)[0] == \
+        global_score_numpy("WSDKMHTMC", "IPWYTTRV", blosum62, gap_penalty)
+    sub_matrix = decode_sub_matrix(blosum62)
+    for _ in range(40):
+        seq_1 = random_protein(rng, rng.randint(0, 40))
+        seq_2 = mutate(rng, seq_1, substitutions=3, indels=4) if seq_1 else random_protein(rng, 5)
+        score, aligned, _ = banded_numpy(seq_1, seq_2, blosum62, gap_penalty, bandwidth)
+        assert score == global_score_numpy(seq_1, seq_2, blosum62, gap_penalty)
+        assert [row.replace("-", "") for row in aligned] == [seq_1, seq_2]
+        assert score_alignment(aligned, sub_matrix, gap_penalty) == score
+
+
+def test_banded_keeps_a_narrow_band_for_near_identical_pairs(blosum62, rng):
+    seq_1 = random_protein(rng, 2000)
+    seq_2 = mutate(rng, seq_1, substitutions=20)
+    score, _, bandwidth = banded_numpy(seq_1, seq_2, blosum62, -8)
+    assert score == global_score_numpy(seq_1, seq_2, blosum62, -8)
+    assert bandwidth == 20  # the estimate is enough - no widening
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from Batch_Align import BatchAlignment, identity
+from Sequence_Align_Toolkit import SequenceAlign
+from conftest import mutate, random_protein
+
+
+@pytest.fixture
+def family(rng):
+    ancestor = random_protein(rng, 40)
+    return [ancestor] + [mutate(rng, ancestor, substitutions=4, indels=2) for _ in range(4)] + [random_protein(rng, 25)]
+
+
+def direct_matrix(sequences, sub_matrix, mode, measure, gap_penalty=-4):
+    """Every pair aligned one by one with a fresh SequenceAlign"""
+    n = len(sequences)
+    expected = np.zeros((n, n))
+    for i in range(n):
+        for j in range(n):
+            aligner = SequenceAlign(sub_matrix, gap_penalty)
+            if measure == "score":
+                expected[i, j] = (aligner.global_score(sequences[i], sequences[j]) if mode == "global"
+                                  else aligner.local_score(sequences[i], sequences[j])[0])
+            else:
+                aligner.set_sequences(sequences[i], sequences[j])
+                if mode == "global":
+                    aligner.gen_global_data("numpy")
+                    expected[i, j] = identity(aligner.nw_result)
+                else:
+                    aligner.gen_local_data("numpy")
+                    expected[i, j] = identity(aligner.sw_result)
+    return expected
+
+
+@pytest.mark.parametrize("mode", ["global", "local"])
+@pytest.mark.parametrize("measure", ["score", "identity"])
+def test_run_on_two_workers_matches_direct_alignments(family, blosum62, mode, measure):
+    batch = BatchAlignment(blosum62, -4, mode=mode, workers=2, chunk_size=4)
+    result = batch.run(family, measure)
+    assert result.shape == (len(family), len(family))
+    assert result.dtype == (np.int64 if measure == "score" else np.float64)
+    assert np.array_equal(result, result.T)
+    expected = direct_matrix(family, blosum62, mode, measure)
+    # the matrix is filled from the upper triangle and mirrored, direct (i, j) and (j, i) agree on these sequences
+    assert np.allclose(np.triu(result), np.triu(expected))
+    if measure == "identity":
+        assert np.allclose(np.diag(result), 1.0)
+
+
+def test_workers_and_chunk_size_do_not_change_the_result(family, blosum62):
+    in_process = BatchAlignment(blosum62, -4, workers=1, chunk_size=256).run(family, "score")
+    pooled = BatchAlignment(blosum62, -4, workers=2, chunk_size=3).run(family, "score")
+    assert np.array_equal(in_process, pooled)
+
+
+def test_upper_triangle(family, blosum62):
+    batch = BatchAlignment(blosum62, -4, workers=1, chunk_size=5)
+    full = batch.run(family, "score")
+    upper = batch.run(family, "score", upper_triangle=True)
+    assert np.array_equal(upper, np.triu(full))
+    assert not np.tril(upper, -1).any()
+
+
+def test_distance_matrix(family, blosum62):
+    batch = BatchAlignment(blosum62, -4, workers=1)
+    distances = batch.distance_matrix(family)
+    assert np.allclose(distances, 1.0 - batch.run(family, "identity"))
+    assert np.allclose(np.diag(distances), 0.0)
+    assert np.all((distances >= 0) & (distances <= 1))
+    # the unrelated sequence is further from the ancestor than any of its mutants
+    assert distances[0, -1] > distances[0, 1:-1].max()
+
+
+def test_fasta_filename_input(family, blosum62, tmp_path):
+    path = tmp_path / "family.fa"
+    path.write_text("".join(f">member_{i} description\n{seq.lower()}\n" for i, seq in enumerate(family)))
+    batch = BatchAlignment(blosum62, -4, workers=2, chunk_size=4)
+    from_file = batch.run(str(path), "score")
+    assert batch.names == [f"member_{i} description" for i in range(len(family))]
+    assert np.array_equal(from_file, BatchAlignment(blosum62, -4, workers=1).run(family, "score"))
+
+    batch.run(family, "score")
+    assert batch.names == [f"seq_{i}" for i in range(len(family))]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_stream(family, blosum62, workers):
+    references = family[:3]
+    records = ((f"read_{i}", seq.lower()) for i, seq in enumerate(family))
+    batch = BatchAlignment(blosum62, -4, mode="local", workers=workers, chunk_size=2)
+    results = list(batch.stream(records, references))
+    assert [name for name, _ in results] == [f"read_{i}" for i in range(len(family))]
+    expected = direct_matrix(family, blosum62, "local", "score")[:, :3]
+    assert np.array_equal(np.array([values for _, values in results]), expected)
+
+    identities = list(batch.stream(iter([("only", family[1])]), references, "identity"))
+    expected = direct_matrix(references, blosum62, "local", "identity")[1]
+    assert len(identities) == 1 and np.allclose(identities[0][1], expected)
+
+
+def test_invalid_arguments(blosum62):
+    with pytest.raises(ValueError):
+        BatchAlignment(blosum62, -4, mode="semi")
+    batch = BatchAlignment(blosum62, -4, workers=1)
+    with pytest.raises(ValueError):
+        batch.run(["ACD"], "distance")
+    with pytest.raises(ValueError):
+        list(batch.stream([("a", "ACD")], ["ACD"], "distance"))
@@ -0,0 +1,109 @@
+import gc
+import os
+import numpy as np
+import pytest
+from Disk_Buffers import DiskBuffers
+from Sequence_Align_Toolkit import SequenceAlign
+from conftest import mutate, random_protein
+
+
+def scratch_files(directory):
+    return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+
+def test_get_creates_memory_mapped_files(tmp_path):
+    buffers = DiskBuffers(tmp_path / "scratch")  # the parent is created on first use
+    matrix = buffers.get("nw_score", (3, 5), np.int64, True)
+    assert isinstance(matrix, np.memmap) and matrix.shape == (3, 5) and not matrix.any()
+    assert os.path.dirname(buffers.directory) == str(tmp_path / "scratch")
+    assert scratch_files(buffers.directory) == ["nw_score.dat"]
+    assert buffers.nbytes == 3 * 5 * 8
+
+    matrix[:] = 7
+    again = buffers.get("nw_score", (2, 2), np.int64, True)  # a new file, the old mapping stays readable
+    assert not again.any() and np.all(matrix == 7)
+    assert buffers.nbytes == 2 * 2 * 8
+
+
+def test_cleanup_context_manager_and_garbage_collection(tmp_path):
+    buffers = DiskBuffers(tmp_path)
+    buffers.get("a", (4, 4), np.uint8, True)
+    directory = buffers.directory
+    buffers.cleanup()
+    assert not os.path.exists(directory) and buffers.nbytes == 0
+    buffers.cleanup()  # a second cleanup is a no-op
+
+    with DiskBuffers(tmp_path) as buffers:
+        buffers.get("a", (4, 4), np.uint8, True)
+        directory = buffers.directory
+    assert not os.path.exists(directory)
+
+    aligner = SequenceAlign({"AA": 1, "AC": -1, "CA": -1, "CC": 1}, -2, scratch_dir=tmp_path)
+    aligner.set_sequences("ACCA", "ACA")
+    aligner.gen_global_data()
+    directory = aligner.buffers.directory
+    assert scratch_files(directory)
+    del aligner
+    gc.collect()
+    assert not os.path.exists(directory)
+    assert os.listdir(tmp_path) == []
+
+
+def test_on_disk_results_match_in_memory(blosum62, rng, tmp_path):
+    for _ in range(5):
+        seq_1 = random_protein(rng, rng.randint(1, 50))
+        seq_2 = mutate(rng, seq_1, substitutions=5, indels=2) or seq_1
+        memory = SequenceAlign(blosum62, -8)
+        disk = SequenceAlign(blosum62, -8, scratch_dir=tmp_path)
+        for aligner in (memory, disk):
+            aligner.set_sequences(seq_1, seq_2)
+            aligner.gen_all_data("numpy")
+        assert isinstance(disk.nw_s_matrix, np.memmap) and isinstance(disk.sw_s_matrix, np.memmap)
+        assert np.array_equal(memory.nw_s_matrix, disk.nw_s_matrix)
+        assert np.array_equal(memory.sw_t_matrix.unpack(), disk.sw_t_matrix.unpack())
+        assert (memory.nw_optimal_alignment, memory.nw_result) == (disk.nw_optimal_alignment, disk.nw_result)
+        assert (memory.sw_optimal_alignment, memory.sw_result) == (disk.sw_optimal_alignment, disk.sw_result)
+        assert np.array_equal(memory.nw_path_matrix.dense(), disk.nw_path_matrix.dense())
+        assert memory.gen_semi_global_data() == disk.gen_semi_global_data()
+        assert memory.gen_top_local_data(3) == disk.gen_top_local_data(3)
+        disk.gen_global_data("wavefront", workers=1)
+        assert disk.nw_result == memory.nw_result
+        disk.buffers.cleanup()
+
+
+def test_top_local_matrices_go_to_scratch_files(blosum62, rng, tmp_path):
+    aligner = SequenceAlign(blosum62, -8, scratch_dir=tmp_path)
+    aligner.set_sequences(random_protein(rng, 40), random_protein(rng, 30))
+    aligner.gen_top_local_data(2)
+    assert scratch_files(aligner.buffers.directory) == ["we_mask.dat", "we_score.dat", "we_traceback.dat"]
+
+
+def test_affine_matrices_on_disk(blosum62, rng, tmp_path):
+    seq_1, seq_2 = random_protein(rng, 40), random_protein(rng, 35)
+    memory = SequenceAlign(blosum62, -8, -11, -1)
+    disk = SequenceAlign(blosum62, -8, -11, -1, scratch_dir=tmp_path)
+    for aligner, engine in ((memory, "numpy"), (disk, None)):  # None -> numpy with scratch_dir
+        aligner.set_sequences(seq_1, seq_2)
+        aligner.gen_global_data(engine)
+        aligner.gen_local_data(engine)
+    assert disk.nw_engine == disk.sw_engine == "numpy"
+    assert (memory.nw_result, memory.sw_result) == (disk.nw_result, disk.sw_result)
+
+
+@pytest.mark.parametrize("engine", ["python", "hirschberg", "banded"])
+def test_engines_without_scratch_support_raise(blosum62, tmp_path, engine):
+    aligner = SequenceAlign(blosum62, -8, scratch_dir=tmp_path)
+    aligner.set_sequences("HEAGAWGHEE", "PAWHEAE")
+    with pytest.raises(ValueError, match="scratch_dir"):
+        aligner.gen_global_data(engine)
+    if engine == "python":
+        with pytest.raises(ValueError, match="scratch_dir"):
+            aligner.gen_local_data(engine)
+        with pytest.raises(ValueError, match="scratch_dir"):
+            aligner.gen_all_data(engine)
+
+
+def test_default_engine(blosum62, tmp_path):
+    assert SequenceAlign(blosum62, -8).resolve_engine(None) == "python"
+    assert SequenceAlign(blosum62, -8, scratch_dir=tmp_path).resolve_engine(None) == "numpy"
+    assert SequenceAlign(blosum62, -8, scratch_dir=tmp_path).resolve_engine("wavefront") == "wavefront"
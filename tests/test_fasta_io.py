@@ -0,0 +1,132 @@
+import gzip
+import pytest
+from Fasta_IO import (ClustalWriter, FastaWriter, iter_chunks, iter_fasta, iter_fastq, iter_sequences, open_text,
+                      read_fasta)
+
+FASTA = """
+>seq1 first record
+MKTAYIAK
+qrqisfvk
+
+>seq2
+ACGT
+>empty
+>seq3
+  PPPP  
+"""
+FASTA_RECORDS = [("seq1 first record", "MKTAYIAKQRQISFVK"), ("seq2", "ACGT"), ("empty", ""), ("seq3", "PPPP")]
+
+FASTQ = """@read1 lane 1
+acgtn
++
+IIIII
+
+@read2
+GGCC
++read2
+!!!!
+"""
+FASTQ_RECORDS = [("read1 lane 1", "ACGTN"), ("read2", "GGCC")]
+
+
+def write(path, text):
+    if str(path).endswith(".gz"):
+        with gzip.open(path, "wt") as f:
+            f.write(text)
+    else:
+        path.write_text(text)
+    return str(path)
+
+
+@pytest.mark.parametrize("suffix", ["", ".gz"])
+def test_fasta_records(tmp_path, suffix):
+    path = write(tmp_path / f"in.fa{suffix}", FASTA)
+    assert list(iter_fasta(path)) == FASTA_RECORDS
+    assert list(iter_sequences(path)) == FASTA_RECORDS
+    assert read_fasta(path) == FASTA_RECORDS
+
+
+@pytest.mark.parametrize("suffix", ["", ".gz"])
+def test_fastq_records(tmp_path, suffix):
+    path = write(tmp_path / f"in.fq{suffix}", FASTQ)
+    assert list(iter_fastq(path)) == FASTQ_RECORDS
+    assert list(iter_sequences(path)) == FASTQ_RECORDS  # detected from the first non-blank character
+
+
+def test_readers_are_lazy(tmp_path):
+    path = write(tmp_path / "in.fa", FASTA)
+    records = iter_fasta(path)
+    assert next(records) == FASTA_RECORDS[0]
+    assert list(records) == FASTA_RECORDS[1:]
+
+
+def test_invalid_input(tmp_path):
+    with pytest.raises(ValueError):
+        list(iter_fasta(write(tmp_path / "bad.fa", "ACGT\n>seq\nACGT\n")))
+    with pytest.raises(ValueError):
+        list(iter_fastq(write(tmp_path / "bad.fq", "@read\nACGT\nACGT\nIIII\n")))
+    assert list(iter_sequences(write(tmp_path / "blank.fa", "\n\n"))) == []
+
+
+def test_iter_chunks():
+    assert list(iter_chunks(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(iter_chunks(range(6), 3)) == [[0, 1, 2], [3, 4, 5]]
+    assert list(iter_chunks([], 3)) == []
+    consumed = []
+    chunks = iter_chunks((consumed.append(i) or i for i in range(10)), 4)
+    next(chunks)
+    assert consumed == [0, 1, 2, 3]  # no read-ahead past the chunk
+
+
+def read_clustal(path):
+    """Rows joined across blocks, plus the conservation line of every block (cut to the block's columns)"""
+    with open_text(path) as f:
+        lines = f.read().splitlines()
+    assert lines[0].startswith("CLUSTAL")
+    rows, conservation = {}, ""
+    start = width = 0
+    for line in lines[1:]:
+        if line and not line[0].isspace():
+            name, part = line.split()
+            rows[name] = rows.get(name, "") + part
+            start, width = len(line) - len(part), len(part)
+        elif line:
+            conservation += line[start:].ljust(width)
+    return list(rows.items()), conservation
+
+
+@pytest.mark.parametrize("suffix", ["", ".gz"])
+def test_fasta_writer_round_trip(tmp_path, suffix):
+    aligned = ["MKT-AYIAKQRQISF" * 9, "MKTQAY-AKQRQ-SF" * 9]
+    path = str(tmp_path / f"out.fa{suffix}")
+    with FastaWriter(path, line_width=40) as writer:
+        writer.write_record("plain", "ACDEFGHIK" * 10)
+        writer.write_pairwise("a", "b", aligned)
+        writer.write_msa(["x", "y"], aligned[::-1])
+    with open_text(path) as f:
+        assert max(len(line) for line in f.read().splitlines()) == 40
+    assert list(iter_fasta(path)) == [("plain", "ACDEFGHIK" * 10), ("a", aligned[0]), ("b", aligned[1]),
+                                      ("x", aligned[1]), ("y", aligned[0])]
+
+
+def test_clustal_writer_round_trip(tmp_path):
+    aligned = ["MKT-AYIAKQRQISF" * 5, "MKTQAY-AKQRQ-SF" * 5, "MKTQAYIAKQRQ-SF" * 5]
+    path = str(tmp_path / "out.aln")
+    with ClustalWriter(path, block_width=30) as writer:
+        writer.write_msa(["first", "second", "third_name"], aligned)
+    rows, conservation = read_clustal(path)
+    assert rows == [("first", aligned[0]), ("second", aligned[1]), ("third_name", aligned[2])]
+    with open_text(path) as f:
+        blocks = f.read().split("\n\n")[1:-1]
+    assert len(blocks) == 3  # 75 columns in blocks of 30
+    expected = "".join("*" if len(set(column)) == 1 and column[0] != "-" else " " for column in zip(*aligned))
+    assert conservation == expected
+
+
+def test_writer_leaves_handles_open(tmp_path):
+    with open(tmp_path / "out.fa", "w") as handle:
+        FastaWriter(handle).write_record("a", "ACGT")
+        writer = FastaWriter(handle)
+        writer.close()
+        assert not handle.closed
+    assert list(iter_fasta(str(tmp_path / "out.fa"))) == [("a", "ACGT")]
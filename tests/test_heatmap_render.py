@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+import Heatmap_Render
+from Heatmap_Render import axis_labels, block_step, pool_matrix
+from Traceback_Store import PackedTraceback, PathMatrix
+
+
+def reference_pool(matrix, row_step, col_step, pooling):
+    """Pads to whole blocks, then reshape + max / mean - padding is left out of both"""
+    rows, cols = matrix.shape
+    padded_rows, padded_cols = -(-rows // row_step) * row_step, -(-cols // col_step) * col_step
+    padded = np.full((padded_rows, padded_cols), np.nan)
+    padded[:rows, :cols] = matrix
+    blocks = padded.reshape(padded_rows // row_step, row_step, padded_cols // col_step, col_step)
+    return np.nanmax(blocks, axis=(1, 3)) if pooling == "max" else np.nanmean(blocks, axis=(1, 3))
+
+
+@pytest.mark.parametrize("shape", [(7, 11), (12, 12), (1, 9), (30, 4)])
+@pytest.mark.parametrize("steps", [(1, 2), (2, 3), (4, 4), (5, 1), (40, 40)])
+@pytest.mark.parametrize("pooling", ["max", "mean"])
+@pytest.mark.parametrize("chunk_cells", [1, 10, 1 << 22])  # down to a single row per chunk
+def test_pooling_matches_reshape_reference(monkeypatch, shape, steps, pooling, chunk_cells):
+    monkeypatch.setattr(Heatmap_Render, "POOL_CHUNK_CELLS", chunk_cells)
+    matrix = np.random.default_rng(sum(shape)).integers(-50, 50, shape)
+    pooled = pool_matrix(matrix, *steps, pooling)
+    expected = reference_pool(matrix, *steps, pooling)
+    assert pooled.shape == expected.shape
+    if pooling == "max":
+        assert pooled.dtype == matrix.dtype and np.array_equal(pooled, expected)
+    else:
+        assert np.allclose(pooled, expected)
+
+
+def test_small_matrices_are_not_pooled(tmp_path):
+    matrix = np.arange(12).reshape(3, 4)
+    assert pool_matrix(matrix, 1, 1) is matrix
+    assert np.array_equal(pool_matrix([[1, 2], [3, 4]], 1, 1), [[1, 2], [3, 4]])  # nested lists
+    on_disk = np.memmap(tmp_path / "score.dat", dtype=np.int64, mode="w+", shape=(3, 4))
+    assert np.shares_memory(pool_matrix(on_disk, 1, 1), on_disk)  # a view of the mapping, not a copy
+    with pytest.raises(ValueError):
+        pool_matrix(matrix, 1, 1, "median")
+
+
+@pytest.mark.parametrize("steps", [(1, 1), (2, 3), (4, 4), (50, 50)])
+def test_path_pooling_from_coordinates(steps):
+    path = PathMatrix(13, 10, [(12, 9), (11, 8), (10, 8), (9, 7), (5, 3), (1, 1), (0, 0)])
+    assert np.array_equal(pool_matrix(path, *steps), reference_pool(path.dense(), *steps, "max"))
+    assert not pool_matrix(PathMatrix(5, 5), *steps).any()
+
+
+@pytest.mark.parametrize("steps", [(1, 1), (2, 3), (3, 4), (20, 20)])
+def test_traceback_sampling(steps):
+    codes = np.random.default_rng(1).integers(0, 4, (11, 14)).astype(np.int8)
+    sampled = pool_matrix(PackedTraceback.from_codes(codes), *steps)
+    assert np.array_equal(sampled, codes[::steps[0], ::steps[1]])
+
+
+def test_block_step_and_labels():
+    assert [block_step(size, 300) for size in (1, 300, 301, 600, 601)] == [1, 1, 2, 2, 3]
+    assert axis_labels("AC", 1) == ["", "A-0", "C-1"]
+    assert axis_labels("ACGT", 2) == ["-..A-0", "C-1..G-2", "T-3..T-3"]
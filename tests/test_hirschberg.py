@@ -0,0 +1,30 @@
+import pytest
+from Align_Engines import hirschberg_numpy
+from Sequence_Align_Toolkit import SequenceAlign
+from conftest import mutate, random_protein
+
+
+@pytest.mark.parametrize("block_cells", [1, 16, 200, 1 << 16])
+def test_hirschberg_matches_python_traceback(blosum62, rng, block_cells):
+    aligner = SequenceAlign(blosum62, -8)
+    for _ in range(25):
+        seq_1 = random_protein(rng, rng.randint(0, 60))
+        seq_2 = mutate(rng, seq_1, substitutions=5, indels=3) if rng.random() < 0.5 else \
+            random_protein(rng, rng.randint(0, 60))
+        aligner.set_sequences(seq_1, seq_2)
+        aligner.gen_global_data("python")
+        score, aligned = hirschberg_numpy(seq_1, seq_2, blosum62, -8, block_cells)
+        assert (score, aligned) == (aligner.nw_optimal_alignment, aligner.nw_result)
+
+
+def test_hirschberg_engine_keeps_no_matrices(blosum62, rng):
+    aligner = SequenceAlign(blosum62, -8)
+    aligner.set_sequences(random_protein(rng, 300), random_protein(rng, 280))
+    aligner.gen_global_data("hirschberg")
+    score, aligned = aligner.nw_optimal_alignment, aligner.nw_result
+    assert aligner.nw_s_matrix is None and aligner.nw_t_matrix is None
+    aligner.gen_global_data("numpy")
+    assert (score, aligned) == (aligner.nw_optimal_alignment, aligner.nw_result)
+    aligner.gen_global_data("hirschberg")
+    with pytest.raises(ValueError):
+        aligner.global_path_matrix()
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from MultipleAlign import MultipleAlignment
+from conftest import mutate, random_protein
+
+
+def family(rng, size=8):
+    ancestor = random_protein(rng, 50)
+    return [mutate(rng, ancestor, substitutions=6, indels=3) for _ in range(size)]
+
+
+def assert_same_alignment(msa, expected):
+    assert msa.aligned_seqs == expected.aligned_seqs
+    assert np.array_equal(msa.block, expected.block)
+    assert np.array_equal(msa.counts, expected.counts)
+    assert np.array_equal(msa.first_seen, expected.first_seen)
+    assert msa.consensus() == expected.consensus()
+
+
+@pytest.mark.parametrize("gaps", [{"gap_penalty": -8}, {"gap_open": -11, "gap_extend": -1}])
+@pytest.mark.parametrize("split", [2, 3, 6])
+def test_saved_alignment_extends_like_a_full_run(blosum62, rng, tmp_path, gaps, split):
+    sequences = family(rng)
+    full = MultipleAlignment(sequences, blosum62, **gaps)
+    full.global_progressive_align()
+
+    start = MultipleAlignment(sequences[:split], blosum62, **gaps)
+    start.global_progressive_align()
+    start.save(tmp_path / "family.npz", names=[f"s{i}" for i in range(split)])
+    reopened = MultipleAlignment.load(tmp_path / "family.npz", blosum62, **gaps)
+    new_names = [f"s{i}" for i in range(split, len(sequences))]
+    reopened.add_sequences(iter(sequences[split:]), names=new_names)
+
+    assert_same_alignment(reopened, full)
+    assert reopened.names == [f"s{i}" for i in range(len(sequences))]
+    assert [row.replace("-", "") for row in reopened.aligned_seqs] == sequences
+
+
+def test_add_sequences_in_steps(blosum62, rng):
+    sequences = family(rng, 10)
+    full = MultipleAlignment(sequences, blosum62)
+    full.global_progressive_align()
+    msa = MultipleAlignment(sequences[:4], blosum62)
+    msa.global_progressive_align()
+    for start in range(4, 10, 2):
+        msa.add_sequences(sequences[start:start + 2])
+    assert_same_alignment(msa, full)
+
+
+def test_load_rejects_other_alphabet(blosum62, dna_matrix, rng, tmp_path):
+    msa = MultipleAlignment(family(rng, 3), blosum62)
+    msa.global_progressive_align()
+    msa.save(tmp_path / "family.npz")
+    with pytest.raises(ValueError):
+        MultipleAlignment.load(tmp_path / "family.npz", dna_matrix)
+
+
+def test_add_sequences_checks_names(blosum62, rng):
+    msa = MultipleAlignment(family(rng, 3), blosum62)
+    with pytest.raises(ValueError):
+        msa.add_sequences(["ACDE"])
+    msa.global_progressive_align()
+    before = msa.aligned_seqs
+    with pytest.raises(ValueError):
+        msa.add_sequences(["ACDE"], names=["new"])  # the existing rows have no names
+    assert msa.aligned_seqs == before
+
+
+def test_add_aligned_sequence_updates_the_column_profile(dna_matrix):
+    msa = MultipleAlignment([], dna_matrix)
+    msa.aligned_seqs = ["ACT", "GCA"]
+    assert msa.consensus() == "ACT"  # ties go to the residue of the upper row
+
+    # the consensus got two gap columns, column 3 changes its consensus from T to A
+    msa.add_aligned_sequence("A-CT-", "AGCAT")
+    a, c, g, t = (msa.index[char] for char in "ACGT")
+    gap = msa.gap_code
+    assert msa.block.dtype == np.uint8
+    assert msa.block.tolist() == [[a, gap, c, t, gap], [g, gap, c, a, gap], [a, g, c, a, t]]
+    assert msa.aligned_seqs == ["A-CT-", "G-CA-", "AGCAT"]
+
+    expected_counts = np.zeros((5, 5), dtype=np.int64)
+    expected_first = np.full((5, 5), np.iinfo(np.int64).max, dtype=np.int64)
+    for column, entries in enumerate([{a: (2, 0), g: (1, 1)}, {g: (1, 2), gap: (2, 0)}, {c: (3, 0)},
+                                      {t: (1, 0), a: (2, 1)}, {t: (1, 2), gap: (2, 0)}]):
+        for code, (count, first_row) in entries.items():
+            expected_counts[column, code] = count
+            expected_first[column, code] = first_row
+    assert np.array_equal(msa.counts, expected_counts)
+    assert np.array_equal(msa.first_seen, expected_first)
+    assert msa.consensus_codes.tolist() == [a, g, c, a, t]
+    assert msa.consensus() == "AGCAT"
+
+
+def test_add_aligned_sequence_matches_set_block(blosum62, rng):
+    """The incremental column profile equals the one set_block recounts from the same rows"""
+    msa = MultipleAlignment(family(rng, 6), blosum62)
+    msa.global_progressive_align()
+    for _ in range(4):
+        width = len(msa)
+        inserted = sorted(rng.sample(range(width + 3), 3))
+        aligned_consensus = ["A"] * width  # only its gap positions matter
+        for position in inserted:
+            aligned_consensus.insert(position, "-")
+        new_row = "".join(rng.choice("ACDEFG-") for _ in aligned_consensus)
+        msa.add_aligned_sequence("".join(aligned_consensus), new_row)
+
+        recounted = MultipleAlignment([], blosum62)
+        recounted.set_block(msa.block.copy())
+        assert_same_alignment(msa, recounted)
+        assert np.array_equal(msa.consensus_codes, recounted.consensus_codes)
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from Kmer_Index import INDEX_FILES, KmerIndex
+from Sequence_Align_Toolkit import SequenceAlign
+from conftest import mutate, random_protein
+
+
+def naive_key(window, seed, index):
+    """Residues under the 1s of the seed, packed as base-len(alphabet) digits"""
+    key = 0
+    for char, use in zip(window, seed):
+        if use == "1":
+            key = key * len(index) + index[char]
+    return key
+
+
+def database(rng, size=40):
+    return [(f"t{number}", random_protein(rng, rng.randint(60, 200))) for number in range(size)]
+
+
+@pytest.mark.parametrize("seed", ["1", "111", "11011", "1001"])
+def test_seed_keys_match_slice_and_pack(blosum62, rng, seed):
+    kmer_index = KmerIndex(blosum62, seed)
+    seq = random_protein(rng, 50)
+    codes = np.array([blosum62[0][char] for char in seq])
+    expected = [naive_key(seq[start:start + len(seed)], seed, blosum62[0]) for start in range(len(seq) - len(seed) + 1)]
+    assert kmer_index.seed_keys(codes).tolist() == expected
+
+
+def test_postings_list_every_seed(blosum62, rng):
+    records = database(rng, 10)
+    kmer_index = KmerIndex(blosum62, "11011").build(records)
+    assert np.all(np.diff(kmer_index.keys) > 0) and kmer_index.offsets[-1] == len(kmer_index.targets)
+    found = set()
+    for slot, key in enumerate(kmer_index.keys):
+        for posting in range(kmer_index.offsets[slot], kmer_index.offsets[slot + 1]):
+            target, position = int(kmer_index.targets[posting]), int(kmer_index.positions[posting])
+            assert naive_key(records[target][1][position:position + 5], "11011", blosum62[0]) == key
+            found.add((target, position))
+    assert found == {(target, position) for target, (_, seq) in enumerate(records) for position in range(len(seq) - 4)}
+    assert [kmer_index.sequence(number) for number in range(len(records))] == [seq for _, seq in records]
+
+
+def test_save_load_round_trip(blosum62, rng, tmp_path):
+    records = database(rng, 15)
+    in_memory = KmerIndex(blosum62, "111").build(records)
+    saved = KmerIndex(blosum62, "111").build(records, tmp_path / "index")  # saved, then reopened from the files
+    for loaded in (saved, KmerIndex.load(tmp_path / "index")):
+        assert (loaded.names, loaded.seed, loaded.alphabet) == (in_memory.names, "111", in_memory.alphabet)
+        for name in INDEX_FILES:
+            assert isinstance(getattr(loaded, name), np.memmap)
+            assert np.array_equal(getattr(loaded, name), getattr(in_memory, name))
+        query = records[3][1][10:60]
+        assert loaded.candidates(query) == in_memory.candidates(query)
+
+
+def test_planted_homolog_is_found_at_its_span(blosum62, rng):
+    records = database(rng)
+    domain = random_protein(rng, 70)
+    host = records[17][1]
+    records[17] = ("host", host[:40] + mutate(rng, domain, substitutions=8, indels=1) + host[40:])
+    aligner = SequenceAlign(blosum62, -8)
+    hits = KmerIndex(blosum62, "11011").build(records).search(domain, aligner, top=3)
+    score, name, target, aligned, query_span, target_span = hits[0]
+    assert (name, target) == ("host", 17)
+    assert abs(target_span[0] - 40) <= 3 and abs(target_span[1] - (len(records[17][1]) - len(host) + 40)) <= 3
+    assert aligned[1].replace("-", "") == records[17][1][slice(*target_span)]
+    assert aligned[0].replace("-", "") == domain[slice(*query_span)]
+    aligner.set_sequences(domain, records[17][1])
+    aligner.gen_local_data("numpy")
+    assert score == aligner.sw_optimal_alignment
+    assert all(hits[i][0] >= hits[i + 1][0] for i in range(len(hits) - 1))
+
+
+def test_max_occurrences_skips_repeated_seeds(blosum62, rng):
+    repeat = "AAAAAAAAAA"
+    records = [(f"r{number}", random_protein(rng, 30) + repeat + random_protein(rng, 30)) for number in range(20)]
+    records.append(("unique", random_protein(rng, 80)))
+    kmer_index = KmerIndex(blosum62, "111").build(records)
+    query = repeat + records[-1][1][20:50]
+    assert {target for target, _, _ in kmer_index.candidates(query, top=50)} >= {0, 20}
+    filtered = kmer_index.candidates(query, top=50, max_occurrences=5)
+    assert [target for target, _, _ in filtered] == [20]  # every AAA posting is gone, the unique seeds remain
+
+
+def test_query_shorter_than_seed(blosum62, rng):
+    kmer_index = KmerIndex(blosum62, "11011").build(database(rng, 5))
+    assert len(kmer_index.seed_keys(np.array([1, 2, 3, 4]))) == 0
+    assert kmer_index.candidates("ACDE") == []
+    assert kmer_index.search("ACDE", SequenceAlign(blosum62, -8)) == []
+
+
+def test_invalid_seeds(blosum62):
+    for seed in ("", "0110", "1021", "110"):
+        with pytest.raises(ValueError):
+            KmerIndex(blosum62, seed)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from Align_Engines import global_score_numpy, local_score_numpy
+from Sequence_Align_Toolkit import SequenceAlign
+from conftest import AMINO_ACIDS, mutate, random_dna, random_protein
+
+
+def aligned_pair(sub_matrix, gap_penalty, seq_1, seq_2, engine):
+    aligner = SequenceAlign(sub_matrix, gap_penalty)
+    aligner.set_sequences(seq_1, seq_2)
+    aligner.gen_all_data(engine)
+    return aligner
+
+
+def pairs(rng, random_seq, alphabet, count=15):
+    """Random, related and edge-case (empty / single residue) pairs"""
+    yield random_seq(rng, 0), random_seq(rng, 4)
+    yield random_seq(rng, 1), random_seq(rng, 1)
+    for _ in range(count):
+        seq_1 = random_seq(rng, rng.randint(1, 40))
+        yield seq_1, random_seq(rng, rng.randint(1, 40))
+        yield seq_1, mutate(rng, seq_1, substitutions=3, indels=2, alphabet=alphabet) or seq_1
+
+
+@pytest.mark.parametrize("gap_penalty", [-2, -8])
+@pytest.mark.parametrize("alphabet", ["protein", "dna"])
+def test_numpy_engine_matches_python_engine(blosum62, dna_matrix, rng, gap_penalty, alphabet):
+    sub_matrix, random_seq, residues = ((blosum62, random_protein, AMINO_ACIDS) if alphabet == "protein"
+                                        else (dna_matrix, random_dna, "ACGT"))
+    for seq_1, seq_2 in pairs(rng, random_seq, residues):
+        python = aligned_pair(sub_matrix, gap_penalty, seq_1, seq_2, "python")
+        numpy = aligned_pair(sub_matrix, gap_penalty, seq_1, seq_2, "numpy")
+        assert np.array_equal(np.array(python.nw_s_matrix), numpy.nw_s_matrix)
+        assert np.array_equal(np.array(python.sw_s_matrix), numpy.sw_s_matrix)
+        assert np.array_equal(python.nw_t_matrix.unpack(), numpy.nw_t_matrix.unpack())
+        assert np.array_equal(python.sw_t_matrix.unpack(), numpy.sw_t_matrix.unpack())
+        assert (python.nw_optimal_alignment, python.nw_result) == (numpy.nw_optimal_alignment, numpy.nw_result)
+        assert (python.sw_optimal_alignment, python.sw_result) == (numpy.sw_optimal_alignment, numpy.sw_result)
+        assert python.sw_max_cell == numpy.sw_max_cell
+        assert np.array_equal(python.nw_path_matrix.dense(), numpy.nw_path_matrix.dense())
+        assert np.array_equal(python.sw_path_matrix.dense(), numpy.sw_path_matrix.dense())
+
+
+
+def test_score_only_matches_python_engine(blosum62, rng):
+    for seq_1, seq_2 in pairs(rng, random_protein, AMINO_ACIDS):
+        python = aligned_pair(blosum62, -8, seq_1, seq_2, "python")
+        assert global_score_numpy(seq_1, seq_2, blosum62, -8) == python.nw_optimal_alignment
+        assert local_score_numpy(seq_1, seq_2, blosum62, -8) == (python.sw_optimal_alignment, *python.sw_max_cell)
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from Profile_Align import align_blocks, decode_block, encode_block, profile_path, profile_path_affine
+from Sequence_Align_Toolkit import SequenceAlign
+from conftest import mutate, random_protein
+
+NO_SCORE = -10 ** 15
+
+
+def gotoh_score(scores, open_a, extend_a, open_b, extend_b):
+    """Cell by cell three-state reference for the optimal profile path score"""
+    n, m = scores.shape
+    h = [[NO_SCORE] * (m + 1) for _ in range(n + 1)]
+    e = [[NO_SCORE] * (m + 1) for _ in range(n + 1)]
+    f = [[NO_SCORE] * (m + 1) for _ in range(n + 1)]
+    h[0][0] = 0
+    for i in range(n + 1):
+        for j in range(m + 1):
+            if i == 0 and j == 0:
+                continue
+            if j > 0:
+                e[i][j] = max(h[i][j - 1] + open_b[j - 1], e[i][j - 1] + extend_b[j - 1])
+            if i > 0:
+                f[i][j] = max(h[i - 1][j] + open_a[i - 1], f[i - 1][j] + extend_a[i - 1])
+            diagonal = h[i - 1][j - 1] + scores[i - 1][j - 1] if i > 0 and j > 0 else NO_SCORE
+            h[i][j] = max(diagonal, e[i][j], f[i][j])
+    return h[n][m]
+
+
+def path_score(moves, scores, open_a, extend_a, open_b, extend_b):
+    i = j = total = previous = 0
+    for move in moves:
+        if move == 1:
+            total += scores[i][j]
+            i, j = i + 1, j + 1
+        elif move == 2:
+            total += extend_a[i] if previous == 2 else open_a[i]
+            i += 1
+        else:
+            total += extend_b[j] if previous == 3 else open_b[j]
+            j += 1
+        previous = move
+    assert (i, j) == scores.shape
+    return total
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_affine_profile_path_is_optimal(seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(100):
+        n, m = rng.integers(0, 9, 2)
+        scores = rng.integers(-10, 12, (n, m))
+        weight_a, weight_b = rng.integers(0, 4, n), rng.integers(0, 4, m)
+        gap_open, gap_extend = sorted(rng.integers(-12, 0, 2))
+        costs = (gap_open * weight_a, gap_extend * weight_a, gap_open * weight_b, gap_extend * weight_b)
+        moves = profile_path_affine(scores, *costs)
+        assert path_score(moves, scores, *costs) == gotoh_score(scores, *costs)
+
+
+def test_affine_profile_path_equals_linear_when_open_equals_extend():
+    rng = np.random.default_rng(11)
+    scores = rng.integers(-10, 12, (30, 25))
+    gap_a, gap_b = -4 * rng.integers(0, 4, 30), -4 * rng.integers(0, 4, 25)
+    affine = path_score(profile_path_affine(scores, gap_a, gap_a, gap_b, gap_b), scores, gap_a, gap_a, gap_b, gap_b)
+    linear = path_score(profile_path(scores, gap_a, gap_b), scores, gap_a, gap_a, gap_b, gap_b)
+    assert affine == linear
+
+
+@pytest.mark.parametrize("gap_open, gap_extend", [(-10, -1), (-6, -2), (-4, -4), (-3, -1)])
+def test_single_sequence_blocks_match_affine_engine(blosum62, rng, gap_open, gap_extend):
+    """Two 1-row blocks are a plain pairwise alignment - same path as the numpy Gotoh engine, tie breaks included"""
+    index, dense = blosum62
+    alphabet = sorted(index, key=index.get)
+    for _ in range(60):
+        seq_1 = random_protein(rng, rng.randint(1, 30))
+        seq_2 = mutate(rng, seq_1, substitutions=4, indels=3) if rng.random() < 0.7 else random_protein(rng, 20)
+        aligner = SequenceAlign(blosum62, -4, gap_open, gap_extend)
+        aligner.set_sequences(seq_1, seq_2)
+        aligner.gen_global_data("numpy")
+        block = align_blocks(encode_block(seq_1, index), encode_block(seq_2, index), dense, -4, gap_open, gap_extend)
+        assert decode_block(block, alphabet) == list(aligner.nw_result)
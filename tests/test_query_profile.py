@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from Align_Engines import local_score_affine, local_score_numpy, local_score_profile, query_profile
+from Sequence_Align_Toolkit import SequenceAlign
+from conftest import mutate, random_dna, random_protein
+
+
+@pytest.mark.parametrize("block_rows", [1, 7, 64])
+def test_profile_scores_match_row_engine(blosum62, rng, block_rows):
+    for _ in range(10):
+        query = random_protein(rng, rng.randint(0, 90))
+        profile = query_profile(query, blosum62)
+        assert profile.shape == (len(blosum62[0]), len(query)) and profile.dtype == blosum62[1].dtype
+        for _ in range(5):
+            target = rng.choice([random_protein(rng, rng.randint(0, 120)), mutate(rng, query, 5, 3) or query])
+            assert (local_score_profile(profile, target, blosum62[0], -6, block_rows)
+                    == local_score_numpy(query, target, blosum62, -6))
+
+
+def test_profile_ties_match_row_engine(dna_matrix, rng):
+    for _ in range(200):  # short DNA pairs are full of equal-score cells
+        query, target = random_dna(rng, rng.randint(1, 12)), random_dna(rng, rng.randint(1, 12))
+        assert (local_score_profile(query_profile(query, dna_matrix), target, dna_matrix[0], -2)
+                == local_score_numpy(query, target, dna_matrix, -2))
+
+
+def test_local_score_reuses_the_query_profile(blosum62, rng):
+    aligner = SequenceAlign(blosum62, -8)
+    query = random_protein(rng, 60)
+    aligner.local_score(query.lower(), random_protein(rng, 80))
+    profile = aligner.query_profile[1]
+    for _ in range(5):
+        target = random_protein(rng, rng.randint(20, 150))
+        assert aligner.local_score(query, target) == local_score_numpy(query, target, blosum62, -8)
+        assert aligner.query_profile[1] is profile  # same query -> same profile object
+    other = random_protein(rng, 30)
+    aligner.local_score(other, query)
+    assert aligner.query_profile[1] is not profile
+    assert np.array_equal(aligner.query_profile[1], query_profile(other, blosum62))
+
+
+def test_affine_local_score_is_unchanged(blosum62, rng):
+    aligner = SequenceAlign(blosum62, -8, gap_open=-11, gap_extend=-1)
+    query, target = random_protein(rng, 50), random_protein(rng, 70)
+    assert aligner.local_score(query, target) == local_score_affine(query, target, blosum62, -11, -1)
@@ -0,0 +1,65 @@
+from Result_Cache import AlignmentCache
+from Sequence_Align_Toolkit import SequenceAlign
+from conftest import random_protein
+
+
+def test_cache_hits_and_misses(blosum62, rng):
+    cache = AlignmentCache()
+    aligner = SequenceAlign(blosum62, -8, cache=cache)
+    seq_1, seq_2 = random_protein(rng, 40), random_protein(rng, 35)
+    aligner.set_sequences(seq_1, seq_2)
+    aligner.gen_global_data("numpy")
+    expected = (aligner.nw_optimal_alignment, aligner.nw_result)
+    assert aligner.nw_engine == "numpy"
+    assert (cache.misses, cache.memory_hits) == (1, 0)
+
+    aligner.gen_global_data("numpy")
+    assert aligner.nw_engine == "cache" and aligner.nw_s_matrix is None
+    assert (aligner.nw_optimal_alignment, aligner.nw_result) == expected
+    assert (cache.misses, cache.memory_hits) == (1, 1)
+
+    aligner.gen_local_data("numpy")  # other mode -> other key
+    aligner.set_sequences(seq_2, seq_1)  # other order -> other key
+    aligner.gen_global_data("numpy")
+    stats = cache.stats()
+    assert (stats["misses"], stats["memory_hits"], stats["hit_rate"]) == (3, 1, 0.25)
+
+    # other scoring -> other key
+    other = SequenceAlign(blosum62, -4, cache=cache)
+    other.set_sequences(seq_1, seq_2)
+    other.gen_global_data("numpy")
+    assert other.nw_engine == "numpy" and cache.misses == 4
+
+
+def test_memory_tier_is_lru():
+    cache = AlignmentCache(memory_items=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key)
+    assert cache.get("a") is None
+    assert cache.get("b") == "b" and cache.get("c") == "c"
+    assert cache.stats()["memory_items"] == 2
+
+
+def test_disk_tier_survives_restart_and_evicts(tmp_path, blosum62, rng):
+    path = str(tmp_path / "results.db")
+    aligner = SequenceAlign(blosum62, -8, cache=AlignmentCache(path))
+    aligner.set_sequences(random_protein(rng, 30), random_protein(rng, 30))
+    aligner.gen_global_data("numpy")
+    expected = aligner.nw_result
+    aligner.result_cache.close()
+
+    reopened = AlignmentCache(path)
+    aligner.result_cache = reopened
+    aligner.gen_global_data("numpy")
+    assert aligner.nw_engine == "cache" and aligner.nw_result == expected
+    assert (reopened.disk_hits, reopened.memory_hits, reopened.misses) == (1, 0, 0)
+    aligner.gen_global_data("numpy")
+    assert reopened.memory_hits == 1
+    reopened.close()
+
+    small = AlignmentCache(path, max_disk_bytes=2000)
+    for number in range(50):
+        small.put(f"key {number}", "x" * 100)
+    assert small.evictions > 0 and small.stats()["disk_bytes"] <= 2000
+    assert small.get("key 49") == "x" * 100
+    small.close()
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from Reusable_Align import DPBuffers, ReusableAligner
+from Sequence_Align_Toolkit import SequenceAlign
+from conftest import mutate, random_protein
+
+
+def test_buffers_are_reused_for_equal_or_smaller_requests():
+    buffers = DPBuffers()
+    first = buffers.get("score", (10, 12), np.int64, True)
+    pool = buffers.buffers["score"]
+    for shape in ((10, 12), (6, 5), (1, 1), (12, 10)):
+        view = buffers.get("score", shape, np.int64, False)
+        assert view.shape == shape and np.shares_memory(view, pool)
+    assert np.shares_memory(first, pool) and buffers.grow_count == 1 and buffers.nbytes == 120 * 8
+
+
+def test_zero_clears_what_the_last_user_left():
+    buffers = DPBuffers()
+    buffers.get("score", (4, 4), np.int64, False)[:] = 9
+    assert not buffers.get("score", (3, 3), np.int64, True).any()
+    assert np.all(buffers.get("score", (4, 4), np.int64, False)[3] == 9)  # zero=False leaves the old contents
+
+
+def test_growth_by_half():
+    buffers = DPBuffers()
+    buffers.get("score", (10, 10), np.int64, True)
+    buffers.get("score", (11, 10), np.int64, True)  # 110 cells -> grows to 1.5 x 100
+    assert buffers.buffers["score"].size == 150 and buffers.grow_count == 2
+    buffers.get("score", (15, 10), np.int64, True)
+    assert buffers.grow_count == 2
+    buffers.get("score", (40, 10), np.int64, True)  # more than 1.5x at once -> exactly the request
+    assert buffers.buffers["score"].size == 400 and buffers.grow_count == 3
+    buffers.get("score", (20, 20), np.uint8, True)  # another dtype replaces the buffer
+    assert buffers.buffers["score"].dtype == np.uint8 and buffers.grow_count == 4
+
+
+def test_max_bytes_cap():
+    buffers = DPBuffers(max_bytes=1000)
+    buffers.get("score", (10, 10), np.int64, True)  # 800 bytes, kept
+    buffers.get("score", (11, 10), np.int64, True)  # growth capped at 1000 bytes -> 125 cells
+    assert buffers.buffers["score"].size == 125
+    pool = buffers.buffers["score"]
+    one_off = buffers.get("score", (20, 10), np.int64, True)  # 1600 bytes, over the cap
+    assert one_off.shape == (20, 10) and not one_off.any() and not np.shares_memory(one_off, pool)
+    assert buffers.oversize_count == 1 and buffers.buffers["score"] is pool
+    other = buffers.get("traceback", (10, 10), np.uint8, False)  # 100 bytes, but only 0 are left under the cap
+    assert buffers.oversize_count == 2 and "traceback" not in buffers.buffers and other.shape == (10, 10)
+    assert buffers.nbytes <= 1000
+
+
+def test_reset():
+    buffers = DPBuffers()
+    buffers.get("score", (10, 10), np.int64, True)
+    buffers.reset()
+    assert buffers.buffers == {} and buffers.nbytes == 0
+
+
+@pytest.mark.parametrize("gaps", [(), (-11, -1)])
+def test_reused_buffers_give_fresh_results(blosum62, rng, gaps):
+    reusable = ReusableAligner(blosum62, -8, *gaps)
+    lengths = [120, 80, 80, 5, 0, 60, 150, 30]  # shrinking and growing, so every buffer holds old data
+    for length in lengths:
+        seq_1 = random_protein(rng, length)
+        seq_2 = mutate(rng, seq_1, substitutions=length // 5, indels=2) if length else random_protein(rng, 7)
+        fresh = SequenceAlign(blosum62, -8, *gaps)
+        for aligner in (fresh, reusable):
+            aligner.set_sequences(seq_1, seq_2)
+            aligner.gen_all_data("numpy")
+        assert np.array_equal(fresh.nw_s_matrix, reusable.nw_s_matrix)
+        assert np.array_equal(fresh.sw_s_matrix, reusable.sw_s_matrix)
+        assert np.array_equal(fresh.nw_t_matrix.unpack(), reusable.nw_t_matrix.unpack())
+        assert np.array_equal(fresh.sw_t_matrix.unpack(), reusable.sw_t_matrix.unpack())
+        assert (fresh.nw_optimal_alignment, fresh.nw_result) == (reusable.nw_optimal_alignment, reusable.nw_result)
+        assert (fresh.sw_optimal_alignment, fresh.sw_result) == (reusable.sw_optimal_alignment, reusable.sw_result)
+        assert fresh.sw_max_cell == reusable.sw_max_cell
+        if not gaps:
+            assert fresh.gen_semi_global_data() == reusable.gen_semi_global_data()
+            assert fresh.gen_top_local_data(3) == reusable.gen_top_local_data(3)
+    assert reusable.buffers.grow_count < 4 * len(lengths)  # most pairs reused the buffers
+
+
+def test_defaults_and_reset(blosum62, rng):
+    aligner = ReusableAligner(blosum62, -8, max_buffer_bytes=1024 ** 2)
+    aligner.set_sequences(random_protein(rng, 30), random_protein(rng, 40))
+    aligner.gen_all_data()
+    assert aligner.nw_engine == aligner.sw_engine == "numpy"
+    assert aligner.buffers.nbytes > 0
+    aligner.reset()
+    assert aligner.buffers.nbytes == 0 and aligner.nw_s_matrix is None and aligner.sw_t_matrix is None
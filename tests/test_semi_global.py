@@ -0,0 +1,86 @@
+import itertools
+import pytest
+from Align_Engines import decode_sub_matrix, global_score_numpy, semi_global_numpy, semi_global_score_numpy
+from Sequence_Align_Toolkit import SequenceAlign
+from conftest import random_protein
+
+FLAGS = list(itertools.product([False, True], repeat=4))  # free_start_1, free_end_1, free_start_2, free_end_2
+
+
+def semi_global_reference(seq_1, seq_2, sub_matrix, gap_penalty, free_start_1, free_end_1, free_start_2,
+                          free_end_2):
+    """Cell by cell Needleman-Wunsch with free end gaps - optimal score"""
+    n, m = len(seq_1), len(seq_2)
+    score = [[0] * (m + 1) for _ in range(n + 1)]
+    for j in range(1, m + 1):
+        score[0][j] = 0 if free_start_1 else gap_penalty * j
+    for i in range(1, n + 1):
+        score[i][0] = 0 if free_start_2 else gap_penalty * i
+        for j in range(1, m + 1):
+            score[i][j] = max(score[i - 1][j - 1] + sub_matrix[seq_1[i - 1] + seq_2[j - 1]],
+                              score[i - 1][j] + gap_penalty, score[i][j - 1] + gap_penalty)
+    best = score[n][m]
+    if free_end_1:
+        best = max(best, max(score[n]))
+    if free_end_2:
+        best = max(best, max(row[m] for row in score))
+    return best
+
+
+def free_gap_score(aligned, sub_matrix, gap_penalty, free_start_1, free_end_1, free_start_2, free_end_2):
+    """Score of an alignment where the chosen end gaps cost nothing"""
+    def end_gaps(row):
+        lead = len(row) - len(row.lstrip("-"))
+        return lead, len(row) - len(row.rstrip("-")) if row.strip("-") else 0
+
+    lead_1, trail_1 = end_gaps(aligned[0])
+    lead_2, trail_2 = end_gaps(aligned[1])
+    length = len(aligned[0])
+    score = 0
+    for column, (a, b) in enumerate(zip(*aligned)):
+        if a == "-":
+            free = (free_start_1 and column < lead_1) or (free_end_1 and column >= length - trail_1)
+            score += 0 if free else gap_penalty
+        elif b == "-":
+            free = (free_start_2 and column < lead_2) or (free_end_2 and column >= length - trail_2)
+            score += 0 if free else gap_penalty
+        else:
+            score += sub_matrix[a + b]
+    return score
+
+
+@pytest.mark.parametrize("flags", FLAGS)
+def test_semi_global_matches_reference(blosum62, rng, flags):
+    sub_matrix = decode_sub_matrix(blosum62)
+    for _ in range(15):
+        read = random_protein(rng, rng.randint(1, 25))
+        reference = random_protein(rng, rng.randint(0, 10)) + read + random_protein(rng, rng.randint(0, 10))
+        for seq_1, seq_2 in ((read, reference), (reference, read), (read, random_protein(rng, 20))):
+            expected = semi_global_reference(seq_1, seq_2, sub_matrix, -6, *flags)
+            assert semi_global_score_numpy(seq_1, seq_2, blosum62, -6, *flags)[0] == expected
+            score, aligned, span_1, span_2 = semi_global_numpy(seq_1, seq_2, blosum62, -6, *flags)
+            assert score == expected
+            assert [row.replace("-", "") for row in aligned] == [seq_1, seq_2]
+            assert free_gap_score(aligned, sub_matrix, -6, *flags) == expected
+            assert 0 <= span_1[0] <= span_1[1] <= len(seq_1) and 0 <= span_2[0] <= span_2[1] <= len(seq_2)
+
+
+def test_semi_global_without_free_ends_is_global(blosum62, rng):
+    aligner = SequenceAlign(blosum62, -8)
+    for _ in range(20):
+        seq_1, seq_2 = random_protein(rng, rng.randint(0, 30)), random_protein(rng, rng.randint(0, 30))
+        aligner.set_sequences(seq_1, seq_2)
+        aligner.gen_global_data("python")
+        score, aligned, _, _ = semi_global_numpy(seq_1, seq_2, blosum62, -8, False, False, False, False)
+        assert (score, aligned) == (aligner.nw_optimal_alignment, aligner.nw_result)
+        assert score == global_score_numpy(seq_1, seq_2, blosum62, -8)
+
+
+def test_read_maps_to_its_reference_region(blosum62, rng):
+    read = random_protein(rng, 40)
+    reference = random_protein(rng, 100) + read + random_protein(rng, 80)
+    aligner = SequenceAlign(blosum62, -8)
+    aligner.set_sequences(read, reference)
+    aligner.gen_semi_global_data()
+    assert aligner.sg_span_2 == (100, 140)
+    assert reference[slice(*aligner.sg_span_2)] == read
@@ -0,0 +1,109 @@
+import os
+import shutil
+import numpy as np
+import pytest
+from Align_Engines import decode_sub_matrix, encode_sub_matrix
+from Sub_Matrix_Gen import SubstitutionMatrix, encode_matrix_file, parse_matrix_file
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def matrix_file(tmp_path):
+    path = tmp_path / "blosum62.mat"
+    shutil.copy(os.path.join(REPO, "blosum62.mat"), path)
+    return str(path)
+
+
+def touch_later(path):
+    """Moves the file's modification time forward, as an edit would"""
+    mtime = os.path.getmtime(path)
+    os.utime(path, (mtime + 10, mtime + 10))
+
+
+def test_parse_matrix_file(matrix_file):
+    parsed = parse_matrix_file(matrix_file)
+    assert len(parsed) == 20 * 20
+    assert parsed["AA"] == 4 and parsed["CC"] == 9 and parsed["WC"] == -2
+    assert all(parsed[a + b] == parsed[b + a] for a in "ACDEFGHIKLMNPQRSTVWY" for b in "ACDEFGHIKLMNPQRSTVWY")
+
+
+def test_second_load_returns_cached_objects(matrix_file):
+    assert parse_matrix_file(matrix_file) is parse_matrix_file(matrix_file)
+    assert encode_matrix_file(matrix_file) is encode_matrix_file(matrix_file)
+
+    # the same file reached through a relative path shares the entry
+    relative = os.path.relpath(matrix_file)
+    assert parse_matrix_file(relative) is parse_matrix_file(matrix_file)
+
+    first = SubstitutionMatrix("protein", encoded=True).load_protein_matrix(matrix_file)
+    second = SubstitutionMatrix("protein", encoded=True).load_protein_matrix(matrix_file)
+    assert first is second is encode_matrix_file(matrix_file)
+
+
+def test_touching_the_file_invalidates_the_cache(matrix_file):
+    parsed = parse_matrix_file(matrix_file)
+    encoded = encode_matrix_file(matrix_file)
+    touch_later(matrix_file)
+
+    reparsed = parse_matrix_file(matrix_file)
+    assert reparsed is not parsed and reparsed == parsed
+    reencoded = encode_matrix_file(matrix_file)
+    assert reencoded is not encoded
+    assert reencoded[0] == encoded[0] and np.array_equal(reencoded[1], encoded[1])
+
+
+def test_edited_file_is_reread(matrix_file):
+    parsed = parse_matrix_file(matrix_file)
+    with open(matrix_file) as f:
+        lines = f.readlines()
+    lines[1] = lines[1].replace(" 4 ", " 7 ", 1)  # A-A score
+    with open(matrix_file, "w") as f:
+        f.writelines(lines)
+    touch_later(matrix_file)
+
+    assert parsed["AA"] == 4
+    assert parse_matrix_file(matrix_file)["AA"] == 7
+    index, dense = encode_matrix_file(matrix_file)
+    assert dense[index["A"], index["A"]] == 7
+
+
+def test_edits_to_a_loaded_matrix_stay_local(matrix_file):
+    matrix = SubstitutionMatrix("protein")
+    sub_matrix = matrix.load_protein_matrix(matrix_file)
+    sub_matrix["AA"] = 11
+    assert parse_matrix_file(matrix_file)["AA"] == 4
+
+    # an edited matrix is encoded from its own contents, not the cached file encoding
+    index, dense = matrix.encode()
+    assert dense[index["A"], index["A"]] == 11
+    assert matrix.encode() is not encode_matrix_file(matrix_file)
+
+
+def test_encode_decode_round_trip(matrix_file):
+    for sub_matrix in (parse_matrix_file(matrix_file), SubstitutionMatrix("dna").DNA_submat(2, -1),
+                       SubstitutionMatrix("rna").RNA_submat(1, 0)):
+        index, dense = encode_sub_matrix(sub_matrix)
+        assert sorted(index) == sorted({pair[0] for pair in sub_matrix})
+        assert decode_sub_matrix((index, dense)) == sub_matrix
+
+
+@pytest.mark.parametrize("scores, dtype", [((-4, 11), np.int8), ((-200, 5), np.int16), ((1, 40000), np.int64)])
+def test_encode_picks_smallest_dtype(scores, dtype):
+    low, high = scores
+    sub_matrix = {"AA": high, "AB": low, "BA": low, "BB": high}
+    index, dense = encode_sub_matrix(sub_matrix)
+    assert dense.dtype == dtype
+    assert decode_sub_matrix((index, dense)) == sub_matrix
+
+
+def test_encode_rejects_incomplete_matrix():
+    with pytest.raises(ValueError):
+        encode_sub_matrix({"AA": 1, "AB": 0, "BB": 1})
+
+
+def test_invalid_sequence_type():
+    with pytest.raises(ValueError):
+        SubstitutionMatrix("error_test").auto_load()
+    with pytest.raises(ValueError):
+        SubstitutionMatrix("dna").load_protein_matrix()
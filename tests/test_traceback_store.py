@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from Sequence_Align_Toolkit import SequenceAlign
+from Traceback_Store import PackedTraceback, PathMatrix
+from conftest import mutate, random_protein
+
+
+def random_codes(rng, rows, cols):
+    return np.array([[rng.randrange(4) for _ in range(cols)] for _ in range(rows)], dtype=np.int8)
+
+
+@pytest.mark.parametrize("cols", [1, 2, 3, 4, 5, 7, 8, 9, 33])
+def test_rows_round_trip(rng, cols):
+    codes = random_codes(rng, 6, cols)
+    traceback = PackedTraceback.from_codes(codes)
+    assert traceback.packed.shape == (6, (cols + 3) // 4) and traceback.nbytes == 6 * ((cols + 3) // 4)
+    assert np.array_equal(traceback.unpack(), codes) and traceback.unpack().dtype == np.int8
+    for row in range(6):
+        assert np.array_equal(traceback.get_row(row), codes[row])
+        assert np.array_equal(traceback[row], codes[row])
+        assert [traceback[row, col] for col in range(cols)] == codes[row].tolist()
+        assert [traceback[row][col] for col in range(cols)] == codes[row].tolist()
+    assert len(traceback) == 6 and np.array_equal(np.array(list(traceback)), codes)
+
+    codes[2] = codes[4][::-1]  # overwriting a row leaves its neighbours alone
+    traceback.set_row(2, codes[2])
+    assert np.array_equal(traceback.unpack(), codes)
+
+
+@pytest.mark.parametrize("cols", [5, 8, 13, 16])
+def test_blocks_round_trip(rng, cols):
+    codes = random_codes(rng, 9, cols)
+    traceback = PackedTraceback(9, cols)
+    for row_start, row_end in ((0, 4), (4, 9)):  # blocks start on whole bytes, the last one may be ragged
+        for col_start in range(0, cols, 4):
+            col_end = min(cols, col_start + rng.choice([4, 8]))
+            traceback.set_block(row_start, col_start, codes[row_start:row_end, col_start:col_end])
+    assert np.array_equal(traceback.unpack(), codes)
+
+
+def test_storage_can_be_supplied(rng):
+    codes = random_codes(rng, 3, 10)
+    storage = np.zeros(PackedTraceback.packed_shape(3, 10), dtype=np.uint8)
+    traceback = PackedTraceback.from_codes(codes, packed=storage)
+    assert traceback.packed is storage and np.array_equal(traceback.unpack(), codes)
+    assert np.array_equal(PackedTraceback.from_codes(codes.tolist()).unpack(), codes)  # nested lists work too
+
+
+def dense_path(traceback, row, col, local):
+    """Path cells walked on the unpacked int8 traceback, as a 0/1 array"""
+    path = np.zeros(traceback.shape, dtype=np.uint8)
+    while (row > 0 and col > 0 and traceback[row, col] > 0) if local else (row > 0 or col > 0):
+        path[row, col] = 1
+        move = traceback[row, col]
+        row, col = row - (move in (1, 2)), col - (move in (1, 3))
+    return path
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_sparse_paths_match_dense_paths(blosum62, rng, engine):
+    for _ in range(10):
+        seq_1 = random_protein(rng, rng.randint(1, 40))
+        seq_2 = mutate(rng, seq_1, substitutions=4, indels=2) or seq_1
+        aligner = SequenceAlign(blosum62, -8)
+        aligner.set_sequences(seq_1, seq_2)
+        aligner.gen_all_data(engine)
+        for path, traceback, start, local in ((aligner.nw_path_matrix, aligner.nw_t_matrix, (len(seq_1), len(seq_2)),
+                                               False),
+                                              (aligner.sw_path_matrix, aligner.sw_t_matrix, aligner.sw_max_cell, True)):
+            expected = dense_path(traceback.unpack(), *start, local)
+            assert isinstance(path, PathMatrix) and path.shape == expected.shape
+            assert np.array_equal(path.dense(), expected)
+            assert np.array_equal(np.array(list(path)), expected)
+            assert all(path[row] == expected[row].tolist() for row in range(len(path)))
+
+
+def test_empty_path_matrix():
+    path = PathMatrix(2, 3)
+    assert not path.dense().any() and path[1] == [0, 0, 0] and list(path) == [[0, 0, 0]] * 2
+    path.add(1, 2)
+    assert path.dense().tolist() == [[0, 0, 0], [0, 0, 1]]
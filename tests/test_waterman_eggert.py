@@ -0,0 +1,110 @@
+import pytest
+from Align_Engines import decode_sub_matrix, waterman_eggert_numpy
+from Sequence_Align_Toolkit import SequenceAlign
+from conftest import random_dna, random_protein
+
+
+def masked_smith_waterman(seq_1, seq_2, sub_matrix, gap_penalty, mask):
+    """Full Smith-Waterman with the masked cells held at 0 - first best cell in row order and its traceback"""
+    n, m = len(seq_1), len(seq_2)
+    score = [[0] * (m + 1) for _ in range(n + 1)]
+    moves = [[0] * (m + 1) for _ in range(n + 1)]
+    best = (0, 0, 0)
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            if (i, j) in mask:
+                continue
+            diagonal = score[i - 1][j - 1] + sub_matrix[seq_1[i - 1] + seq_2[j - 1]]
+            up = score[i - 1][j] + gap_penalty
+            left = score[i][j - 1] + gap_penalty
+            score[i][j] = max(diagonal, up, left, 0)
+            if score[i][j] > 0:  # same tie order as the engines: left, then up, then diagonal
+                moves[i][j] = 3 if left >= max(diagonal, up) else 2 if up >= diagonal else 1
+            if score[i][j] > best[0]:
+                best = (score[i][j], i, j)
+    return best, moves
+
+
+def reference_hits(seq_1, seq_2, sub_matrix, gap_penalty, k, min_score):
+    """Waterman-Eggert the slow way - a whole masked rerun after every hit"""
+    mask, hits = set(), []
+    while len(hits) < k:
+        (best, end_row, end_col), moves = masked_smith_waterman(seq_1, seq_2, sub_matrix, gap_penalty, mask)
+        if best < min_score or best == 0:
+            break
+        aligned_1, aligned_2 = "", ""
+        row, col = end_row, end_col
+        while moves[row][col]:
+            mask.add((row, col))
+            move = moves[row][col]
+            aligned_1 = (seq_1[row - 1] if move != 3 else "-") + aligned_1
+            aligned_2 = (seq_2[col - 1] if move != 2 else "-") + aligned_2
+            row, col = row - (move != 3), col - (move != 2)
+        hits.append((best, [aligned_1, aligned_2], (row, end_row), (col, end_col)))
+    return hits
+
+
+def path_cells(hit):
+    """DP cells the alignment of a hit runs through"""
+    _, (aligned_1, aligned_2), (row, _), (col, _) = hit
+    cells = set()
+    for char_1, char_2 in zip(aligned_1, aligned_2):
+        row += char_1 != "-"
+        col += char_2 != "-"
+        cells.add((row, col))
+    return cells
+
+
+@pytest.mark.parametrize("gap_penalty", [-1, -2, -4])
+def test_hits_match_masked_reruns_dna(dna_matrix, rng, gap_penalty):
+    sub_matrix = decode_sub_matrix(dna_matrix)
+    for _ in range(60):
+        seq_1 = random_dna(rng, rng.randint(0, 25))
+        repeat = random_dna(rng, rng.randint(3, 8))
+        seq_2 = random_dna(rng, rng.randint(0, 6)) + repeat * rng.randint(1, 3) + random_dna(rng, rng.randint(0, 6))
+        k, min_score = rng.randint(1, 6), rng.randint(1, 6)
+        assert (waterman_eggert_numpy(seq_1, seq_2, dna_matrix, gap_penalty, k, min_score)
+                == reference_hits(seq_1, seq_2, sub_matrix, gap_penalty, k, min_score))
+
+
+def test_hits_match_masked_reruns_protein(blosum62, rng):
+    sub_matrix = decode_sub_matrix(blosum62)
+    for _ in range(15):
+        domain = random_protein(rng, 12)
+        seq_1 = random_protein(rng, 10) + domain + random_protein(rng, 8) + domain
+        seq_2 = random_protein(rng, 5) + domain + random_protein(rng, 15)
+        assert (waterman_eggert_numpy(seq_1, seq_2, blosum62, -6, 5)
+                == reference_hits(seq_1, seq_2, sub_matrix, -6, 5, 1))
+
+
+def test_hits_share_no_cell_and_respect_cutoffs(dna_matrix, rng):
+    for _ in range(40):
+        seq_1, seq_2 = random_dna(rng, 40), random_dna(rng, 35)
+        hits = waterman_eggert_numpy(seq_1, seq_2, dna_matrix, -2, 8, 3)
+        assert len(hits) <= 8 and all(score >= 3 for score, *_ in hits)
+        assert [score for score, *_ in hits] == sorted((score for score, *_ in hits), reverse=True)
+        seen = set()
+        for hit in hits:
+            cells = path_cells(hit)
+            assert not cells & seen
+            seen |= cells
+            _, aligned, span_1, span_2 = hit
+            assert aligned[0].replace("-", "") == seq_1[slice(*span_1)]
+            assert aligned[1].replace("-", "") == seq_2[slice(*span_2)]
+        assert waterman_eggert_numpy(seq_1, seq_2, dna_matrix, -2, 3, 3) == hits[:3]
+        strict = waterman_eggert_numpy(seq_1, seq_2, dna_matrix, -2, 8, 8)
+        assert strict == [hit for hit in hits if hit[0] >= 8]
+
+
+def test_first_hit_is_the_local_alignment(blosum62, rng):
+    aligner = SequenceAlign(blosum62, -8)
+    for _ in range(10):
+        aligner.set_sequences(random_protein(rng, 40), random_protein(rng, 45))
+        aligner.gen_local_data("numpy")
+        hits = aligner.gen_top_local_data(k=1)
+        if aligner.sw_optimal_alignment > 0:
+            score, aligned, span_1, span_2 = hits[0]
+            assert (score, aligned) == (aligner.sw_optimal_alignment, aligner.sw_result)
+            assert (span_1[1], span_2[1]) == aligner.sw_max_cell
+        else:
+            assert hits == []
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from Sequence_Align_Toolkit import SequenceAlign
+from Wavefront_Align import wavefront_fill
+from conftest import mutate, random_protein
+
+
+def numpy_aligner(sub_matrix, seq_1, seq_2):
+    aligner = SequenceAlign(sub_matrix, -6)
+    aligner.set_sequences(seq_1, seq_2)
+    aligner.gen_all_data("numpy")
+    return aligner
+
+
+@pytest.mark.parametrize("tile_shape", [(1, 4), (3, 5), (7, 16), (64, 64)])
+def test_tiles_match_numpy_fill(blosum62, rng, tile_shape):
+    for _ in range(10):
+        seq_1 = random_protein(rng, rng.randint(0, 45))
+        seq_2 = mutate(rng, seq_1, substitutions=4, indels=3) if rng.random() < 0.5 else random_protein(rng, 30)
+        expected = numpy_aligner(blosum62, seq_1, seq_2)
+        score_matrix, traceback = wavefront_fill(seq_1, seq_2, blosum62, -6, workers=1, tile_shape=tile_shape)
+        assert np.array_equal(score_matrix, expected.nw_s_matrix)
+        assert np.array_equal(traceback.unpack(), expected.nw_t_matrix.unpack())
+        score_matrix, traceback, best, cell = wavefront_fill(seq_1, seq_2, blosum62, -6, local=True, workers=1,
+                                                             tile_shape=tile_shape)
+        assert np.array_equal(score_matrix, expected.sw_s_matrix)
+        assert np.array_equal(traceback.unpack(), expected.sw_t_matrix.unpack())
+        assert (best, cell) == (expected.sw_optimal_alignment, expected.sw_max_cell)
+
+
+def test_worker_pool_matches_numpy_fill(blosum62, rng):
+    seq_1 = random_protein(rng, 150)
+    seq_2 = mutate(rng, seq_1, substitutions=20, indels=6)
+    expected = numpy_aligner(blosum62, seq_1, seq_2)
+    score_matrix, traceback = wavefront_fill(seq_1, seq_2, blosum62, -6, workers=2, tile_shape=(16, 20))
+    assert np.array_equal(score_matrix, expected.nw_s_matrix)
+    assert np.array_equal(traceback.unpack(), expected.nw_t_matrix.unpack())
+    score_matrix, traceback, best, cell = wavefront_fill(seq_1, seq_2, blosum62, -6, local=True, workers=2,
+                                                         tile_shape=(16, 20))
+    assert np.array_equal(score_matrix, expected.sw_s_matrix)
+    assert (best, cell) == (expected.sw_optimal_alignment, expected.sw_max_cell)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_wavefront_engine_matches_python_engine(blosum62, rng, workers):
+    for _ in range(3):
+        seq_1 = random_protein(rng, rng.randint(1, 60))
+        seq_2 = mutate(rng, seq_1, substitutions=5, indels=3) or seq_1
+        python = SequenceAlign(blosum62, -6)
+        python.set_sequences(seq_1, seq_2)
+        python.gen_all_data("python")
+        wavefront = SequenceAlign(blosum62, -6)
+        wavefront.set_sequences(seq_1, seq_2)
+        wavefront.gen_global_data("wavefront", workers=workers)
+        wavefront.gen_local_data("wavefront", workers=workers)
+        assert (wavefront.nw_optimal_alignment, wavefront.nw_result) == (python.nw_optimal_alignment,
+                                                                         python.nw_result)
+        assert (wavefront.sw_optimal_alignment, wavefront.sw_result) == (python.sw_optimal_alignment,
+                                                                         python.sw_result)
+        assert wavefront.sw_max_cell == python.sw_max_cell